@@ -48,6 +48,9 @@ export default defineConfig({
         items: [
           { text: 'Lists', link: '/core-concepts/lists' },
           { text: 'Hashes', link: '/core-concepts/hashes' },
+          { text: 'Sets', link: '/core-concepts/sets' },
+          { text: 'Deques', link: '/core-concepts/deques' },
+          { text: 'Heaps', link: '/core-concepts/heaps' },
           { text: 'Type Aliases', link: '/core-concepts/type-aliases' },
           { text: 'Scope, use, and watch', link: '/core-concepts/scope-use-watch' }
         ]
@@ -0,0 +1,934 @@
+"""Static analysis passes that run over the parsed AST before execution."""
+
+from collections import Counter
+
+# Built-in methods that modify their target in place.
+MUTATING_METHODS = frozenset({
+    "push", "empty", "merge", "insertAt", "pull", "removeValue", "order", "wipe", "take", "take_last", "ensure",
+    "add", "remove", "pushFront", "pushBack", "pullFront", "pullBack", "pop",
+})
+
+_LITERAL_TYPES = frozenset({"const", "const_list", "const_hash", "int", "float", "string", "boolean", "null"})
+
+# Built-in methods that call a function named by one of their arguments.
+CALLBACK_METHODS = frozenset({"order", "heap"})
+
+
+def callback_args(node):
+    """Arguments of an order() or heap() call that may name the function it calls."""
+    if node["method"] == "heap":
+        # Only the `by:` key function; the items argument is plain data
+        return [
+            arg for arg in node["args"]
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg" and arg["name"] == "by"
+        ]
+    return node["args"]
+
+
+def _declared_names(statements):
+    """Names declared with a type annotation directly in a statement list."""
+    names = set()
+    for stmt in statements:
+        if isinstance(stmt, dict) and stmt.get("type") in ("assign", "const_decl") and stmt.get("var_type"):
+            names.add(stmt["target"])
+    return names
+
+
+def declared_types(statements, types=None):
+    """Declared types of the names in a function or program body.
+
+    Nested function bodies are skipped. A name declared with two different
+    types (or with a type that differs from its entry in `types`) maps to
+    None.
+    """
+    if types is None:
+        types = {}
+    conflicting = set()
+
+    def record(name, var_type):
+        if types.get(name, var_type) != var_type:
+            conflicting.add(name)
+        types[name] = var_type
+
+    def visit(block):
+        for stmt in block:
+            if not isinstance(stmt, dict) or stmt.get("type") == "func_def":
+                continue
+            if stmt.get("type") in ("assign", "const_decl") and stmt.get("var_type"):
+                record(stmt["target"], stmt["var_type"])
+            elif stmt.get("type") in ("for", "foreach") and stmt.get("var_type"):
+                record(stmt["var"], stmt["var_type"])
+            for key in ("body", "else_body"):
+                if isinstance(stmt.get(key), list):
+                    visit(stmt[key])
+
+    visit(statements)
+    for name in conflicting:
+        types[name] = None
+    return types
+
+
+def function_types(func_node, outer_types):
+    """Declared types visible inside a function; untyped parameters are dynamic."""
+    types = dict(outer_types)
+    param_types = func_node.get("param_types") or {}
+    for param in func_node.get("params", []):
+        types[param] = param_types.get(param, "dynamic")
+    if isinstance(func_node.get("body"), list):
+        declared_types(func_node["body"], types)
+    return types
+
+
+def _collect_function_names(statements, names=None):
+    if names is None:
+        names = set()
+    for stmt in statements:
+        if not isinstance(stmt, dict):
+            continue
+        if stmt.get("type") == "func_def":
+            names.add(stmt["name"])
+            if isinstance(stmt.get("body"), list):
+                _collect_function_names(stmt["body"], names)
+            continue
+        for key in ("body", "else_body"):
+            branch = stmt.get(key)
+            if isinstance(branch, list):
+                _collect_function_names(branch, names)
+    return names
+
+
+class _Scope:
+    def __init__(self, parent=None, in_function=False, function_root=False, names=(), all_names=()):
+        self.parent = parent
+        self.in_function = in_function
+        self.function_root = function_root
+        self.names = set(names)  # declared so far, in program order
+        self.all_names = set(all_names) | self.names  # everything the block ever declares
+        self.imports = {}  # name -> is_mutable
+
+    def child(self, all_names=(), names=()):
+        return _Scope(parent=self, in_function=self.in_function, names=names, all_names=all_names)
+
+
+class ScopeChecker:
+    """Validate `use`/`use mut` imports and global access inside functions.
+
+    Violations that would always fail at runtime are raised with the same
+    messages the interpreter uses. `check()` returns True when every name
+    used inside a function resolved statically, in which case the interpreter
+    can skip its per-operation scope checks.
+    """
+
+    def __init__(self):
+        self.verified = True
+        self.function_names = set()
+        self.constants = set()
+        self.warnings = []  # (kind, message, line)
+
+    def check(self, ast):
+        self.verified = True
+        self.warnings = []
+        self.function_names = _collect_function_names(ast)
+        self.constants = {stmt["target"] for stmt in ast if isinstance(stmt, dict) and stmt.get("type") == "const_decl"}
+        self._check_block(ast, _Scope(all_names=_declared_names(ast)))
+        return self.verified
+
+    def _resolve(self, name, scope):
+        """Classify `name` as seen from `scope`.
+
+        Returns "local", "mutable_import", "immutable_import", "outer" (declared
+        outside any function, so it needs `use`) or None when it cannot be found.
+        """
+        crossed_function = False
+        current = scope
+        while current is not None and current.in_function:
+            names = current.all_names if crossed_function else current.names
+            if name in names:
+                return "local"
+            if name in current.imports:
+                return "mutable_import" if current.imports[name] else "immutable_import"
+            if current.function_root:
+                crossed_function = True
+            current = current.parent
+
+        while current is not None:
+            if name in current.all_names:
+                return "outer"
+            current = current.parent
+        return None
+
+    def _check_read(self, name, scope):
+        if not scope.in_function:
+            return
+        kind = self._resolve(name, scope)
+        if kind == "outer" and name not in self.constants:
+            raise NameError(f"Variable '{name}' used without 'use' statement in function")
+        if kind is None and name not in self.function_names:
+            self.verified = False
+
+    def _check_write(self, name, scope):
+        if not scope.in_function:
+            return
+        kind = self._resolve(name, scope)
+        if kind == "immutable_import":
+            raise NameError(f"Cannot modify immutable import '{name}', use 'use mut' to make it mutable")
+        if kind == "outer":
+            raise NameError(f"Cannot modify global variable '{name}' without 'use mut'")
+        if kind is None:
+            self.verified = False
+
+    def _check_shadowing(self, node, scope):
+        if not scope.in_function:
+            return
+        name = node["target"]
+        # Mirrors the runtime rules: redeclaring a name in the same function
+        # scope, or declaring a function-level local that hides an outer variable.
+        if name in scope.names or (scope.function_root and self._resolve(name, scope.parent) == "outer"):
+            self.warnings.append(("shadowed-variable", f"Variable '{name}' shadows a global variable", node.get("line")))
+
+    def _check_parameter_shadowing(self, params, scope):
+        # A function defined outside any function binds its parameters next to the globals
+        if scope.in_function:
+            return
+        for name in params:
+            if self._resolve(name, scope) == "outer":
+                self.warnings.append(("shadowed-variable", f"Variable '{name}' shadows a global variable", None))
+
+    def _check_block(self, statements, scope):
+        for stmt in statements:
+            if stmt:
+                self._check_statement(stmt, scope)
+
+    def _check_statement(self, node, scope):
+        node_type = node.get("type")
+
+        if node_type == "const_decl":
+            self._check_expr(node["value"], scope)
+            scope.names.add(node["target"])
+            return
+
+        if node_type == "assign":
+            self._check_expr(node["value"], scope)
+            name = node["target"]
+            if not node.get("var_type"):
+                self._check_write(name, scope)
+            elif scope.in_function and name in scope.imports:
+                # A typed assignment to a name imported in the same block updates
+                # the import; that relies on runtime import tracking.
+                self._check_write(name, scope)
+                self.verified = False
+            else:
+                self._check_shadowing(node, scope)
+                scope.names.add(name)
+                scope.all_names.add(name)
+            return
+
+        if node_type == "index_assign":
+            self._check_read(node["target"], scope)
+            for index in node["indices"]:
+                self._check_expr(index, scope)
+            self._check_expr(node["value"], scope)
+            self._check_write(node["target"], scope)
+            return
+
+        if node_type == "use_statement":
+            if not scope.in_function:
+                raise SyntaxError("'use' statements can only be used inside functions")
+            for name in node["variables"]:
+                if name in scope.imports:
+                    raise SyntaxError(f"Variable '{name}' already imported")
+                if self._resolve(name, scope) is None:
+                    self.verified = False
+                scope.imports[name] = node["is_mutable"]
+            return
+
+        if node_type == "func_def":
+            params = node.get("params", [])
+            body = node.get("body")
+            self._check_parameter_shadowing(params, scope)
+            if isinstance(body, list):
+                all_names = set(params) | _declared_names(body)
+                function_scope = _Scope(scope, in_function=True, function_root=True, names=params, all_names=all_names)
+                self._check_block(body, function_scope)
+            elif isinstance(body, dict):
+                function_scope = _Scope(scope, in_function=True, function_root=True, names=params)
+                self._check_expr(body, function_scope)
+            else:
+                self.verified = False
+            return
+
+        if node_type == "if":
+            self._check_expr(node["condition"], scope)
+            self._check_block(node["body"], scope.child(_declared_names(node["body"])))
+            if node.get("else_body"):
+                self._check_block(node["else_body"], scope.child(_declared_names(node["else_body"])))
+            return
+
+        if node_type == "while":
+            self._check_expr(node["condition"], scope)
+            self._check_block(node["body"], scope.child(_declared_names(node["body"])))
+            return
+
+        if node_type == "for":
+            for key in ("start", "end", "by"):
+                if isinstance(node.get(key), dict):
+                    self._check_expr(node[key], scope)
+            self._check_block(node["body"], scope.child(_declared_names(node["body"]), names=[node["var"]]))
+            return
+
+        if node_type == "foreach":
+            self._check_expr(node["iterable"], scope)
+            self._check_block(node["body"], scope.child(_declared_names(node["body"]), names=[node["var"]]))
+            return
+
+        if node_type == "return":
+            if node.get("value"):
+                self._check_expr(node["value"], scope)
+            return
+
+        if node_type in ("break", "continue", "watch_statement"):
+            return
+
+        self._check_expr(node, scope)
+
+    def _check_args(self, args, scope):
+        for arg in args:
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                arg = arg["value"]
+            self._check_expr(arg, scope)
+
+    def _check_expr(self, expr, scope):
+        expr_type = expr.get("type")
+
+        if expr_type in _LITERAL_TYPES or expr_type == "inline_param":
+            return
+        if expr_type == "identifier":
+            self._check_read(expr["name"], scope)
+        elif expr_type in ("list", "set"):
+            for element in expr["elements"]:
+                self._check_expr(element, scope)
+        elif expr_type == "hash":
+            for pair in expr["pairs"]:
+                self._check_expr(pair["value"], scope)
+        elif expr_type == "binary":
+            self._check_expr(expr["left"], scope)
+            self._check_expr(expr["right"], scope)
+        elif expr_type == "unary":
+            self._check_expr(expr["operand"], scope)
+        elif expr_type == "index":
+            self._check_expr(expr["target"], scope)
+            self._check_expr(expr["index"], scope)
+        elif expr_type == "hoisted":
+            self._check_expr(expr["expr"], scope)
+        elif expr_type == "string_interpolation":
+            for part in expr["parts"]:
+                self._check_expr(part, scope)
+        elif expr_type in ("function_call", "inline_call"):
+            # Inlined bodies only read their own parameters
+            self._check_args(expr["args"], scope)
+        elif expr_type == "method_call":
+            target = expr.get("target")
+            if target is not None:
+                self._check_expr(target, scope)
+                if expr["method"] in MUTATING_METHODS and target.get("type") == "identifier":
+                    self._check_write(target["name"], scope)
+            self._check_args(expr["args"], scope)
+        else:
+            self.verified = False
+
+
+def walk_nodes(node):
+    """Yield every AST dict reachable from `node`, including nested function bodies."""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from walk_nodes(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from walk_nodes(item)
+
+
+def _base_name(expr):
+    """Variable an identifier or a chain of index reads starts from, or None."""
+    while isinstance(expr, dict) and expr.get("type") == "index":
+        expr = expr["target"]
+    if isinstance(expr, dict) and expr.get("type") == "identifier":
+        return expr["name"]
+    return None
+
+
+def memo_purity_error(params, body, definitions=None):
+    """Explain why a function body cannot be memoized, or return None if it can.
+
+    A memoized function may only depend on its arguments: it must not import
+    outer variables, perform I/O with say()/ask(), or mutate a list or hash it
+    was passed, directly or through a local alias. An alias is a variable
+    assigned an argument or an element of one, or a `foreach` variable over
+    one. With `definitions` (function name -> func_def nodes), the functions
+    it calls are held to the same rules, for the arguments it passes them.
+    """
+    return _purity_error(set(params), body, definitions, set())
+
+
+def _purity_error(argument_names, body, definitions, seen):
+    nodes = list(walk_nodes(body))
+
+    changed = True
+    while changed:
+        changed = False
+        for node in nodes:
+            node_type = node.get("type")
+            if node_type == "assign":
+                alias, source = node["target"], node.get("value")
+            elif node_type == "foreach":
+                alias, source = node["var"], node["iterable"]
+            else:
+                continue
+            if alias not in argument_names and _base_name(source) in argument_names:
+                argument_names.add(alias)
+                changed = True
+
+    for node in nodes:
+        node_type = node.get("type")
+        if node_type == "use_statement":
+            if node["is_mutable"]:
+                return "it uses 'use mut'"
+            return "it reads outer variables with 'use'"
+        if node_type == "method_call":
+            method = node["method"]
+            if method in ("say", "ask"):
+                return f"it calls {method}()"
+            target = _base_name(node.get("target"))
+            if method in MUTATING_METHODS and target in argument_names:
+                return f"it mutates its argument '{target}' with {method}()"
+            if definitions is not None and method in CALLBACK_METHODS:
+                for arg in callback_args(node):
+                    if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                        arg = arg["value"]
+                    name = _base_name(arg)
+                    if isinstance(arg, dict) and arg.get("type") == "const" and isinstance(arg["value"], str):
+                        name = arg["value"]
+                    if name in definitions:
+                        reason = _call_purity_error(name, [], set(), definitions, seen)
+                        if reason is not None:
+                            return reason
+        if node_type == "index_assign" and node["target"] in argument_names:
+            return f"it mutates its argument '{node['target']}'"
+        if node_type == "function_call" and definitions is not None:
+            reason = _call_purity_error(node["name"], node["args"], argument_names, definitions, seen)
+            if reason is not None:
+                return reason
+    return None
+
+
+def _call_purity_error(name, args, argument_names, definitions, seen):
+    functions = definitions.get(name)
+    if not functions:
+        return f"it calls '{name}', which is not defined"
+    for func in functions:
+        params = func.get("params", [])
+        # Parameters that receive one of the caller's arguments or aliases
+        passed = set()
+        position = 0
+        for arg in args:
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                if _base_name(arg["value"]) in argument_names:
+                    passed.add(arg["name"])
+            else:
+                if position < len(params) and _base_name(arg) in argument_names:
+                    passed.add(params[position])
+                position += 1
+        key = (id(func), frozenset(passed))
+        if key in seen:
+            continue
+        seen.add(key)
+        reason = _purity_error(passed, _parsed_body(func, definitions), definitions, seen)
+        if reason is not None:
+            # "it calls say()" becomes "it calls 'log', which calls say()"
+            return f"it calls '{name}', which {reason[len('it '):]}"
+    return None
+
+
+def _collect_definitions(ast, definitions):
+    for node in walk_nodes(ast):
+        if node.get("type") == "func_def":
+            definitions.setdefault(node["name"], []).append(node)
+
+
+def _parsed_body(func_node, definitions):
+    body = func_node.get("body")
+    if not isinstance(body, (list, dict)):
+        # A lazily parsed body is parsed now, and the functions it defines recorded
+        body = body.parse()
+        _collect_definitions(body, definitions)
+    return body
+
+
+def check_memo_functions(ast, definitions=None):
+    """Reject `memo fn`s that reach impure code through the functions they call.
+
+    The parser checks each memo function's own body; this pass follows its
+    calls, which needs every function definition. `definitions` collects
+    them by name. Stream mode passes the same dict with each statement, so
+    a memo function there may only call functions defined before it.
+    """
+    if definitions is None:
+        definitions = {}
+    _collect_definitions(ast, definitions)
+    for node in list(walk_nodes(ast)):
+        if node.get("type") == "func_def" and node.get("memo") is not None:
+            reason = memo_purity_error(node["params"], _parsed_body(node, definitions), definitions)
+            if reason is not None:
+                raise SyntaxError(f"Function '{node['name']}' cannot be memoized because {reason}")
+
+
+def _top_level_functions(statements):
+    """Function definitions that are not nested inside another function."""
+    for stmt in statements:
+        if not isinstance(stmt, dict):
+            continue
+        if stmt.get("type") == "func_def":
+            yield stmt
+            continue
+        for key in ("body", "else_body"):
+            branch = stmt.get(key)
+            if isinstance(branch, list):
+                yield from _top_level_functions(branch)
+
+
+def _rebound_names(nodes):
+    """Count the assignments that rebind each name.
+
+    Untyped assignments rebind, and so does every typed declaration of a
+    name after its first one.
+    """
+    rebound = Counter()
+    declared = set()
+    for node in nodes:
+        if node.get("type") != "assign":
+            continue
+        name = node["target"]
+        if node.get("var_type") and name not in declared:
+            declared.add(name)
+        else:
+            rebound[name] += 1
+    return rebound
+
+
+def _annotate_closure(func_node, outer_rebound):
+    body = func_node.get("body")
+    if not isinstance(body, (list, dict)):
+        return
+
+    params = set(func_node.get("params", []))
+    variables = set()
+    functions = set()
+    declared = set()
+    nodes = list(walk_nodes(body))
+    writes = _rebound_names(nodes)
+    for node in nodes:
+        node_type = node.get("type")
+        if node_type == "identifier":
+            variables.add(node["name"])
+        elif node_type == "assign":
+            variables.add(node["target"])
+            if node.get("var_type"):
+                declared.add(node["target"])
+        elif node_type == "index_assign":
+            variables.add(node["target"])
+        elif node_type == "use_statement":
+            variables.update(node["variables"])
+        elif node_type == "function_call":
+            functions.add(node["name"])
+        elif node_type == "method_call" and node["method"] in CALLBACK_METHODS:
+            # order() and heap() may name their comparator or key function with a string
+            for arg in callback_args(node):
+                if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                    arg = arg["value"]
+                if not isinstance(arg, dict) or arg.get("type") not in ("identifier", "const"):
+                    return
+                if arg.get("type") == "const" and isinstance(arg["value"], str):
+                    functions.add(arg["value"])
+        elif node_type == "watch_statement":
+            # Watching an outer variable needs the real enclosing scopes
+            return
+        elif node_type == "func_def" and not isinstance(node.get("body"), (list, dict)):
+            return
+
+    # Captured values are copied, so the function must not rebind them, and
+    # neither may the code around it while the function is alive.
+    free = variables - declared - params
+    rebound_outside = {name for name, count in outer_rebound.items() if count > writes[name]}
+    if set(writes) & free or free & rebound_outside:
+        return
+    func_node["captures"] = {"variables": sorted(variables - params), "functions": sorted(functions)}
+
+
+def annotate_closures(ast):
+    """Record which outer variables and functions each nested `fn` refers to.
+
+    Nested functions whose captures are safe to copy get a "captures" entry,
+    letting the interpreter link them to a small closure scope instead of
+    keeping every enclosing scope alive. Captures are unsafe when the
+    function or its enclosing function rebinds a captured name.
+    """
+    for outer in _top_level_functions(ast):
+        body = outer.get("body")
+        if not isinstance(body, list):
+            continue
+        nodes = list(walk_nodes(body))
+        rebound = _rebound_names(nodes)
+        for node in nodes:
+            if node.get("type") == "func_def" and "captures" not in node:
+                _annotate_closure(node, rebound)
+
+
+def check_scopes(ast):
+    """Run the static `use`/`use mut` checker; see `ScopeChecker`."""
+    return ScopeChecker().check(ast)
+
+
+# Result types of built-in methods that do not depend on their target.
+_BUILTIN_RESULT_TYPES = {
+    "ask": "str", "asInt": "int", "asFloat": "float", "asBool": "bool", "asString": "str", "type": "str",
+    "trim": "str", "upperCase": "str", "lowerCase": "str", "format": "str", "length": "int", "countOf": "int",
+    "find": "int", "keys": "list", "values": "list", "pairs": "list", "has": "bool", "union": "set", "intersect": "set",
+    "deque": "deque", "heap": "heap",
+}
+_STATIC_TYPES = {
+    bool: "bool", int: "int", float: "float", str: "str", list: "list", dict: "hash", set: "set", type(None): "null"
+}
+_LEGACY_LITERAL_TYPES = {"int": "int", "float": "float", "string": "str", "boolean": "bool", "null": "null"}
+_DECLARABLE_TYPES = frozenset({"int", "float", "str", "bool", "list", "hash", "set", "deque", "heap"})
+
+
+def _known_type(declared):
+    """`declared` when it names a built-in type; hash-shaped aliases are unknown."""
+    return declared if isinstance(declared, str) and declared in _DECLARABLE_TYPES else None
+
+
+def _proves(static_type, declared_type):
+    """True when every value of `static_type` passes a check against `declared_type`."""
+    if declared_type == "dynamic":
+        return True
+    # A bool is an int to the runtime check
+    return static_type is not None and (
+        static_type == declared_type or (static_type == "bool" and declared_type == "int")
+    )
+
+
+def _binary_result(op, left, right):
+    if op in ("==", "!=", "<", ">", "<=", ">=", "&&", "||", "in", "!in"):
+        return "bool"
+    numbers = ("int", "bool", "float")
+    if left in numbers and right in numbers:
+        if "float" in (left, right):
+            return "float"
+        # int division truncates, but only for exact ints; a bool operand
+        # (which an int variable may hold) makes `/` return a float
+        return "int" if op in ("+", "-", "*", "%") else None
+    if op == "+" and left == right and left in ("str", "list"):
+        return left
+    return None
+
+
+def _always_returns(statements):
+    for stmt in statements:
+        if not isinstance(stmt, dict):
+            continue
+        if stmt.get("type") == "return":
+            return True
+        if (
+            stmt.get("type") == "if"
+            and stmt.get("else_body")
+            and _always_returns(stmt["body"])
+            and _always_returns(stmt["else_body"])
+        ):
+            return True
+    return False
+
+
+class TypeChecker:
+    """Mark runtime type checks that can never fail, for `--verified` runs.
+
+    Expression types are inferred from literals, declarations, parameter and
+    return types and the signatures of built-in methods. Where an inferred
+    type always satisfies a check, the node is marked and the interpreter
+    skips that check:
+
+    - "type_checked" on an assignment whose value fits the variable's type
+    - "args_checked" on a function every call site passes matching arguments
+    - "return_checked" on a function whose every return fits its return type
+    - "item_checked" on a foreach whose items always fit the loop variable
+
+    An int-typed variable may hold a bool at runtime (bools pass int checks),
+    so inference never assumes an int is not a bool. `check()` returns the
+    number of checks marked. With `mark_checks=False` only the inferred
+    operand types of each operator and index expression are collected, in
+    `operators`.
+    """
+
+    def __init__(self, mark_checks=True):
+        self.mark_checks = mark_checks
+        self.marked = 0
+        self.operators = []  # (binary, unary or index node, static types of its operands)
+        self.functions = {}  # name -> func_def, for functions defined exactly once
+        self.call_sites = {}  # name -> [whether each call passes the declared types]
+        self.escaped = set()  # functions order() may call with runtime values
+        self.all_escaped = False
+        self._function_names = set()
+        self._returns = None  # static types returned by the function being checked
+        self._inline_params = []  # parameter types of the inlined bodies being checked
+
+    def check(self, ast, env=None):
+        """Check a program; `env` gives the types of names declared outside it."""
+        definitions = [node for node in walk_nodes(ast) if node.get("type") == "func_def"]
+        counts = Counter(node["name"] for node in definitions)
+        self._function_names = set(counts)
+        self.functions = {node["name"]: node for node in definitions if counts[node["name"]] == 1}
+        # Calls inside deferred bodies are not visible until they are parsed
+        lazy = any(not isinstance(node.get("body"), (list, dict)) for node in definitions)
+
+        self._check_block(ast, declared_types(ast, dict(env or {})))
+
+        if not lazy and not self.all_escaped:
+            for name, func_node in self.functions.items():
+                if name not in self.escaped and all(self.call_sites.get(name, ())):
+                    self._mark(func_node, "args_checked")
+        return self.marked
+
+    def _mark(self, node, flag):
+        if not self.mark_checks:
+            return
+        node[flag] = True
+        self.marked += 1
+
+    def _check_block(self, statements, env):
+        for stmt in statements:
+            if isinstance(stmt, dict):
+                self._check_statement(stmt, env)
+
+    def _check_statement(self, node, env):
+        node_type = node.get("type")
+
+        if node_type in ("assign", "const_decl"):
+            value_type = self._expr_type(node["value"], env)
+            declared = node.get("var_type") or env.get(node["target"])
+            if declared and _proves(value_type, declared):
+                self._mark(node, "type_checked")
+        elif node_type == "index_assign":
+            for index in node["indices"]:
+                self._expr_type(index, env)
+            self._expr_type(node["value"], env)
+        elif node_type in ("if", "while"):
+            self._expr_type(node["condition"], env)
+            self._check_block(node["body"], env)
+            if node.get("else_body"):
+                self._check_block(node["else_body"], env)
+        elif node_type == "for":
+            for key in ("start", "end", "by"):
+                self._expr_type(node[key], env)
+            self._check_block(node["body"], env)
+        elif node_type == "foreach":
+            self._check_foreach(node, env)
+            self._check_block(node["body"], env)
+        elif node_type == "return":
+            value_type = self._expr_type(node["value"], env) if node.get("value") else "null"
+            if self._returns is not None:
+                self._returns.append(value_type)
+        elif node_type == "func_def":
+            self._check_function(node, env)
+        elif node_type in ("use_statement", "watch_statement", "break", "continue"):
+            pass
+        else:
+            self._expr_type(node, env)
+
+    def _check_foreach(self, node, env):
+        var_type = node["var_type"]
+        iterable = node["iterable"]
+        iterable_type = self._expr_type(iterable, env)
+        if var_type == "dynamic":
+            proven = True
+        elif iterable_type == "str":
+            proven = _proves("str", var_type)
+        elif iterable.get("type") == "const_list" and _known_type(var_type):
+            proven = all(_proves(_STATIC_TYPES.get(type(item)), var_type) for item in iterable["value"])
+        elif iterable.get("type") in ("list", "set"):
+            proven = all(_proves(self._expr_type(item, env), var_type) for item in iterable["elements"])
+        else:
+            proven = False
+        if proven:
+            self._mark(node, "item_checked")
+
+    def _check_function(self, func_node, env):
+        body = func_node.get("body")
+        if not isinstance(body, (list, dict)):
+            return
+        env = function_types(func_node, env)
+        return_type = func_node.get("return_type")
+
+        if func_node.get("inline"):
+            returns = [self._expr_type(body, env)]
+            always_returns = True
+        else:
+            outer_returns, self._returns = self._returns, []
+            try:
+                self._check_block(body, env)
+                returns = self._returns
+            finally:
+                self._returns = outer_returns
+            always_returns = _always_returns(body)
+
+        if return_type == "void":
+            proven = all(value_type == "null" for value_type in returns)
+        else:
+            proven = always_returns and all(_proves(value_type, return_type) for value_type in returns)
+        if return_type and proven:
+            self._mark(func_node, "return_checked")
+
+    def _arg_types(self, args, env):
+        positional = []
+        keywords = {}
+        for arg in args:
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                keywords[arg["name"]] = self._expr_type(arg["value"], env)
+            else:
+                positional.append(self._expr_type(arg, env))
+        return positional, keywords
+
+    def _args_match(self, params, param_types, positional, keywords):
+        if len(positional) + len(keywords) != len(params):
+            return False
+        bound = dict(zip(params, positional))
+        bound.update(keywords)
+        if set(bound) != set(params):
+            return False
+        return all(param not in param_types or _proves(bound[param], param_types[param]) for param in params)
+
+    def _result_type(self, return_type):
+        if return_type == "void":
+            return "null"
+        return _known_type(return_type)
+
+    def _check_order_args(self, args):
+        # order() and heap() may name their comparator or key function at runtime
+        for arg in args:
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                arg = arg["value"]
+            if isinstance(arg, dict) and arg.get("type") == "const" and isinstance(arg["value"], str):
+                self.escaped.add(arg["value"])
+            elif isinstance(arg, dict) and arg.get("type") == "identifier" and arg["name"] in self._function_names:
+                self.escaped.add(arg["name"])
+            else:
+                self.all_escaped = True
+
+    def _expr_type(self, expr, env):
+        """Infer the static type of `expr`, recording the calls it makes."""
+        if not isinstance(expr, dict):
+            return _STATIC_TYPES.get(type(expr))
+        expr_type = expr.get("type")
+
+        if expr_type == "const":
+            return _STATIC_TYPES.get(type(expr["value"]))
+        if expr_type == "const_list":
+            return "list"
+        if expr_type == "const_hash":
+            return "hash"
+        if expr_type in _LEGACY_LITERAL_TYPES:
+            return _LEGACY_LITERAL_TYPES[expr_type]
+        if expr_type == "identifier":
+            return _known_type(env.get(expr["name"]))
+        if expr_type == "inline_param":
+            return self._inline_params[-1][expr["index"]]
+        if expr_type == "hoisted":
+            return self._expr_type(expr["expr"], env)
+        if expr_type in ("list", "set"):
+            for element in expr["elements"]:
+                self._expr_type(element, env)
+            return expr_type
+        if expr_type == "hash":
+            for pair in expr["pairs"]:
+                self._expr_type(pair["value"], env)
+            return "hash"
+        if expr_type == "string_interpolation":
+            for part in expr["parts"]:
+                self._expr_type(part, env)
+            return "str"
+        if expr_type == "binary":
+            left = self._expr_type(expr["left"], env)
+            right = self._expr_type(expr["right"], env)
+            self.operators.append((expr, (left, right)))
+            return _binary_result(expr["operator"], left, right)
+        if expr_type == "unary":
+            operand = self._expr_type(expr["operand"], env)
+            self.operators.append((expr, (operand,)))
+            if expr["operator"] == "!":
+                return "bool"
+            if operand == "bool":
+                return "int"
+            return operand if operand in ("int", "float") else None
+        if expr_type == "index":
+            target = self._expr_type(expr["target"], env)
+            index = self._expr_type(expr["index"], env)
+            self.operators.append((expr, (target, index)))
+            return "str" if target == "str" else None
+        if expr_type == "function_call":
+            positional, keywords = self._arg_types(expr["args"], env)
+            func_node = self.functions.get(expr["name"])
+            if func_node is None:
+                return None
+            self.call_sites.setdefault(expr["name"], []).append(
+                self._args_match(func_node["params"], func_node.get("param_types") or {}, positional, keywords)
+            )
+            return self._result_type(func_node.get("return_type"))
+        if expr_type == "inline_call":
+            return self._check_inline_call(expr, env)
+        if expr_type == "method_call":
+            return self._method_type(expr, env)
+
+        # Unknown expression: make sure no call inside it is treated as checked
+        for node in walk_nodes(expr):
+            if node.get("type") == "function_call":
+                self.call_sites.setdefault(node["name"], []).append(False)
+            elif node.get("type") == "method_call" and node["method"] in CALLBACK_METHODS:
+                self.all_escaped = True
+        return None
+
+    def _check_inline_call(self, node, env):
+        func = node["function"]
+        positional, keywords = self._arg_types(node["args"], env)
+        param_types = func.get("param_types") or {}
+        if self._args_match(func["params"], param_types, positional, keywords):
+            self._mark(func, "args_checked")
+        # After the argument check, each parameter has its declared type
+        self._inline_params.append([self._result_type(param_types.get(param)) for param in func["params"]])
+        try:
+            body_type = self._expr_type(node["body"], env)
+        finally:
+            self._inline_params.pop()
+        return_type = func.get("return_type")
+        if return_type and return_type != "void" and _proves(body_type, return_type):
+            self._mark(func, "return_checked")
+        return self._result_type(return_type)
+
+    def _method_type(self, node, env):
+        method = node["method"]
+        target = node.get("target")
+        target_type = self._expr_type(target, env) if target is not None else None
+        positional, _ = self._arg_types(node["args"], env)
+        if method in CALLBACK_METHODS:
+            self._check_order_args(callback_args(node))
+        if method in _BUILTIN_RESULT_TYPES:
+            return _BUILTIN_RESULT_TYPES[method]
+        subject = target_type if target is not None else (positional[0] if positional else None)
+        if method == "reverse" and subject in ("str", "list"):
+            return subject
+        if method == "clone" and subject in ("list", "hash", "set", "deque", "heap"):
+            return subject
+        return None
+
+
+def check_types(ast):
+    """Run the static type checker; see `TypeChecker`."""
+    return TypeChecker().check(ast)
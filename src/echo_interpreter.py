@@ -1,5 +1,148 @@
+import copy
+import heapq
+import operator
+import time
+from collections import OrderedDict, deque
 from functools import cmp_to_key
 
+from echo_analyzer import (
+    MUTATING_METHODS,
+    ScopeChecker,
+    TypeChecker,
+    annotate_closures,
+    check_memo_functions,
+    walk_nodes,
+)
+from echo_parser import LazyFunctionBody
+
+
+class _Reversed:
+    """Sort key wrapper that inverts the order of `key`, for max-heaps."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class Heap:
+    """Priority queue behind Echo's `heap` type, built on heapq.
+
+    pop() returns the value with the smallest key, or the largest when
+    `descending`. `key` maps a value to its key; without one a value is
+    its own key. Values with equal keys come out in the order they were
+    pushed.
+    """
+
+    def __init__(self, key=None, key_name=None, descending=False):
+        self.key = key
+        self.key_name = key_name
+        self.descending = descending
+        self._entries = []  # (key, push count, value), in heap order
+        self._pushed = 0
+
+    def push(self, value):
+        key = value if self.key is None else self.key(value)
+        if self.descending:
+            key = _Reversed(key)
+        entry = (key, self._pushed, value)
+        if self._entries:
+            # Compare up front so a failed push leaves the heap unchanged
+            try:
+                entry < self._entries[0]
+            except TypeError:
+                if self.key_name is not None:
+                    raise TypeError(f"Key function '{self.key_name}' returned values that cannot be compared")
+                raise TypeError(f"Cannot compare {type(value).__name__} with the values in this heap")
+        heapq.heappush(self._entries, entry)
+        self._pushed += 1
+
+    def pop(self):
+        if not self._entries:
+            raise IndexError("Cannot pop from empty heap")
+        return heapq.heappop(self._entries)[2]
+
+    def peek(self):
+        if not self._entries:
+            raise IndexError("Cannot peek at empty heap")
+        return self._entries[0][2]
+
+    def copy(self):
+        clone = Heap(self.key, self.key_name, self.descending)
+        clone._entries = list(self._entries)
+        clone._pushed = self._pushed
+        return clone
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        """Values in the order pop() would return them."""
+        return iter([entry[2] for entry in sorted(self._entries)])
+
+    def __contains__(self, value):
+        return any(entry[2] == value for entry in self._entries)
+
+
+class EchoSet:
+    """Unordered collection behind Echo's `set` type.
+
+    Elements are keyed by their type as well as their value, so `1`, `1.0`
+    and `true` are three different elements, where a Python set would treat
+    them as one. Elements must be hashable; callers check that first.
+    """
+
+    __slots__ = ("_items",)
+
+    def __init__(self, values=()):
+        self._items = {}  # (type, value) -> value
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        self._items.setdefault((type(value), value), value)
+
+    def remove(self, value):
+        del self._items[(type(value), value)]
+
+    def union(self, other):
+        result = self.copy()
+        for key, value in other._items.items():
+            result._items.setdefault(key, value)
+        return result
+
+    def intersect(self, other):
+        result = EchoSet()
+        result._items = {key: value for key, value in self._items.items() if key in other._items}
+        return result
+
+    def copy(self):
+        clone = EchoSet()
+        clone._items = dict(self._items)
+        return clone
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __contains__(self, value):
+        try:
+            return (type(value), value) in self._items
+        except TypeError:
+            # An unhashable value is never an element
+            return False
+
+    def __eq__(self, other):
+        return isinstance(other, EchoSet) and self._items.keys() == other._items.keys()
+
 
 TYPE_MAP = {
     "int": int,
@@ -8,6 +151,9 @@ TYPE_MAP = {
     "bool": bool,
     "list": list,
     "hash": dict,
+    "set": EchoSet,
+    "deque": deque,
+    "heap": Heap,
 }
 
 # Parameter name lists for built-in methods, used to support keyword arguments.
@@ -32,6 +178,23 @@ BUILTIN_PARAMS = {
     "merge":       ["other"],
     "ensure":      ["key", "default"],
     "take":        ["key"],
+    "add":         ["value"],
+    "has":         ["value"],
+    "remove":      ["value"],
+    "union":       ["other"],
+    "intersect":   ["other"],
+    "deque":       ["items"],
+    "pushFront":   ["value"],
+    "pushBack":    ["value"],
+    "heap":        ["items"],
+}
+
+# Options that can only be passed by keyword. They are kept as keyword_arg nodes
+# after the positional slots so the method can tell them apart.
+_BUILTIN_KEYWORD_ONLY_PARAMS = {
+    "order": ["by", "descending"],
+    "deque": ["maxLength"],
+    "heap": ["by", "descending"],
 }
 
 # For built-ins that can also be called standalone (no target), the first arg is the target value.
@@ -40,14 +203,42 @@ _BUILTIN_STANDALONE_PARAMS = {
     "countOf": ["items", "value"],
 }
 
-try:
-    from rich.console import Console
-    from rich.panel import Panel
-except ImportError:
-    Console = None
-    Panel = None
+# Rich is imported on first use; until then both names hold RICH_NOT_LOADED.
+# After loading they are the Rich classes, or None when Rich is not installed.
+RICH_NOT_LOADED = object()
+Console = RICH_NOT_LOADED
+Panel = RICH_NOT_LOADED
+_RICH_IMPORT_SECONDS = None
+
+
+def load_rich():
+    """Import Rich once per process and return `(Console, Panel)`."""
+    global Console, Panel, _RICH_IMPORT_SECONDS
+    if Console is RICH_NOT_LOADED:
+        started = time.perf_counter()
+        try:
+            from rich.console import Console
+            from rich.panel import Panel
+        except ImportError:
+            Console = None
+            Panel = None
+        _RICH_IMPORT_SECONDS = time.perf_counter() - started
+    return Console, Panel
+
+
+def rich_import_seconds():
+    """Time spent importing Rich, or None if it has not been needed yet."""
+    return _RICH_IMPORT_SECONDS
 
 _RICH_WARNINGS_ENABLED = True
+_WARNING_CONSOLE = None
+
+# Each distinct warning is shown once per source location, and at most
+# WARNING_LIMIT_PER_KIND distinct warnings of one kind are shown per run.
+WARNING_LIMIT_PER_KIND = 10
+_warnings_seen = set()
+_warnings_shown = {}  # kind -> number of warnings displayed
+_warnings_suppressed = {}  # kind -> number of repeats or over-limit warnings hidden
 
 
 def set_rich_warnings_enabled(enabled: bool):
@@ -55,12 +246,247 @@ def set_rich_warnings_enabled(enabled: bool):
     _RICH_WARNINGS_ENABLED = enabled
 
 
-def _print_warning(message: str):
-    if _RICH_WARNINGS_ENABLED and Console is not None and Panel is not None:
-        Console().print(Panel(message, title="Warning", border_style="yellow", expand=False))
+def reset_warnings():
+    """Forget previously reported warnings, e.g. at the start of a new run."""
+    _warnings_seen.clear()
+    _warnings_shown.clear()
+    _warnings_suppressed.clear()
+
+
+def _warning_console():
+    global _WARNING_CONSOLE
+    if _WARNING_CONSOLE is None:
+        _WARNING_CONSOLE = Console()
+    return _WARNING_CONSOLE
+
+
+def _emit_warning(message: str, title: str = "Warning"):
+    if _RICH_WARNINGS_ENABLED and None not in load_rich():
+        _warning_console().print(Panel(message, title=title, border_style="yellow", expand=False))
+        return
+
+    print(f"{title}: {message}")
+
+
+def _print_warning(message: str, kind: str = "general", line=None):
+    key = (kind, message, line)
+    if key in _warnings_seen or _warnings_shown.get(kind, 0) >= WARNING_LIMIT_PER_KIND:
+        _warnings_suppressed[kind] = _warnings_suppressed.get(kind, 0) + 1
+        return
+
+    _warnings_seen.add(key)
+    _warnings_shown[kind] = _warnings_shown.get(kind, 0) + 1
+    if line is not None:
+        message = f"Line {line}: {message}"
+    _emit_warning(message)
+
+
+def print_warning_summary():
+    """Report how many repeated or over-limit warnings were hidden, if any."""
+    if not _warnings_suppressed:
         return
+    total = sum(_warnings_suppressed.values())
+    details = ", ".join(f"{kind}: {count}" for kind, count in sorted(_warnings_suppressed.items()))
+    _emit_warning(f"{total} repeated warning(s) suppressed ({details})", title="Warning Summary")
+
+def _memo_key(value):
+    """Hashable, type-aware form of an argument value for memo lookups."""
+    if isinstance(value, list):
+        return ("list", tuple(_memo_key(item) for item in value))
+    if isinstance(value, dict):
+        return ("hash", tuple((key, _memo_key(item)) for key, item in value.items()))
+    if isinstance(value, EchoSet):
+        return ("set", frozenset(value._items))
+    if isinstance(value, deque):
+        return ("deque", value.maxlen, tuple(_memo_key(item) for item in value))
+    if isinstance(value, Heap):
+        return ("heap", value.key_name, value.descending, tuple(_memo_key(item) for item in value))
+    # The type name keeps true/1 and 1/1.0 apart
+    return (type(value).__name__, value)
+
+
+# Echo values that cannot be hash keys or set elements
+_UNHASHABLE_TYPES = (list, dict, EchoSet, deque, Heap)
+
+
+def _set_element(value):
+    """Check that `value` can be stored in an Echo set."""
+    if isinstance(value, _UNHASHABLE_TYPES):
+        raise TypeError(f"Set elements must be int, float, str, bool or null, not {_ECHO_TYPE_NAMES[type(value)]}")
+    return value
+
+
+def _new_set(values):
+    return EchoSet(_set_element(value) for value in values)
+
+
+class MemoStats:
+    """Hit/miss counters for one memoized function, shared by all its definitions."""
+
+    def __init__(self, name, max_size):
+        self.name = name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def _copy_result(value):
+    """A copy of `value` that shares nothing mutable with it."""
+    # Every mutable Echo value is a collection
+    return copy.deepcopy(value) if isinstance(value, _UNHASHABLE_TYPES) else value
+
+
+class MemoCache:
+    """LRU cache of results for a `memo fn`, keyed on argument values."""
+
+    def __init__(self, max_size, stats):
+        self.max_size = max_size
+        self.stats = stats
+        self.entries = OrderedDict()
+
+    def key(self, arg_values):
+        try:
+            return tuple(_memo_key(value) for value in arg_values)
+        except TypeError:
+            return None
+
+    def lookup(self, key):
+        """Return (True, result) on a hit, (False, None) on a miss."""
+        if key is not None and key in self.entries:
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            # Callers may mutate returned collections; keep the cached copy intact
+            return True, _copy_result(self.entries[key])
+        self.stats.misses += 1
+        return False, None
+
+    def store(self, key, result):
+        if key is None:
+            return
+        self.entries[key] = _copy_result(result)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+# Calls profiled before a function with untyped or dynamic parameters is
+# specialized for the argument types it was called with.
+FEEDBACK_CALLS = 20
+
+_ECHO_TYPE_NAMES = {
+    int: "int", float: "float", str: "str", bool: "bool", list: "list", dict: "hash", EchoSet: "set", deque: "deque",
+    Heap: "heap", type(None): "null",
+}
+
+
+class FeedbackStats:
+    """Specialization counters for one function, shared by all its definitions."""
+
+    def __init__(self, name):
+        self.name = name
+        self.signature = None  # argument types of the specialized version
+        self.hits = 0
+        self.deopts = 0
+
+
+class TypeFeedback:
+    """Argument-type profile of a function definition, and its specialized version.
+
+    The first FEEDBACK_CALLS calls record the types of the arguments. If
+    they never change, the body is copied and specialized for those types.
+    Later calls with the same argument types (the guard) run the copy; any
+    other call deoptimizes to the generic body. A function called with
+    varying types during profiling is left generic.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.signature = None
+        self.calls = 0
+        self.variant = None
+        self.active = True
+
+    def select(self, func, arg_values):
+        """The version of `func` to run for these arguments."""
+        if not self.active:
+            return func
+        signature = tuple(map(type, arg_values))
+        if self.variant is not None:
+            if signature == self.signature:
+                self.stats.hits += 1
+                return self.variant
+            self.stats.deopts += 1
+            return func
+
+        if self.signature is None:
+            self.signature = signature
+        elif signature != self.signature:
+            self.active = False
+            return func
+        self.calls += 1
+        if self.calls >= FEEDBACK_CALLS:
+            self.variant = _specialize_function(self.stats.name, func, signature)
+            if self.variant is None:
+                self.active = False
+            else:
+                self.stats.signature = signature
+        return func
+
+
+def _wants_feedback(func):
+    return any(func["param_types"].get(param) in (None, "dynamic") for param in func["params"])
+
+
+def _specialize_function(name, func, signature):
+    """Copy of `func` whose body is specialized for arguments of the given types.
+
+    Returns None when there is nothing to specialize.
+    """
+    body = func["body"]
+    if not isinstance(body, (list, dict)):
+        return None
+    nodes = list(walk_nodes(body))
+    # A parameter the body rebinds may change type, so keep its declared type
+    rebound = {node["target"] for node in nodes if node.get("type") == "assign"}
+    imported = {name for node in nodes if node.get("type") == "use_statement" for name in node["variables"]}
+
+    param_types = {}
+    args_checked = func["args_checked"]
+    all_pass = True
+    for param, arg_type in zip(func["params"], signature):
+        declared = func["param_types"].get(param)
+        if declared not in (None, "dynamic") and not (
+            isinstance(declared, str) and declared in TYPE_MAP and issubclass(arg_type, TYPE_MAP[declared])
+        ):
+            all_pass = False
+        if param not in rebound and arg_type in _ECHO_TYPE_NAMES:
+            param_types[param] = _ECHO_TYPE_NAMES[arg_type]
+        elif declared is not None:
+            param_types[param] = declared
+    if all_pass:
+        # The guard only admits arguments that pass the declared types
+        args_checked = True
+
+    func_node = {
+        "type": "func_def",
+        "name": name,
+        "params": func["params"],
+        "param_types": param_types,
+        "return_type": func["return_type"],
+        "inline": func["inline"],
+        "body": copy.deepcopy(body),
+    }
+    checker = TypeChecker()
+    # Names imported with `use` are declared outside, with types unknown here
+    checker.check([func_node], {name: None for name in imported})
+    specialize_operators(checker.operators)
+
+    variant = dict(func, body=func_node["body"], args_checked=args_checked)
+    variant["return_checked"] = func["return_checked"] or func_node.get("return_checked", False)
+    variant.pop("feedback", None)
+    return variant
 
-    print(f"Warning: {message}")
 
 class Context:
     def __init__(self, parent=None):
@@ -72,6 +498,10 @@ class Context:
         self.in_function = False  # Track if we're inside a function
         self.imported_vars = {}  # Track imported variables and their mutability
         self.watched_vars = set()  # Track watched variables in this scope
+        self.constants = set()  # Names declared with `const` in this scope
+        # Set when the static scope checker has verified the program, so the
+        # per-operation `use`/`use mut` checks can be skipped.
+        self.scope_checked = parent.scope_checked if parent is not None else False
 
     def watch_variable(self, name):
         """Add a variable to the watch list for this scope"""
@@ -82,29 +512,35 @@ class Context:
 
     def is_variable_defined(self, name):
         """Check if a variable is defined in this scope or any parent scope"""
-        if name in self.variables:
-            return True
-        if self.parent:
-            return self.parent.is_variable_defined(name)
+        current = self
+        while current is not None:
+            if name in current.variables:
+                return True
+            current = current.parent
         return False
 
     def is_watched(self, name):
         """Check if a variable is being watched in this scope or any parent scope"""
-        if name in self.watched_vars:
-            return True
-        if self.parent:
-            return self.parent.is_watched(name)
-        return False
+        return self.get_watch_context(name) is not None
 
     def get_watch_context(self, name):
         """Get the context where a variable is being watched"""
-        if name in self.watched_vars:
-            return self
-        if self.parent:
-            return self.parent.get_watch_context(name)
+        current = self
+        while current is not None:
+            if name in current.watched_vars:
+                return current
+            current = current.parent
         return None
 
     def get(self, name):
+        if self.scope_checked:
+            current = self
+            while current is not None:
+                if name in current.variables:
+                    return current.variables[name]
+                current = current.parent
+            return None
+
         # If we're in a function, check if the variable is imported
         if self.in_function:
             current = self
@@ -120,64 +556,67 @@ class Context:
                     return value
                 current = current.parent
 
+            # Constants can be read from any function without `use`
+            while current is not None:
+                if name in current.constants:
+                    return current.variables[name]
+                current = current.parent
             raise NameError(f"Variable '{name}' used without 'use' statement in function")
             
         # For non-function contexts, check local then parent
-        value = self.variables.get(name)
-        if value is None and self.parent:
-            return self.parent.get(name)
-        return value
+        current = self
+        while current is not None:
+            value = current.variables.get(name)
+            if value is not None:
+                return value
+            current = current.parent
+        return None
+
+    def _function_binding(self, name):
+        """Classify the nearest binding of a name inside the current function.
+
+        Returns "local", "mutable_import", "immutable_import", or None when the
+        name is not bound anywhere in the function's scopes.
+        """
+        current = self
+        while current and current.in_function:
+            if name in current.variables:
+                return "local"
+            if name in current.imported_vars:
+                return "mutable_import" if current.imported_vars[name] else "immutable_import"
+            current = current.parent
+        return None
 
     def set(self, name, value, var_type=None):
         # If we're in a function, check if we can modify the variable
         if self.in_function:
-            if name in self.imported_vars:
-                if not self.imported_vars[name]:
-                    raise NameError(f"Cannot modify immutable import '{name}', use 'use mut' to make it mutable")
-                # Find the context where the variable is defined
-                current = self
-                while current:
-                    if name in current.variables:
-                        current.variables[name] = value
-                        return
-                    current = current.parent
-            else:
-                if var_type is None:
-                    current = self
-                    while current and current.in_function:
-                        if name in current.variables:
-                            current.variables[name] = value
-                            return
-                        current = current.parent
-
-                    raise NameError(f"Cannot modify global variable '{name}' without 'use mut'")
-
-                if name not in self.variables and self.parent and not self.parent.in_function and name in self.parent.variables:
-                    _print_warning(f"Variable '{name}' shadows a global variable")
-                    self.variables[name] = value
-                    if var_type:
-                        self.types[name] = var_type
+            if var_type is None or name in self.imported_vars:
+                if not self.scope_checked:
+                    binding = self._function_binding(name)
+                    if binding == "immutable_import":
+                        raise NameError(f"Cannot modify immutable import '{name}', use 'use mut' to make it mutable")
+                    if binding is None:
+                        raise NameError(f"Cannot modify global variable '{name}' without 'use mut'")
+                # Writing through an import updates the existing variable
+                var_type = None
+            elif (
+                not self.scope_checked
+                and name not in self.variables
+                and self.parent
+                and not self.parent.in_function
+                and name in self.parent.variables
+            ):
+                _print_warning(f"Variable '{name}' shadows a global variable", "shadowed-variable")
+
+        if var_type is None:
+            # Updating an existing variable — walk the chain to find where it lives
+            current = self
+            while current:
+                if name in current.variables:
+                    current.variables[name] = value
                     return
-        
-        # For non-function contexts or local variables
-        if name not in self.variables and self.parent:
-            if var_type is None:
-                # Updating an existing variable — walk the chain to find where it lives
-                current = self.parent
-                while current:
-                    if name in current.variables:
-                        # Found it — update in place
-                        current.variables[name] = value
-                        return
-                    if current.in_function and name in current.imported_vars:
-                        # It's a function's mutable import — let the function context handle it
-                        current.set(name, value, var_type)
-                        return
-                    current = current.parent
-                # Not found anywhere — fall through and create locally
-            elif name in self.parent.variables:
-                # New declaration shadows a parent variable — create locally
-                pass
+                current = current.parent
+            # Not found anywhere — fall through and create locally
 
         self.variables[name] = value
         if var_type:
@@ -205,20 +644,85 @@ class Context:
         raise NameError(f"Cannot import undefined variable '{name}'")
 
     def get_type(self, name):
-        type_val = self.types.get(name)
-        if type_val is None and self.parent:
-            return self.parent.get_type(name)
-        return type_val
+        current = self
+        while current is not None:
+            type_val = current.types.get(name)
+            if type_val is not None:
+                return type_val
+            current = current.parent
+        return None
 
-    def define_function(self, name, params, body, inline, param_types=None, return_type=None):
+    def define_function(
+        self, name, params, body, inline, param_types=None, return_type=None, memo=None,
+        args_checked=False, return_checked=False,
+    ):
         self.functions[name] = {
             "params": params,
             "body": body,
             "inline": inline,
             "param_types": param_types or {},  # Store parameter types, default to empty dict if not provided
-            "return_type": return_type  # Store return type
+            "return_type": return_type,  # Store return type
+            "memo": memo,  # MemoCache for `memo fn` definitions
+            "scope": self,  # Calls run in a frame linked to the defining scope
+            # Set when the type checker proved the argument or return checks always pass
+            "args_checked": args_checked,
+            "return_checked": return_checked,
         }
 
+    def capture_scope(self, captures):
+        """Build a closure scope holding only the bindings a nested function uses.
+
+        `captures` comes from annotate_closures(). The closure links straight
+        to the global scope, so the enclosing frames (and every variable in
+        them) are not kept alive by the function. Returns None when a captured
+        name cannot be copied safely; the function then keeps its full
+        defining scope.
+        """
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        closure = Context(parent=root)
+        closure.in_function = True
+
+        for name in captures["variables"]:
+            current = self
+            while current is not root:
+                if name in current.imported_vars or name in current.watched_vars:
+                    return None
+                if name in current.variables:
+                    closure.variables[name] = current.variables[name]
+                    if name in current.types:
+                        closure.types[name] = current.types[name]
+                    break
+                if name in current.functions:
+                    # Function names passed to order() are plain identifiers
+                    closure.functions[name] = current.functions[name]
+                    break
+                current = current.parent
+            else:
+                # Not bound yet; the enclosing function may declare it later
+                return None
+
+        for name in captures["functions"]:
+            current = self
+            while current is not root:
+                if name in current.functions:
+                    closure.functions[name] = current.functions[name]
+                    break
+                current = current.parent
+            else:
+                if name not in root.functions:
+                    # Possibly defined later in an enclosing scope
+                    return None
+        return closure
+
+    def _function_body(self, func):
+        body = func["body"]
+        if isinstance(body, LazyFunctionBody):
+            # Deferred bodies are parsed (and validated) on the first call
+            body = func["body"] = body.parse()
+        return body
+
     def resolve_function(self, name):
         current = self
         while current:
@@ -265,54 +769,21 @@ class Context:
 
         return bound_arguments
 
+    def evaluate_call_arguments(self, name, func, args, interpreter):
+        """Bind call arguments to `func`'s parameters and evaluate them here, in parameter order."""
+        bound_arguments = self._bind_function_arguments(name, func, args, interpreter)
+        return [interpreter.evaluate(bound_arguments[param], self) for param in func["params"]]
+
     def call_function(self, name, args, interpreter):
+        if interpreter.explicit_stack:
+            return interpreter._run_gen(interpreter._call_gen(self, name, args))
+
         func = self.resolve_function(name)
         if not func:
             raise Exception(f"Function '{name}' not defined")
 
-        # Create new context with current context as parent for closure support
-        new_context = Context(parent=self)
-        new_context.in_function = True  # Mark that we're inside a function
-        new_context.functions["__current_function"] = name  # Track current function name
-
-        bound_arguments = self._bind_function_arguments(name, func, args, interpreter)
-        
-        # Set parameters in the new context with type checking
-        for param in func["params"]:
-            value = interpreter.evaluate(bound_arguments[param], self)
-            param_type = func["param_types"].get(param)
-            
-            if param_type:  # Only check type if it was specified
-                if not interpreter._matches_type(value, param_type):
-                    raise TypeError(
-                        f"Argument '{param}' in function '{name}' must be of type "
-                        f"{interpreter._format_type(param_type)}, got {type(value).__name__}"
-                    )
-            
-            new_context.set(param, value, param_type)
-
-        if func["inline"]:
-            result = interpreter.evaluate(func["body"], new_context)
-        else:
-            try:
-                interpreter.execute_block(func["body"], new_context)
-                result = None
-            except ReturnValue as r:
-                result = r.value
-
-        # Validate return type if specified
-        if func["return_type"]:
-            if func["return_type"] == "void":
-                if result is not None:
-                    raise TypeError(f"Function '{name}' is declared as void but returns a value")
-            else:
-                if not interpreter._matches_type(result, func["return_type"]):
-                    raise TypeError(
-                        f"Function '{name}' must return type {interpreter._format_type(func['return_type'])}, "
-                        f"got {type(result).__name__}"
-                    )
-
-        return result
+        arg_values = self.evaluate_call_arguments(name, func, args, interpreter)
+        return self._run_function(name, func, arg_values, interpreter)
 
     def call_function_with_values(self, name, arg_values, interpreter):
         func = self.resolve_function(name)
@@ -324,10 +795,39 @@ class Context:
                 f"Function '{name}' expected {len(func['params'])} arguments, got {len(arg_values)}"
             )
 
-        new_context = Context(parent=self)
-        new_context.in_function = True
-        new_context.functions["__current_function"] = name
+        if interpreter.explicit_stack:
+            return interpreter._run_gen(interpreter._run_function_gen(self, name, func, arg_values))
+        return self._run_function(name, func, arg_values, interpreter)
+
+    def _run_function(self, name, func, arg_values, interpreter):
+        memo = func.get("memo")
+        if memo is None:
+            return self._run_function_body(name, func, arg_values, interpreter)
 
+        key = memo.key(arg_values)
+        found, result = memo.lookup(key)
+        if found:
+            return result
+        result = self._run_function_body(name, func, arg_values, interpreter)
+        memo.store(key, result)
+        return result
+
+    def _new_frame(self, name, func, arg_values, interpreter):
+        """Create the context a call to `func` runs in, with its parameters bound."""
+        # Link the frame to the scope the function was defined in, not the call
+        # site, so lookups depend on lexical nesting rather than call depth
+        new_context = Context(parent=func["scope"])
+        new_context.in_function = True  # Mark that we're inside a function
+        new_context.functions["__current_function"] = name  # Track current function name
+
+        # Set parameters in the new context with type checking
+        if not func.get("args_checked"):
+            self._check_argument_types(name, func, arg_values, interpreter)
+        for param, value in zip(func["params"], arg_values):
+            new_context.set(param, value, func["param_types"].get(param))
+        return new_context
+
+    def _check_argument_types(self, name, func, arg_values, interpreter):
         for index, param in enumerate(func["params"]):
             value = arg_values[index]
             param_type = func["param_types"].get(param)
@@ -336,18 +836,10 @@ class Context:
                     f"Argument '{param}' in function '{name}' must be of type "
                     f"{interpreter._format_type(param_type)}, got {type(value).__name__}"
                 )
-            new_context.set(param, value, param_type)
-
-        if func["inline"]:
-            result = interpreter.evaluate(func["body"], new_context)
-        else:
-            try:
-                interpreter.execute_block(func["body"], new_context)
-                result = None
-            except ReturnValue as r:
-                result = r.value
 
-        if func["return_type"]:
+    def _check_return_value(self, name, func, result, interpreter):
+        # Validate return type if specified
+        if func["return_type"] and not func.get("return_checked"):
             if func["return_type"] == "void":
                 if result is not None:
                     raise TypeError(f"Function '{name}' is declared as void but returns a value")
@@ -357,7 +849,30 @@ class Context:
                     f"got {type(result).__name__}"
                 )
 
-        return result
+    def _run_function_body(self, name, func, arg_values, interpreter):
+        while True:
+            version = func["feedback"].select(func, arg_values) if "feedback" in func else func
+            new_context = self._new_frame(name, version, arg_values, interpreter)
+
+            if version["inline"]:
+                result = interpreter.evaluate(version["body"], new_context)
+            else:
+                try:
+                    interpreter.execute_block(self._function_body(version), new_context)
+                    result = None
+                except ReturnValue as r:
+                    result = r.value
+                except TailCall as call:
+                    if call.func is func:
+                        # `return name(...)` in tail position: loop with the new
+                        # arguments instead of growing the Python stack
+                        arg_values = call.arg_values
+                        continue
+                    # The name resolved to a different function; make an ordinary call
+                    result = call.context._run_function(call.name, call.func, call.arg_values, interpreter)
+
+            self._check_return_value(name, version, result, interpreter)
+            return result
 
 
 class ReturnValue(Exception):
@@ -365,6 +880,15 @@ class ReturnValue(Exception):
         self.value = value
 
 
+class TailCall(Exception):
+    """Signal a self-call in tail position, carrying the evaluated arguments."""
+    def __init__(self, name, func, arg_values, context):
+        self.name = name
+        self.func = func
+        self.arg_values = arg_values
+        self.context = context
+
+
 class BreakException(Exception):
     """Signal to break out of a loop."""
     pass
@@ -375,13 +899,707 @@ class ContinueException(Exception):
     pass
 
 
+def _contains_call(node):
+    """True if evaluating `node` can call an Echo function (function bodies excluded)."""
+    if isinstance(node, dict):
+        node_type = node.get("type")
+        if node_type == "function_call":
+            return True
+        if node_type == "func_def":
+            return False
+        return any(_contains_call(value) for value in node.values() if isinstance(value, (dict, list)))
+    if isinstance(node, list):
+        return any(_contains_call(item) for item in node)
+    return False
+
+
+def _divide(left, right):
+    if type(left) is int and type(right) is int:
+        return _int_divide(left, right)
+    return left / right
+
+
+def _int_divide(left, right):
+    # Floor division, corrected to truncate toward zero
+    if right == 0:
+        raise ZeroDivisionError("integer division by zero")
+    quotient = left // right
+    if quotient < 0 and quotient * right != left:
+        quotient += 1
+    return quotient
+
+
+def _modulo(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        return _int_modulo(left, right)
+    return left % right
+
+
+def _int_modulo(left, right):
+    # The remainder takes the sign of the dividend, as with truncating division
+    if right == 0:
+        raise ZeroDivisionError("integer modulo by zero")
+    remainder = left % right
+    if remainder and (left < 0) != (right < 0):
+        remainder -= right
+    return remainder
+
+
+def _logical_and(left, right):
+    return bool(left) and bool(right)
+
+
+def _logical_or(left, right):
+    return bool(left) or bool(right)
+
+
+def _negate(operand):
+    if not isinstance(operand, (int, float)):
+        raise TypeError(f"Unary '-' requires a numeric operand, got {type(operand).__name__}")
+    return -operand
+
+
+def contains(container, item):
+    """Echo's membership test: a hash key, a list or set element, or a substring."""
+    if isinstance(container, (dict, EchoSet)):
+        # A collection is never a hash key or set element
+        return not isinstance(item, _UNHASHABLE_TYPES) and item in container
+    if isinstance(container, (list, deque, Heap)):
+        return item in container
+    if isinstance(container, str):
+        if not isinstance(item, str):
+            raise TypeError(f"Cannot look for {type(item).__name__} in a string")
+        return item in container
+    raise TypeError(f"Membership test needs a list, hash, set, deque, heap or string, got {type(container).__name__}")
+
+
+def _in(item, container):
+    return contains(container, item)
+
+
+def _not_in(item, container):
+    return not contains(container, item)
+
+
+def _in_plain(item, container):
+    return item in container
+
+
+def _not_in_plain(item, container):
+    return item not in container
+
+
+# Operator implementations for operands of any type.
+BINARY_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": _divide,
+    "%": _modulo,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "&&": _logical_and,
+    "||": _logical_or,
+    "in": _in,
+    "!in": _not_in,
+}
+UNARY_OPS = {"!": operator.not_, "-": _negate}
+
+# Fast paths for operands the type checker proved are numbers. An "int"
+# operand may still hold a bool, so `/` on two ints keeps its type test.
+INT_BINARY_OPS = dict(BINARY_OPS, **{"%": _int_modulo})
+FLOAT_BINARY_OPS = dict(BINARY_OPS, **{"/": operator.truediv, "%": operator.mod})
+NUMERIC_UNARY_OPS = dict(UNARY_OPS, **{"-": operator.neg})
+
+# Membership fast paths for a scalar looked up in a hash, set or list, or a
+# string looked up in a string, where Python's `in` already agrees with Echo's.
+MEMBERSHIP_OPS = {"in": _in_plain, "!in": _not_in_plain}
+
+
+def _plain_membership(item_type, container_type):
+    if container_type in ("hash", "set", "list", "deque"):
+        return item_type in ("int", "bool", "float", "str")
+    return item_type == container_type == "str"
+
+
+def index_value(target, index):
+    """Read `target[index]` with Echo's type and bounds checks."""
+    if isinstance(target, dict):
+        if not isinstance(index, str):
+            raise TypeError(f"Hash key must be a string, got {type(index).__name__}")
+        if index not in target:
+            raise KeyError(f"Key '{index}' not found in hash")
+        return target[index]
+    elif isinstance(target, str):
+        if not isinstance(index, int):
+            raise TypeError(f"String index must be an integer, got {type(index).__name__}")
+        if index < 0 or index >= len(target):
+            raise IndexError(f"String index {index} out of range")
+        return target[index]
+    elif isinstance(target, list):
+        if not isinstance(index, int):
+            raise TypeError(f"List index must be an integer, got {type(index).__name__}")
+        if index < 0 or index >= len(target):
+            raise IndexError(f"List index {index} out of range")
+        return target[index]
+    else:
+        raise TypeError(f"Cannot index type {type(target).__name__}")
+
+
+def _index_list(target, index):
+    if index < 0 or index >= len(target):
+        raise IndexError(f"List index {index} out of range")
+    return target[index]
+
+
+def _index_string(target, index):
+    if index < 0 or index >= len(target):
+        raise IndexError(f"String index {index} out of range")
+    return target[index]
+
+
+def _index_hash(target, index):
+    if index not in target:
+        raise KeyError(f"Key '{index}' not found in hash")
+    return target[index]
+
+
+# Index fast paths by the static types of the target and index.
+INDEX_OPS = {
+    ("list", "int"): _index_list,
+    ("list", "bool"): _index_list,
+    ("str", "int"): _index_string,
+    ("str", "bool"): _index_string,
+    ("hash", "str"): _index_hash,
+}
+
+
+def binary_op(op, left, right):
+    """Apply an Echo binary operator; `/` and `%` truncate toward zero on ints."""
+    apply = BINARY_OPS.get(op)
+    if apply is None:
+        raise Exception(f"Unknown operator: {op}")
+    return apply(left, right)
+
+
+def unary_op(op, operand):
+    apply = UNARY_OPS.get(op)
+    if apply is None:
+        raise Exception(f"Unknown unary operator: {op}")
+    return apply(operand)
+
+
+def specialize_operators(operators):
+    """Bind each binary and unary node to the implementation of its operator.
+
+    `operators` holds (node, operand types) pairs from TypeChecker. Nodes
+    whose operands are statically numbers get the fast paths above; the
+    rest get the generic implementation, so evaluation skips the lookup by
+    operator name either way. `&&` and `||` short-circuit and stay unbound.
+    Index expressions and `in` tests on operands of known types skip the
+    checks those types make redundant.
+    """
+    for node, operand_types in operators:
+        if node["type"] == "index":
+            node["apply"] = INDEX_OPS.get(operand_types, index_value)
+            continue
+        op = node["operator"]
+        if op in MEMBERSHIP_OPS:
+            node["apply"] = MEMBERSHIP_OPS[op] if _plain_membership(*operand_types) else BINARY_OPS[op]
+            continue
+        numeric = all(operand_type in ("int", "bool", "float") for operand_type in operand_types)
+        if node["type"] == "unary":
+            table = NUMERIC_UNARY_OPS if numeric else UNARY_OPS
+        elif op in ("&&", "||"):
+            continue
+        elif numeric and "float" in operand_types:
+            table = FLOAT_BINARY_OPS
+        elif numeric:
+            table = INT_BINARY_OPS
+        else:
+            table = BINARY_OPS
+        if op in table:
+            node["apply"] = table[op]
+
+
+# Cached value of a hoisted expression that has not been evaluated yet.
+_NOT_EVALUATED = object()
+
+# Default limit on nested Echo calls when running with an explicit stack.
+DEFAULT_MAX_CALL_DEPTH = 10000
+
+
 class Interpreter:
-    def __init__(self):
+    def __init__(self, explicit_stack=False, max_call_depth=None, verified=False):
         self.context = Context()
+        # Skip the runtime type checks the static type checker proves redundant
+        self.verified = verified
+        self.memo_stats = {}  # function name -> MemoStats
+        self.feedback_stats = {}  # function name -> FeedbackStats
+        # With an explicit stack, Echo calls are driven by _run_gen instead of
+        # recursing through Python frames.
+        self.explicit_stack = explicit_stack
+        self.max_call_depth = max_call_depth or DEFAULT_MAX_CALL_DEPTH
+        self._call_depth = 0
+        self._inline_args = []  # argument lists of the inline_call bodies being evaluated
+        reset_warnings()
+
+    def _memo_cache(self, name, max_size):
+        stats = self.memo_stats.get(name)
+        if stats is None:
+            stats = self.memo_stats[name] = MemoStats(name, max_size)
+        return MemoCache(max_size, stats)
+
+    def _feedback_stats(self, name):
+        stats = self.feedback_stats.get(name)
+        if stats is None:
+            stats = self.feedback_stats[name] = FeedbackStats(name)
+        return stats
+
+    def profile_report(self):
+        """Summarize runtime counters collected while the program ran."""
+        lines = ["Profile:"]
+        if not self.memo_stats:
+            lines.append("  no memoized functions were defined")
+        for stats in self.memo_stats.values():
+            calls = stats.hits + stats.misses
+            hit_rate = (stats.hits / calls * 100) if calls else 0.0
+            lines.append(
+                f"  memo {stats.name}: {stats.hits} hits, {stats.misses} misses ({hit_rate:.1f}% hit rate), "
+                f"{stats.evictions} evictions, cache size {stats.max_size}"
+            )
+        for stats in self.feedback_stats.values():
+            if stats.signature is None:
+                continue
+            arg_types = ", ".join(_ECHO_TYPE_NAMES.get(arg_type, arg_type.__name__) for arg_type in stats.signature)
+            lines.append(f"  specialized {stats.name}({arg_types}): {stats.hits} hits, {stats.deopts} deopts")
+        return "\n".join(lines)
 
     def execute(self, ast):
+        check_memo_functions(ast)
+        annotate_closures(ast)
+        self._specialize(ast, mark_checks=self.verified)
+        checker = ScopeChecker()
+        self.context.scope_checked = checker.check(ast)
+        if self.context.scope_checked:
+            # Verified programs report warnings once, here, instead of at runtime
+            for kind, message, line in checker.warnings:
+                _print_warning(message, kind, line)
         for node in ast:
-            self.execute_node(node, self.context)
+            self._execute_top_level(node)
+
+    def execute_stream(self, statements):
+        """Execute top-level statements as they arrive from a streaming parser.
+
+        The whole program is never available up front, so scope rules and
+        types are enforced by the runtime checks rather than the static
+        checkers.
+        """
+        self.context.scope_checked = False
+        definitions = {}
+        for node in statements:
+            check_memo_functions([node], definitions)
+            annotate_closures([node])
+            self._specialize([node])
+            self._execute_top_level(node)
+
+    def _specialize(self, ast, mark_checks=False):
+        """Run the type checker and bind operator nodes to their implementations.
+
+        With `mark_checks`, the checks it proves redundant are marked too.
+        """
+        checker = TypeChecker(mark_checks=mark_checks)
+        checker.check(ast)
+        specialize_operators(checker.operators)
+
+    def _execute_top_level(self, node):
+        try:
+            if self.explicit_stack:
+                self._run_gen(self._exec_gen(node, self.context))
+            else:
+                self.execute_node(node, self.context)
+        except RecursionError:
+            if self.explicit_stack:
+                raise RuntimeError("Stack overflow: expressions are nested too deeply") from None
+            raise RuntimeError(
+                "Stack overflow: the program nested too deeply for the Python stack. "
+                "Try running with --explicit-stack."
+            ) from None
+
+    # Explicit-stack evaluation
+    #
+    # The *_gen methods mirror execute_node/evaluate for the constructs that can
+    # reach an Echo call. Instead of recursing they yield the generator for a
+    # sub-step, and _run_gen keeps those generators on a list, sending each
+    # result (or exception) back to the one that asked for it. Subtrees that
+    # cannot call a function run on the ordinary recursive evaluator.
+
+    def _run_gen(self, gen):
+        stack = [gen]
+        value = None
+        error = None
+        while stack:
+            top = stack[-1]
+            try:
+                if error is not None:
+                    pending, error = error, None
+                    request = top.throw(pending)
+                else:
+                    request = top.send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            except Exception as exc:
+                stack.pop()
+                if not stack:
+                    raise
+                error = exc
+                continue
+            stack.append(request)
+            value = None
+        return value
+
+    def _has_call(self, node):
+        has_call = node.get("has_call")
+        if has_call is None:
+            has_call = node["has_call"] = _contains_call(node)
+        return has_call
+
+    def _call_gen(self, context, name, args):
+        func = context.resolve_function(name)
+        if not func:
+            raise Exception(f"Function '{name}' not defined")
+
+        bound_arguments = context._bind_function_arguments(name, func, args, self)
+        arg_values = []
+        for param in func["params"]:
+            arg_values.append((yield self._eval_gen(bound_arguments[param], context)))
+        return (yield self._run_function_gen(context, name, func, arg_values))
+
+    def _run_function_gen(self, context, name, func, arg_values):
+        memo = func.get("memo")
+        if memo is not None:
+            key = memo.key(arg_values)
+            found, result = memo.lookup(key)
+            if found:
+                return result
+
+        if self._call_depth >= self.max_call_depth:
+            raise RuntimeError(
+                f"Stack overflow: call depth exceeded {self.max_call_depth} in function '{name}'"
+            )
+        self._call_depth += 1
+        try:
+            while True:
+                version = func["feedback"].select(func, arg_values) if "feedback" in func else func
+                new_context = context._new_frame(name, version, arg_values, self)
+                if version["inline"]:
+                    result = yield self._eval_gen(version["body"], new_context)
+                else:
+                    try:
+                        yield self._exec_block_gen(context._function_body(version), new_context)
+                        result = None
+                    except ReturnValue as r:
+                        result = r.value
+                    except TailCall as call:
+                        if call.func is func:
+                            arg_values = call.arg_values
+                            continue
+                        result = yield self._run_function_gen(call.context, call.name, call.func, call.arg_values)
+                context._check_return_value(name, version, result, self)
+                break
+        finally:
+            self._call_depth -= 1
+
+        if memo is not None:
+            memo.store(key, result)
+        return result
+
+    def _exec_block_gen(self, block, context):
+        for node in block:
+            if self._has_call(node):
+                yield self._exec_gen(node, context)
+            else:
+                self.execute_node(node, context)
+
+    def _exec_gen(self, node, context):
+        node_type = node["type"]
+        if not self._has_call(node):
+            return self.execute_node(node, context)
+
+        if node_type == "function_call":
+            return (yield self._call_gen(context, node["name"], node["args"]))
+
+        if node_type == "assign":
+            value = yield self._eval_gen(node["value"], context)
+            self._assign_value(node, value, context)
+            return None
+
+        if node_type == "method_call":
+            return (yield self._eval_gen(node, context))
+
+        if node_type == "index_assign":
+            container = context.get(node["target"])
+            if container is None:
+                raise NameError(f"Variable '{node['target']}' is not defined")
+            indices = node["indices"]
+            inner = container
+            for idx_expr in indices[:-1]:
+                inner = inner[(yield self._eval_gen(idx_expr, context))]
+            final_key = yield self._eval_gen(indices[-1], context)
+            inner[final_key] = yield self._eval_gen(node["value"], context)
+            context.set(node["target"], container)
+            return None
+
+        if node_type == "return":
+            if not node.get("placement_checked"):
+                self._check_return_allowed(context)
+            call = node["value"]
+            if node.get("tail_call"):
+                func = context.resolve_function(call["name"])
+                if func is not None:
+                    bound_arguments = context._bind_function_arguments(call["name"], func, call["args"], self)
+                    arg_values = []
+                    for param in func["params"]:
+                        arg_values.append((yield self._eval_gen(bound_arguments[param], context)))
+                    raise TailCall(call["name"], func, arg_values, context)
+            raise ReturnValue((yield self._eval_gen(call, context)))
+
+        if node_type == "if":
+            if (yield self._eval_gen(node["condition"], context)):
+                yield self._exec_block_gen(node["body"], self._block_context(context))
+            elif node.get("else_body"):
+                yield self._exec_block_gen(node["else_body"], self._block_context(context))
+            return None
+
+        if node_type == "while":
+            function_name = self._enclosing_function_name(context)
+            unchecked = self._enter_loop(node, context)
+            try:
+                while (yield self._eval_gen(node["condition"], context)):
+                    try:
+                        yield self._exec_block_gen(node["body"], self._loop_context(context, function_name))
+                    except ContinueException:
+                        pass
+            except BreakException:
+                pass
+            finally:
+                self._restore_reads(unchecked)
+            return None
+
+        if node_type == "for":
+            var_name = node["var"]
+            iterations = self._counted_range(node, context)
+            function_name = self._enclosing_function_name(context)
+            unchecked = self._enter_loop(node, context, iterations)
+            try:
+                for i in iterations:
+                    iter_context = self._loop_context(context, function_name)
+                    iter_context.variables[var_name] = i
+                    iter_context.types[var_name] = "int"
+                    try:
+                        yield self._exec_block_gen(node["body"], iter_context)
+                    except ContinueException:
+                        pass
+            except BreakException:
+                pass
+            finally:
+                self._restore_reads(unchecked)
+            return None
+
+        if node_type == "foreach":
+            items = yield self._eval_gen(node["iterable"], context)
+            function_name = self._enclosing_function_name(context)
+            unchecked = self._enter_loop(node, context)
+            try:
+                for item in items:
+                    if not node.get("item_checked"):
+                        self._check_loop_item(node, item)
+                    iter_context = self._loop_context(context, function_name)
+                    iter_context.set(node["var"], item, node["var_type"])
+                    try:
+                        yield self._exec_block_gen(node["body"], iter_context)
+                    except ContinueException:
+                        pass
+            except BreakException:
+                pass
+            finally:
+                self._restore_reads(unchecked)
+            return None
+
+        # Anything else runs on the recursive evaluator; calls inside it start
+        # their own driver loop.
+        return self.execute_node(node, context)
+
+    def _eval_gen(self, expr, context):
+        if not self._has_call(expr):
+            return self.evaluate(expr, context)
+
+        expr_type = expr["type"]
+        if expr_type == "function_call":
+            return (yield self._call_gen(context, expr["name"], expr["args"]))
+
+        if expr_type == "binary":
+            op = expr["operator"]
+            left = yield self._eval_gen(expr["left"], context)
+            if op == "&&":
+                return bool(left) and bool((yield self._eval_gen(expr["right"], context)))
+            if op == "||":
+                return bool(left) or bool((yield self._eval_gen(expr["right"], context)))
+            right = yield self._eval_gen(expr["right"], context)
+            apply = expr.get("apply")
+            if apply is not None:
+                return apply(left, right)
+            return self._binary_op(op, left, right)
+
+        if expr_type == "unary":
+            operand = yield self._eval_gen(expr["operand"], context)
+            apply = expr.get("apply")
+            if apply is not None:
+                return apply(operand)
+            return self._unary_op(expr["operator"], operand)
+
+        if expr_type == "list":
+            elements = []
+            for element in expr["elements"]:
+                elements.append((yield self._eval_gen(element, context)))
+            return elements
+
+        if expr_type == "set":
+            elements = []
+            for element in expr["elements"]:
+                elements.append((yield self._eval_gen(element, context)))
+            return _new_set(elements)
+
+        if expr_type == "inline_call":
+            arg_values = []
+            for arg in expr["args"]:
+                arg_values.append((yield self._eval_gen(arg, context)))
+            return self._run_inline_call(expr, arg_values)
+
+        if expr_type == "hash":
+            result = {}
+            for pair in expr["pairs"]:
+                result[pair["key"]] = yield self._eval_gen(pair["value"], context)
+            return result
+
+        if expr_type == "index":
+            target = yield self._eval_gen(expr["target"], context)
+            index = yield self._eval_gen(expr["index"], context)
+            return expr.get("apply", index_value)(target, index)
+
+        if expr_type == "string_interpolation":
+            pieces = []
+            for part in expr["parts"]:
+                if part["type"] == "string":
+                    pieces.append(part["value"])
+                else:
+                    pieces.append(self._stringify_value((yield self._eval_gen(part, context))))
+            return "".join(pieces)
+
+        if expr_type == "method_call":
+            target_value = _NOT_EVALUATED
+            if "target" in expr:
+                target_value = yield self._eval_gen(expr["target"], context)
+            # Arguments that make calls are evaluated here and handed to the
+            # method as constants; the rest keep their nodes, since some
+            # methods (order(), heap()) look at how a function is named.
+            args = []
+            for arg in expr["args"]:
+                if not self._has_call(arg):
+                    args.append(arg)
+                elif arg.get("type") == "keyword_arg":
+                    value = yield self._eval_gen(arg["value"], context)
+                    args.append({**arg, "value": {"type": "const", "value": value}})
+                else:
+                    value = yield self._eval_gen(arg, context)
+                    args.append({"type": "const", "value": value})
+            return self._evaluate_method_call({**expr, "args": args}, context, target_value)
+
+        return self.evaluate(expr, context)
+
+    def _run_inline_call(self, node, arg_values):
+        """Evaluate a call the optimizer inlined, keeping the call's type checks."""
+        name = node["name"]
+        func = node["function"]
+        if not func.get("args_checked"):
+            self.context._check_argument_types(name, func, arg_values, self)
+        self._inline_args.append(arg_values)
+        try:
+            # Inlined functions are top-level, so their body sees the global scope
+            result = self.evaluate(node["body"], self.context)
+        finally:
+            self._inline_args.pop()
+        self.context._check_return_value(name, func, result, self)
+        return result
+
+    def _unchecked_reads(self, loop, context, iterations=None):
+        """Let the loop's in-range index reads skip their checks for this run.
+
+        `loop["bounds"]` comes from the optimizer. A target qualifies when it
+        is a list or string long enough for every value of the loop
+        variable: the `for` range, or for a counted `while`, the counter's
+        current value up to its limit. Returns (read, previous apply) pairs
+        to restore when the loop ends, so a recursive run of the same loop
+        cannot leak its unchecked reads into this one.
+        """
+        if iterations is None:
+            counter = loop["bounds_counter"]
+            try:
+                low = context.get(counter["var"])
+                limit = self.evaluate(counter["limit"], context)
+            except (NameError, TypeError):
+                return ()
+            if type(low) is not int or type(limit) is not int or low >= limit:
+                return ()
+            high = limit - 1
+        elif iterations:
+            low = min(iterations[0], iterations[-1])
+            high = max(iterations[0], iterations[-1])
+        else:
+            return ()
+        if low < 0:
+            return ()
+        swapped = []
+        for bound in loop["bounds"]:
+            try:
+                target = self.evaluate(bound["target"], context)
+            except (NameError, TypeError, KeyError, IndexError):
+                continue
+            if type(target) not in (list, str) or high >= len(target):
+                continue
+            for read in bound["reads"]:
+                swapped.append((read, read.get("apply")))
+                read["apply"] = operator.getitem
+        return swapped
+
+    def _restore_reads(self, unchecked):
+        for read, apply in unchecked:
+            if apply is None:
+                del read["apply"]
+            else:
+                read["apply"] = apply
+
+    def _enter_loop(self, loop, context, iterations=None):
+        """Set up a run of `loop` for both evaluators.
+
+        Forgets the hoisted values of the last run and returns the unchecked
+        reads that the caller hands to _restore_reads once the loop ends.
+        """
+        self._reset_hoisted(loop)
+        if "bounds" not in loop:
+            return ()
+        return self._unchecked_reads(loop, context, iterations)
+
+    def _reset_hoisted(self, loop):
+        """Forget values the optimizer hoisted out of `loop` on its last run."""
+        for hoisted in loop.get("hoisted", ()):
+            hoisted["cached"] = _NOT_EVALUATED
 
     def execute_block(self, block, context):
         for node in block:
@@ -392,16 +1610,19 @@ class Interpreter:
         if parent_context.in_loop:
             child_context.in_loop = True
 
-        function_name = parent_context.functions.get("__current_function")
-        if function_name is None:
-            current = parent_context.parent
-            while current and function_name is None:
-                function_name = current.functions.get("__current_function")
-                current = current.parent
-
+        function_name = self._enclosing_function_name(parent_context)
         if function_name is not None:
             child_context.functions["__current_function"] = function_name
 
+    def _enclosing_function_name(self, context):
+        current = context
+        while current:
+            function_name = current.functions.get("__current_function")
+            if function_name is not None:
+                return function_name
+            current = current.parent
+        return None
+
     def _format_type(self, type_spec):
         if isinstance(type_spec, str):
             return type_spec
@@ -470,13 +1691,18 @@ class Interpreter:
         if params is None:
             raise TypeError(f"{method_name}() does not support keyword arguments")
 
+        keyword_only_params = _BUILTIN_KEYWORD_ONLY_PARAMS.get(method_name, ())
         positional = []
         keyword = {}
+        keyword_only = {}
         for arg in args:
             if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
                 name = arg["name"]
-                if name in keyword:
+                if name in keyword or name in keyword_only:
                     raise TypeError(f"{method_name}() got multiple values for argument '{name}'")
+                if name in keyword_only_params:
+                    keyword_only[name] = arg
+                    continue
                 if name not in params:
                     raise TypeError(f"{method_name}() got an unexpected keyword argument '{name}'")
                 keyword[name] = arg["value"]
@@ -507,7 +1733,7 @@ class Interpreter:
             if slot is None:
                 raise TypeError(f"{method_name}() missing argument '{params[i]}'")
 
-        return slots
+        return slots + list(keyword_only.values())
 
     def _current_function_name(self, context):
         if not context.in_function:
@@ -537,14 +1763,16 @@ class Interpreter:
             return "list"
         if isinstance(value, dict):
             return "hash"
+        if isinstance(value, EchoSet):
+            return "set"
+        if isinstance(value, deque):
+            return "deque"
+        if isinstance(value, Heap):
+            return "heap"
         return "dynamic"
 
     def _mutating_method_target_name(self, call, context):
-        modifying_methods = {
-            "push", "empty", "merge", "insertAt", "pull", "removeValue", "order", "wipe", "take", "take_last", "ensure"
-        }
-
-        if call["method"] not in modifying_methods:
+        if call["method"] not in MUTATING_METHODS:
             return None
 
         target_expr = call.get("target")
@@ -553,21 +1781,12 @@ class Interpreter:
 
         var_name = target_expr["name"]
 
-        if context.in_function:
-            if var_name in context.imported_vars:
-                if not context.imported_vars[var_name]:
-                    raise NameError(f"Cannot modify immutable import '{var_name}', use 'use mut' to make it mutable")
-            else:
-                current = context
-                found_local = False
-                while current and current.in_function:
-                    if var_name in current.variables:
-                        found_local = True
-                        break
-                    current = current.parent
-
-                if not found_local:
-                    raise NameError(f"Cannot modify global variable '{var_name}' without 'use mut'")
+        if context.in_function and not context.scope_checked:
+            binding = context._function_binding(var_name)
+            if binding == "immutable_import":
+                raise NameError(f"Cannot modify immutable import '{var_name}', use 'use mut' to make it mutable")
+            if binding is None:
+                raise NameError(f"Cannot modify global variable '{var_name}' without 'use mut'")
 
         return var_name
 
@@ -578,11 +1797,12 @@ class Interpreter:
             raise TypeError(f"{method_name}() requires a target or at least one argument")
         return self.evaluate(args[0], context)
 
-    def _evaluate_method_call(self, call, context):
+    def _evaluate_method_call(self, call, context, target_value=_NOT_EVALUATED):
         has_target = "target" in call
         call = {**call, "args": self._resolve_builtin_args(call["args"], call["method"], has_target)}
-        target_value = None
-        if has_target:
+        if not has_target:
+            target_value = None
+        elif target_value is _NOT_EVALUATED:
             target_value = self.evaluate(call["target"], context)
 
         watched_var = self._mutating_method_target_name(call, context)
@@ -616,7 +1836,7 @@ class Interpreter:
 
         if method == "asBool":
             value = self._target_or_first_arg(target_value, call["args"], context, method)
-            if isinstance(value, (str, list, dict)):
+            if isinstance(value, (str, list, dict, EchoSet, deque, Heap)):
                 return bool(len(value))
             if isinstance(value, (int, float)):
                 return bool(value)
@@ -655,9 +1875,9 @@ class Interpreter:
 
         if method == "length":
             value = self._target_or_first_arg(target_value, call["args"], context, method)
-            if isinstance(value, (str, list, dict)):
+            if isinstance(value, (str, list, dict, EchoSet, deque, Heap)):
                 return len(value)
-            raise TypeError("length() can only be used on strings, lists, or hashes")
+            raise TypeError("length() can only be used on strings, lists, hashes, sets, deques, or heaps")
 
         if method == "keys":
             value = self._target_or_first_arg(target_value, call["args"], context, method)
@@ -694,9 +1914,9 @@ class Interpreter:
             target = self._target_or_first_arg(target_value, call["args"], context, method)
             if isinstance(target, list):
                 return target.copy()
-            if isinstance(target, dict):
+            if isinstance(target, (dict, EchoSet, deque, Heap)):
                 return target.copy()
-            raise TypeError("clone() can only be called on lists or hashes")
+            raise TypeError("clone() can only be called on lists, hashes, sets, deques, or heaps")
 
         if method == "countOf":
             if target_value is not None:
@@ -721,6 +1941,19 @@ class Interpreter:
             except ValueError:
                 raise ValueError(f"Element {value} not found in list")
 
+        if method == "heap":
+            if target_value is not None:
+                raise TypeError("heap() cannot be called on a value")
+            return self._new_heap(call["args"], context)
+
+        if method in {"pop", "peek"} or (method == "push" and isinstance(target_value, Heap)):
+            if not isinstance(target_value, Heap):
+                raise TypeError(f"{method}() must be called on a heap target")
+            result = self._apply_heap_method(method, target_value, call["args"], context)
+            if is_watched and method != "peek":
+                self._watch_change(watched_var, target_value, context, f"modified by {method}() to")
+            return result
+
         if method in {"push", "empty", "insertAt", "pull", "removeValue", "order"}:
             if target_value is None:
                 raise TypeError(f"{method}() must be called on a list target")
@@ -729,6 +1962,34 @@ class Interpreter:
                 self._watch_change(watched_var, target_value, context, f"modified by {method}() to")
             return result
 
+        if method == "has":
+            if target_value is None:
+                raise TypeError("has() must be called on a list, hash, set, deque, heap or string target")
+            if len(call["args"]) != 1:
+                raise TypeError("has() requires exactly one argument")
+            return contains(target_value, self.evaluate(call["args"][0], context))
+
+        if method == "deque":
+            if target_value is not None:
+                raise TypeError("deque() cannot be called on a value")
+            return self._new_deque(call["args"], context)
+
+        if method in {"pushFront", "pushBack", "pullFront", "pullBack"}:
+            if target_value is None:
+                raise TypeError(f"{method}() must be called on a deque target")
+            result = self._apply_deque_method(method, target_value, call["args"], context)
+            if is_watched:
+                self._watch_change(watched_var, target_value, context, f"modified by {method}() to")
+            return result
+
+        if method in {"add", "remove", "union", "intersect"}:
+            if target_value is None:
+                raise TypeError(f"{method}() must be called on a set target")
+            result = self._apply_set_method(method, target_value, call["args"], context)
+            if is_watched:
+                self._watch_change(watched_var, target_value, context, f"modified by {method}() to")
+            return result
+
         if method == "merge":
             if len(call["args"]) != 1:
                 raise TypeError("merge() requires exactly one argument")
@@ -778,6 +2039,16 @@ class Interpreter:
             for key, item in value.items():
                 parts.append(f"{self._stringify_value(key, True)}: {self._stringify_value(item, True)}")
             return "{" + ", ".join(parts) + "}"
+        if isinstance(value, EchoSet):
+            try:
+                items = sorted(value)
+            except TypeError:
+                items = value
+            return "#{" + ", ".join(self._stringify_value(item, True) for item in items) + "}"
+        if isinstance(value, deque):
+            return "deque([" + ", ".join(self._stringify_value(item, True) for item in value) + "])"
+        if isinstance(value, Heap):
+            return "heap([" + ", ".join(self._stringify_value(item, True) for item in value) + "])"
         return str(value)
 
     def _apply_string_format(self, template, args, context):
@@ -877,29 +2148,41 @@ class Interpreter:
                 raise ValueError(f"Value {value} not found in list")
 
         if method == "order":
-            if len(args) == 0:
-                target.sort()
+            options = {}
+            positional = []
+            for arg in args:
+                if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                    options[arg["name"]] = arg["value"]
+                else:
+                    positional.append(arg)
+
+            descending = False
+            if "descending" in options:
+                descending = self.evaluate(options["descending"], context)
+                if not isinstance(descending, bool):
+                    raise TypeError("order() descending must be a bool")
+
+            if "by" in options:
+                if positional:
+                    raise TypeError("order() accepts either a comparator function or 'by', not both")
+                key_name = self._resolve_order_function(options["by"], context, "Key", 1)
+                # Call the key function once per element, then sort natively on the keys
+                keys = [context.call_function_with_values(key_name, [item], self) for item in target]
+                try:
+                    indices = sorted(range(len(target)), key=keys.__getitem__, reverse=descending)
+                except TypeError:
+                    raise TypeError(f"Key function '{key_name}' returned values that cannot be compared")
+                target[:] = [target[index] for index in indices]
                 return target
 
-            if len(args) != 1:
-                raise TypeError("order() accepts either no arguments or a single comparator function")
-
-            comparator_name = None
-            arg = args[0]
-            if isinstance(arg, dict) and arg.get("type") == "identifier":
-                if context.resolve_function(arg["name"]) is not None:
-                    comparator_name = arg["name"]
+            if len(positional) == 0:
+                target.sort(reverse=descending)
+                return target
 
-            if comparator_name is None:
-                comparator_name = self.evaluate(arg, context)
-                if not isinstance(comparator_name, str):
-                    raise TypeError("order() comparator must be a function name or string")
+            if len(positional) != 1:
+                raise TypeError("order() accepts either no arguments or a single comparator function")
 
-            comparator = context.resolve_function(comparator_name)
-            if comparator is None:
-                raise NameError(f"Comparator function '{comparator_name}' is not defined")
-            if len(comparator["params"]) != 2:
-                raise TypeError(f"Comparator function '{comparator_name}' must take exactly two arguments")
+            comparator_name = self._resolve_order_function(positional[0], context, "Comparator", 2)
 
             def compare(left, right):
                 result = context.call_function_with_values(comparator_name, [left, right], self)
@@ -907,11 +2190,31 @@ class Interpreter:
                     raise TypeError(f"Comparator function '{comparator_name}' must return int")
                 return result
 
-            target.sort(key=cmp_to_key(compare))
+            target.sort(key=cmp_to_key(compare), reverse=descending)
             return target
 
         raise Exception(f"Unsupported list method in helper: {method}")
 
+    def _resolve_order_function(self, arg, context, role, arity, method="order"):
+        """Resolve the comparator or key function passed to order() or heap() to its name."""
+        function_name = None
+        if isinstance(arg, dict) and arg.get("type") == "identifier":
+            if context.resolve_function(arg["name"]) is not None:
+                function_name = arg["name"]
+
+        if function_name is None:
+            function_name = self.evaluate(arg, context)
+            if not isinstance(function_name, str):
+                raise TypeError(f"{method}() {role.lower()} must be a function name or string")
+
+        function = context.resolve_function(function_name)
+        if function is None:
+            raise NameError(f"{role} function '{function_name}' is not defined")
+        if len(function["params"]) != arity:
+            expected = "one argument" if arity == 1 else "two arguments"
+            raise TypeError(f"{role} function '{function_name}' must take exactly {expected}")
+        return function_name
+
     def _apply_merge_method(self, target, other):
         if isinstance(target, list):
             if not isinstance(other, (list, str)):
@@ -964,6 +2267,116 @@ class Interpreter:
 
         raise Exception(f"Unsupported hash method in helper: {method}")
 
+    def _apply_set_method(self, method, target, args, context):
+        if not isinstance(target, EchoSet):
+            raise TypeError(f"{method}() can only be called on sets")
+        if len(args) != 1:
+            raise TypeError(f"{method}() requires exactly one argument")
+        value = self.evaluate(args[0], context)
+
+        if method == "add":
+            target.add(_set_element(value))
+            return target
+
+        if method == "remove":
+            if value not in target:
+                raise ValueError(f"Value {self._stringify_value(value, True)} not found in set")
+            target.remove(value)
+            return target
+
+        if not isinstance(value, EchoSet):
+            raise TypeError(f"{method}() argument must be a set")
+        if method == "union":
+            return target.union(value)
+        if method == "intersect":
+            return target.intersect(value)
+
+        raise Exception(f"Unsupported set method in helper: {method}")
+
+    def _new_deque(self, args, context):
+        options = {}
+        positional = []
+        for arg in args:
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                options[arg["name"]] = arg["value"]
+            else:
+                positional.append(arg)
+        if len(positional) > 1:
+            raise TypeError("deque() accepts at most one positional argument (items)")
+
+        items = self.evaluate(positional[0], context) if positional else []
+        max_length = self.evaluate(options["maxLength"], context) if "maxLength" in options else None
+        if not isinstance(items, (list, EchoSet, deque)):
+            raise TypeError("deque() items must be a list, set or deque")
+        if max_length is not None and (not isinstance(max_length, int) or isinstance(max_length, bool) or max_length < 0):
+            raise TypeError("deque() maxLength must be a non-negative int")
+        return deque(items, max_length)
+
+    def _apply_deque_method(self, method, target, args, context):
+        if not isinstance(target, deque):
+            raise TypeError(f"{method}() can only be called on deques")
+
+        if method in ("pushFront", "pushBack"):
+            if len(args) != 1:
+                raise TypeError(f"{method}() requires exactly one argument")
+            value = self.evaluate(args[0], context)
+            # A full deque drops an element from the opposite end
+            if method == "pushFront":
+                target.appendleft(value)
+            else:
+                target.append(value)
+            return target
+
+        if args:
+            raise TypeError(f"{method}() takes no arguments")
+        if not target:
+            raise IndexError("Cannot pull from empty deque")
+        if method == "pullFront":
+            return target.popleft()
+        return target.pop()
+
+    def _new_heap(self, args, context):
+        options = {}
+        positional = []
+        for arg in args:
+            if isinstance(arg, dict) and arg.get("type") == "keyword_arg":
+                options[arg["name"]] = arg["value"]
+            else:
+                positional.append(arg)
+        if len(positional) > 1:
+            raise TypeError("heap() accepts at most one positional argument (items)")
+
+        descending = False
+        if "descending" in options:
+            descending = self.evaluate(options["descending"], context)
+            if not isinstance(descending, bool):
+                raise TypeError("heap() descending must be a bool")
+
+        key = key_name = None
+        if "by" in options:
+            key_name = self._resolve_order_function(options["by"], context, "Key", 1, "heap")
+            key = lambda item: context.call_function_with_values(key_name, [item], self)
+
+        items = self.evaluate(positional[0], context) if positional else []
+        if not isinstance(items, (list, EchoSet, deque, Heap)):
+            raise TypeError("heap() items must be a list, set, deque or heap")
+        heap = Heap(key, key_name, descending)
+        for item in items:
+            heap.push(item)
+        return heap
+
+    def _apply_heap_method(self, method, target, args, context):
+        if method == "push":
+            if len(args) != 1:
+                raise TypeError("push() requires exactly one argument")
+            target.push(self.evaluate(args[0], context))
+            return target
+        if args:
+            raise TypeError(f"{method}() takes no arguments")
+        if method == "pop":
+            return target.pop()
+        return target.peek()
+
     def _count_of(self, target, args, context):
         if not isinstance(target, list):
             raise TypeError("countOf() can only be called on lists")
@@ -1000,120 +2413,51 @@ class Interpreter:
             return
 
         if node_type == "assign":
-            value = self.evaluate(node["value"], context)
-            explicit_type = node.get("var_type")  # Type provided in code
-            existing_type = context.get_type(node["target"])
+            self._assign_value(node, self.evaluate(node["value"], context), context)
 
-            # Check if variable is being watched
-            if context.is_watched(node["target"]):
-                self._watch_change(node["target"], value, context)
-
-            if explicit_type:
-                # Only flag 'already declared' if the variable exists in THIS exact context
-                local_type = context.types.get(node["target"])
-                if local_type is not None and not context.in_function:
-                    raise NameError(f"Variable '{node['target']}' is already declared")
-                elif local_type is not None and context.in_function:
-                    _print_warning(f"Variable '{node['target']}' shadows a global variable")
-
-                self._validate_declared_type(node["target"], value, explicit_type)
-                context.set(node["target"], value, explicit_type)
-
-            else:
-                if existing_type is None:
-                    raise NameError(f"Variable '{node['target']}' is not declared")
-
-                self._validate_declared_type(node["target"], value, existing_type)
-                context.set(node["target"], value)
+        elif node_type == "const_decl":
+            self._assign_value(node, self.evaluate(node["value"], context), context)
+            context.constants.add(node["target"])
 
         elif node_type == "method_call":
             return self._evaluate_method_call(node, context)
 
         elif node_type == "for":
-            # Create a new context for the loop
-            loop_context = Context(parent=context)
-            loop_context.in_loop = True
-            self._inherit_context_flags(loop_context, context)
-            
-            # Evaluate start, end, and step values (they could be numbers or variables)
-            start = self.evaluate(node["start"], context) if isinstance(node["start"], dict) else node["start"]
-            end = self.evaluate(node["end"], context) if isinstance(node["end"], dict) else node["end"]
-            by = self.evaluate(node["by"], context) if isinstance(node["by"], dict) else node["by"]
-            
-            # Convert to int for iteration
-            i = int(start)
-            end = int(end)
-            by = int(by)
-            is_inclusive = node.get("inclusive", True)  # Default to inclusive if not specified
-            
-            # Get the expected type for the loop variable
-            var_type = node["var_type"]
-            
-            # For loops must use int type for the loop variable
-            if var_type != "int":
-                raise TypeError(f"For loop variable must be of type int, got {var_type}")
-            
+            var_name = node["var"]
+            body = node["body"]
+            iterations = self._counted_range(node, context)
+            function_name = self._enclosing_function_name(context)
+            unchecked = self._enter_loop(node, context, iterations)
+
             try:
-                if by > 0:
-                    while i < end or (is_inclusive and i == end):
-                        if var_type == "int" and not isinstance(i, int):
-                            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                        iter_context = Context(parent=context)
-                        iter_context.in_loop = True
-                        self._inherit_context_flags(iter_context, context)
-                        iter_context.set(node["var"], i, var_type)
-                        try:
-                            self.execute_block(node["body"], iter_context)
-                        except ContinueException:
-                            pass
-                        i += by
-                else:  # by < 0
-                    while i > end or (is_inclusive and i == end):
-                        if var_type == "int" and not isinstance(i, int):
-                            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                        iter_context = Context(parent=context)
-                        iter_context.in_loop = True
-                        self._inherit_context_flags(iter_context, context)
-                        iter_context.set(node["var"], i, var_type)
-                        try:
-                            self.execute_block(node["body"], iter_context)
-                        except ContinueException:
-                            pass
-                        i += by
+                for i in iterations:
+                    iter_context = self._loop_context(context, function_name)
+                    # A fresh iteration scope has nothing to shadow or import,
+                    # so the loop variable goes straight into its slot
+                    iter_context.variables[var_name] = i
+                    iter_context.types[var_name] = "int"
+                    try:
+                        self.execute_block(body, iter_context)
+                    except ContinueException:
+                        pass
             except BreakException:
                 # Exit the loop
                 pass
+            finally:
+                self._restore_reads(unchecked)
 
         elif node_type == "foreach":
-            # Create a new context for the loop
-            loop_context = Context(parent=context)
-            loop_context.in_loop = True
-            self._inherit_context_flags(loop_context, context)
-            
             items = self.evaluate(node["iterable"], context)
-            var_type = node["var_type"]
-            
+            function_name = self._enclosing_function_name(context)
+            unchecked = self._enter_loop(node, context)
+
             try:
                 for item in items:
-                    # Check if the value matches the declared type
-                    if var_type == "int" and not isinstance(item, int):
-                        raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                    elif var_type == "float" and not isinstance(item, float):
-                        raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                    elif var_type == "str" and not isinstance(item, str):
-                        raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                    elif var_type == "bool" and not isinstance(item, bool):
-                        raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                    elif var_type == "list" and not isinstance(item, list):
-                        raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-                    elif var_type == "hash" and not isinstance(item, dict):
-                        raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
-
+                    if not node.get("item_checked"):
+                        self._check_loop_item(node, item)
                     # Fresh context per iteration so body-local vars don't collide across runs
-                    iter_context = Context(parent=context)
-                    iter_context.in_loop = True
-                    self._inherit_context_flags(iter_context, context)
-                    iter_context.set(node["var"], item, var_type)
+                    iter_context = self._loop_context(context, function_name)
+                    iter_context.set(node["var"], item, node["var_type"])
                     try:
                         self.execute_block(node["body"], iter_context)
                     except ContinueException:
@@ -1122,13 +2466,15 @@ class Interpreter:
             except BreakException:
                 # Exit the loop
                 pass
+            finally:
+                self._restore_reads(unchecked)
 
         elif node_type == "while":
+            function_name = self._enclosing_function_name(context)
+            unchecked = self._enter_loop(node, context)
             try:
                 while self.evaluate_condition(node["condition"], context):
-                    iter_context = Context(parent=context)
-                    iter_context.in_loop = True
-                    self._inherit_context_flags(iter_context, context)
+                    iter_context = self._loop_context(context, function_name)
                     try:
                         self.execute_block(node["body"], iter_context)
                     except ContinueException:
@@ -1137,20 +2483,16 @@ class Interpreter:
             except BreakException:
                 # Exit the loop
                 pass
+            finally:
+                self._restore_reads(unchecked)
 
         elif node_type == "if":
             if self.evaluate_condition(node["condition"], context):
                 # Create a new context for the if block
-                if_context = Context(parent=context)
-                if_context.in_loop = context.in_loop
-                self._inherit_context_flags(if_context, context)
-                self.execute_block(node["body"], if_context)
+                self.execute_block(node["body"], self._block_context(context))
             elif node.get("else_body"):
                 # Create a new context for the else block
-                else_context = Context(parent=context)
-                else_context.in_loop = context.in_loop
-                self._inherit_context_flags(else_context, context)
-                self.execute_block(node["else_body"], else_context)
+                self.execute_block(node["else_body"], self._block_context(context))
 
         elif node_type == "func_def":
             context.define_function(
@@ -1159,28 +2501,145 @@ class Interpreter:
                 node["body"],
                 node["inline"],
                 node.get("param_types", {}),  # Pass parameter types
-                node.get("return_type")  # Pass return type
+                node.get("return_type"),  # Pass return type
+                self._memo_cache(node["name"], node["memo"]) if node.get("memo") else None,
+                node.get("args_checked", False),
+                node.get("return_checked", False),
             )
+            func = context.functions[node["name"]]
+            if node.get("captures") is not None and context.parent is not None:
+                closure = context.capture_scope(node["captures"])
+                if closure is not None:
+                    func["scope"] = closure
+            if _wants_feedback(func):
+                func["feedback"] = TypeFeedback(self._feedback_stats(node["name"]))
 
         elif node_type == "function_call":
             return context.call_function(node["name"], node["args"], self)
         
         elif node_type == "return":
-            if not context.in_function and not any(parent.in_function for parent in self._get_parent_contexts(context)):
-                raise SyntaxError("'return' statement outside function")
+            if not node.get("placement_checked"):
+                self._check_return_allowed(context)
+            if node.get("tail_call"):
+                call = node["value"]
+                func = context.resolve_function(call["name"])
+                if func is not None:
+                    arg_values = context.evaluate_call_arguments(call["name"], func, call["args"], self)
+                    raise TailCall(call["name"], func, arg_values, context)
             value = self.evaluate(node["value"], context) if node.get("value") else None
             raise ReturnValue(value)
             
         elif node_type == "break":
-            if not context.in_loop and not any(parent.in_loop for parent in self._get_parent_contexts(context)):
-                raise SyntaxError("'break' statement outside loop")
+            if not node.get("placement_checked"):
+                self._check_loop_jump_allowed("break", context)
             raise BreakException()
             
         elif node_type == "continue":
-            if not context.in_loop and not any(parent.in_loop for parent in self._get_parent_contexts(context)):
-                raise SyntaxError("'continue' statement outside loop")
+            if not node.get("placement_checked"):
+                self._check_loop_jump_allowed("continue", context)
             raise ContinueException()
 
+    def _assign_value(self, node, value, context):
+        explicit_type = node.get("var_type")  # Type provided in code
+        existing_type = context.get_type(node["target"])
+
+        # Check if variable is being watched
+        if context.is_watched(node["target"]):
+            self._watch_change(node["target"], value, context)
+
+        if explicit_type:
+            # Only flag 'already declared' if the variable exists in THIS exact context
+            local_type = context.types.get(node["target"])
+            if local_type is not None and not context.in_function:
+                raise NameError(f"Variable '{node['target']}' is already declared")
+            elif local_type is not None and context.in_function and not context.scope_checked:
+                _print_warning(
+                    f"Variable '{node['target']}' shadows a global variable", "shadowed-variable", node.get("line")
+                )
+
+            if not node.get("type_checked"):
+                self._validate_declared_type(node["target"], value, explicit_type)
+            context.set(node["target"], value, explicit_type)
+
+        else:
+            if existing_type is None:
+                raise NameError(f"Variable '{node['target']}' is not declared")
+
+            if not node.get("type_checked"):
+                self._validate_declared_type(node["target"], value, existing_type)
+            context.set(node["target"], value)
+
+    def _check_loop_jump_allowed(self, keyword, context):
+        """Placement check for `break`/`continue` nodes the parser has not already checked."""
+        if not context.in_loop and not any(parent.in_loop for parent in self._get_parent_contexts(context)):
+            raise SyntaxError(f"'{keyword}' statement outside loop")
+
+    def _check_return_allowed(self, context):
+        if not context.in_function and not any(parent.in_function for parent in self._get_parent_contexts(context)):
+            raise SyntaxError("'return' statement outside function")
+
+    def _block_context(self, context):
+        """Scope for the body of an if/else branch."""
+        block_context = Context(parent=context)
+        block_context.in_loop = context.in_loop
+        self._inherit_context_flags(block_context, context)
+        return block_context
+
+    def _loop_context(self, context, function_name):
+        """Scope for one loop iteration; `function_name` is looked up once per loop."""
+        iter_context = Context(parent=context)
+        iter_context.in_loop = True
+        iter_context.in_function = context.in_function
+        if function_name is not None:
+            iter_context.functions["__current_function"] = function_name
+        return iter_context
+
+    def _counted_range(self, node, context):
+        """The native range a counted `for` loop iterates over."""
+        # Evaluate start, end, and step values (they could be numbers or variables)
+        start = self.evaluate(node["start"], context) if isinstance(node["start"], dict) else node["start"]
+        end = self.evaluate(node["end"], context) if isinstance(node["end"], dict) else node["end"]
+        by = self.evaluate(node["by"], context) if isinstance(node["by"], dict) else node["by"]
+
+        # Convert to int for iteration
+        start = int(start)
+        end = int(end)
+        by = int(by)
+
+        # For loops must use int type for the loop variable
+        var_type = node["var_type"]
+        if var_type != "int":
+            raise TypeError(f"For loop variable must be of type int, got {var_type}")
+        if by == 0:
+            raise ValueError("For loop step cannot be 0")
+
+        # `..` includes the end value, `...` stops before it
+        if node.get("inclusive", True):
+            end += 1 if by > 0 else -1
+        return range(start, end, by)
+
+    def _check_loop_item(self, node, item):
+        # Check if the value matches the declared type
+        var_type = node["var_type"]
+        if var_type == "int" and not isinstance(item, int):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "float" and not isinstance(item, float):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "str" and not isinstance(item, str):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "bool" and not isinstance(item, bool):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "list" and not isinstance(item, list):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "hash" and not isinstance(item, dict):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "set" and not isinstance(item, EchoSet):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "deque" and not isinstance(item, deque):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+        elif var_type == "heap" and not isinstance(item, Heap):
+            raise TypeError(f"Loop variable {node['var']} must be of type {var_type}")
+
     def _get_parent_contexts(self, context):
         """Helper to get all parent contexts."""
         parents = []
@@ -1199,7 +2658,14 @@ class Interpreter:
     def evaluate(self, expr, context):
         expr_type = expr["type"]
 
-        if expr_type == "int":
+        if expr_type == "const":
+            return expr["value"]
+        elif expr_type == "const_list":
+            # Echo lists are mutable, so every evaluation hands out a fresh copy.
+            return list(expr["value"])
+        elif expr_type == "const_hash":
+            return dict(expr["value"])
+        elif expr_type == "int":
             # Convert to int and raise error if it's a float
             value = float(expr["value"])
             if value.is_integer():
@@ -1230,14 +2696,11 @@ class Interpreter:
             if value is None and not context.is_variable_defined(name):
                 raise NameError(f"Variable '{expr['name']}' is not defined")
             return value
-        elif expr_type == "list":
-            return [self.evaluate(e, context) for e in expr["elements"]]
-        elif expr_type == "hash":
-            return {
-                pair["key"]: self.evaluate(pair["value"], context)
-                for pair in expr["pairs"]
-            }
         elif expr_type == "binary":
+            apply = expr.get("apply")
+            if apply is not None:
+                return apply(self.evaluate(expr["left"], context), self.evaluate(expr["right"], context))
+
             op = expr["operator"]
 
             if op == "&&":
@@ -1259,35 +2722,40 @@ class Interpreter:
             return self._binary_op(op, left, right)
         elif expr_type == "unary":
             operand = self.evaluate(expr["operand"], context)
-            op = expr["operator"]
-            return self._unary_op(op, operand)
+            apply = expr.get("apply")
+            if apply is not None:
+                return apply(operand)
+            return self._unary_op(expr["operator"], operand)
+        elif expr_type == "list":
+            return [self.evaluate(e, context) for e in expr["elements"]]
+        elif expr_type == "hash":
+            return {
+                pair["key"]: self.evaluate(pair["value"], context)
+                for pair in expr["pairs"]
+            }
+        elif expr_type == "set":
+            return _new_set([self.evaluate(e, context) for e in expr["elements"]])
         elif expr_type == "function_call":
             # # print(f"DEBUG: Method call in evaluate: {expr['method']}")
             return context.call_function(expr["name"], expr["args"], self)
+        elif expr_type == "inline_call":
+            arg_values = [self.evaluate(arg, context) for arg in expr["args"]]
+            return self._run_inline_call(expr, arg_values)
+        elif expr_type == "inline_param":
+            return self._inline_args[-1][expr["index"]]
+        elif expr_type == "hoisted":
+            value = expr["cached"]
+            if value is _NOT_EVALUATED:
+                value = self.evaluate(expr["expr"], context)
+                # A list or hash could be changed by the loop, so only
+                # immutable values are reused
+                if not isinstance(value, (list, dict, EchoSet, deque, Heap)):
+                    expr["cached"] = value
+            return value
         elif expr_type == "index":
             target = self.evaluate(expr["target"], context)
             index = self.evaluate(expr["index"], context)
-            
-            if isinstance(target, dict):
-                if not isinstance(index, str):
-                    raise TypeError(f"Hash key must be a string, got {type(index).__name__}")
-                if index not in target:
-                    raise KeyError(f"Key '{index}' not found in hash")
-                return target[index]
-            elif isinstance(target, str):
-                if not isinstance(index, int):
-                    raise TypeError(f"String index must be an integer, got {type(index).__name__}")
-                if index < 0 or index >= len(target):
-                    raise IndexError(f"String index {index} out of range")
-                return target[index]
-            elif isinstance(target, list):
-                if not isinstance(index, int):
-                    raise TypeError(f"List index must be an integer, got {type(index).__name__}")
-                if index < 0 or index >= len(target):
-                    raise IndexError(f"List index {index} out of range")
-                return target[index]
-            else:
-                raise TypeError(f"Cannot index type {type(target).__name__}")
+            return expr.get("apply", index_value)(target, index)
         elif expr_type == "method_call":
             return self._evaluate_method_call(expr, context)
         elif expr_type == "string_interpolation":
@@ -1298,61 +2766,13 @@ class Interpreter:
                 for part in expr["parts"]
             )
         
-    def _binary_op(self, op, left, right):
-        if op == "+":
-            return left + right
-        elif op == "-":
-            return left - right
-        elif op == "*":
-            return left * right
-        elif op == "/":
-            if type(left) is int and type(right) is int:
-                if right == 0:
-                    raise ZeroDivisionError("integer division by zero")
-                quotient = abs(left) // abs(right)
-                if (left < 0) != (right < 0):
-                    quotient = -quotient
-                return quotient
-            return left / right
-        elif op == "%":
-            if isinstance(left, int) and isinstance(right, int):
-                if right == 0:
-                    raise ZeroDivisionError("integer modulo by zero")
-                quotient = abs(left) // abs(right)
-                if (left < 0) != (right < 0):
-                    quotient = -quotient
-                return left - (quotient * right)
-            return left % right
-        elif op == "==":
-            return left == right
-        elif op == "!=":
-            return left != right
-        elif op == "<":
-            return left < right
-        elif op == ">":
-            return left > right
-        elif op == "<=":
-            return left <= right
-        elif op == ">=":
-            return left >= right
-        elif op == "&&":
-            return bool(left) and bool(right)
-        elif op == "||":
-            return bool(left) or bool(right)
-        else:
-            raise Exception(f"Unknown operator: {op}")
-
-    def _unary_op(self, op, operand):
-        if op == "!":
-            return not bool(operand)
-        elif op == "-":
-            if not isinstance(operand, (int, float)):
-                raise TypeError(f"Unary '-' requires a numeric operand, got {type(operand).__name__}")
-            return -operand
-        else:
-            raise Exception(f"Unknown unary operator: {op}")
+    _binary_op = staticmethod(binary_op)
+    _unary_op = staticmethod(unary_op)
 
     def execute_use_statement(self, node, context):
         """Execute a use statement."""
+        if context.scope_checked:
+            # Imports were validated statically and lookups no longer consult them
+            return
         for var_name in node["variables"]:
             context.import_variable(var_name, node["is_mutable"])
\ No newline at end of file
@@ -15,7 +15,7 @@ class Lexer:
     token_patterns = {
         "KEYWORD": r'\b(fn|for|if|else|foreach|in|by|return|break|continue|while|use|mut|watch|type)\b',
         "RETURN_TYPE": r'->',
-        "DATATYPE": r'\b(int|float|str|bool|dynamic|list|hash|void)\b',
+        "DATATYPE": r'\b(int|float|str|bool|dynamic|list|hash|set|deque|heap|void)\b',
         "METHOD": r'\b(wait|ask|say|asInt|asFloat|asBool|asString|type|trim|upperCase|lowerCase|length|keys|values|reverse|push|empty|clone|countOf|merge|find|insertAt|pull|removeValue|order|wipe|take|take_last|ensure|pairs|default|format)\b',
         "BOOLEAN": r'\b(true|false)\b',
         "NULL": r'\bnull\b',
@@ -25,6 +25,7 @@ class Lexer:
         "OPERATOR": r'(==|=>|<=|>=|!=|[=+\-*/%<>]|&&|\|\||!)',
         "RANGE_OPERATOR": r'\.{2,3}',
         "METHOD_OPERATOR": r'\.',  # Separate pattern for method call dot operator
+        "SET_START": r'#\{',
         "PUNCTUATION": r'[(),;:{}\[\]]',  # Removed dot from punctuation
         "STRING": r'"([^"\\]|\\.)*"|\'([^\'\\]|\\.)*\'',
         "INTERPOLATION_START": r'\${',
@@ -33,8 +34,11 @@ class Lexer:
     }
 
     def __init__(self):
-        # Compile all regex patterns once to improve performance
-        self.compiled_patterns = {k: re.compile(v) for k, v in self.token_patterns.items()}
+        # Patterns are compiled once per process and shared by every Lexer
+        cls = type(self)
+        if "_compiled_patterns" not in cls.__dict__:
+            cls._compiled_patterns = {k: re.compile(v) for k, v in cls.token_patterns.items()}
+        self.compiled_patterns = cls._compiled_patterns
 
     def _find_string_end(self, line, start_index, quote_char):
         escaped = False
@@ -84,7 +88,10 @@ class Lexer:
         return parts
 
     def read_source(self, src_file):
-        tokens = []
+        return list(self.iter_source(src_file))
+
+    def iter_source(self, src_file):
+        """Yield tokens one at a time while reading `src_file` line by line."""
         in_multiline_comment = False
         
         with open(src_file, 'r', encoding='utf-8') as file:
@@ -167,13 +174,13 @@ class Lexer:
                                 
                                 current_pos = end_interp + 1
                             
-                            # Add all parts to the tokens list
-                            tokens.extend(parts)
+                            # Emit all parts in order
+                            yield from parts
                             position = end_quote + 1
                             continue
                         else:
                             # Regular string, no interpolation
-                            tokens.append(Token("STRING", string_content, line_number, position + 1))
+                            yield Token("STRING", string_content, line_number, position + 1)
                             position = end_quote + 1
                             continue
                     
@@ -182,7 +189,7 @@ class Lexer:
                         match = regex.match(line, position)
                         if match:
                             token_value = match.group(0)
-                            tokens.append(Token(token_type, token_value, line_number, position + 1))
+                            yield Token(token_type, token_value, line_number, position + 1)
                             position = match.end()
                             break
                     
@@ -198,7 +205,3 @@ class Lexer:
                             f"Invalid token '{invalid_sequence}' at line {line_number}, column {position + 1}. "
                             f"Check for unsupported characters or typos. Context: '{context}'"
                         )
-
-        # print(tokens)
-        return tokens
-
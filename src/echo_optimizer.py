@@ -0,0 +1,648 @@
+"""Optimization passes over the parsed AST, enabled with `-O`."""
+
+import copy
+from collections import Counter
+
+from echo_analyzer import (
+    CALLBACK_METHODS,
+    MUTATING_METHODS,
+    callback_args,
+    declared_types,
+    function_types,
+    walk_nodes,
+)
+from echo_interpreter import TYPE_MAP, binary_op, unary_op
+
+# Largest inlined body, in AST nodes, after nested inlining.
+DEFAULT_INLINE_BUDGET = 40
+
+# Built-in methods without side effects; their result depends only on the
+# target and arguments.
+PURE_METHODS = frozenset({
+    "asInt", "asFloat", "asBool", "asString", "type", "default", "trim", "upperCase", "lowerCase", "length",
+    "keys", "values", "pairs", "reverse", "format", "clone", "countOf", "find",
+})
+
+_SCALAR_TYPES = frozenset({"int", "float", "str", "bool"})
+_LITERAL_TYPES = frozenset({"const", "const_list", "const_hash", "int", "float", "string", "boolean", "null"})
+_STATEMENT_TYPES = frozenset({
+    "assign", "index_assign", "if", "while", "for", "foreach", "return", "break", "continue", "func_def",
+    "use_statement", "watch_statement",
+})
+_LOOP_TYPES = ("while", "for", "foreach")
+
+
+def _literal(node):
+    """True for a literal whose value constant folding can work with."""
+    return (
+        isinstance(node, dict)
+        and node.get("type") == "const"
+        and isinstance(node["value"], (int, float, str, bool))
+    )
+
+
+def _node_count(node):
+    return sum(1 for _ in walk_nodes(node))
+
+
+def _single_expression(func_node):
+    """The expression a function returns, if its whole body is one expression."""
+    body = func_node.get("body")
+    if func_node.get("inline"):
+        return body if isinstance(body, dict) else None
+    if (
+        isinstance(body, list)
+        and len(body) == 1
+        and isinstance(body[0], dict)
+        and body[0].get("type") == "return"
+        and body[0].get("value")
+    ):
+        return body[0]["value"]
+    return None
+
+
+def _only_reads_params(expr, params):
+    for node in walk_nodes(expr):
+        node_type = node.get("type")
+        if node_type == "identifier" and node["name"] not in params:
+            return False
+        if node_type == "method_call" and node["method"] in MUTATING_METHODS:
+            return False
+    return True
+
+
+def _calls_function(node, types):
+    """True when a method call may run an Echo function named by its arguments.
+
+    order() and heap() call their comparator or key function, and so may
+    push() and pop() on a heap built with one. Unless `types` declares the
+    target a list, push() and pop() are assumed to be on such a heap.
+    """
+    method = node["method"]
+    if method in CALLBACK_METHODS:
+        return any(
+            not (isinstance(arg, dict) and arg.get("type") == "keyword_arg" and arg["name"] == "descending")
+            for arg in callback_args(node)
+        )
+    if method in ("push", "pop"):
+        target = node.get("target")
+        return not (
+            isinstance(target, dict) and target.get("type") == "identifier" and types.get(target["name"]) == "list"
+        )
+    return False
+
+
+def _loop_effects(loop, types):
+    """Names a loop may rebind or mutate, and whether it mutates any list or hash.
+
+    Returns None when the loop calls an Echo function, directly or through a
+    built-in method, since its effects are unknown.
+    """
+    assigned = set()
+    mutates = False
+    if loop.get("var"):
+        assigned.add(loop["var"])
+    for node in walk_nodes([loop.get("condition"), loop["body"]]):
+        node_type = node.get("type")
+        if node_type == "function_call":
+            return None
+        if node_type == "method_call" and _calls_function(node, types):
+            return None
+        if node_type == "assign":
+            assigned.add(node["target"])
+        elif node_type == "index_assign":
+            assigned.add(node["target"])
+            mutates = True
+        elif node_type in ("for", "foreach"):
+            assigned.add(node["var"])
+        elif node_type == "method_call" and node["method"] in MUTATING_METHODS:
+            mutates = True
+            target = node.get("target")
+            if isinstance(target, dict) and target.get("type") == "identifier":
+                assigned.add(target["name"])
+    return assigned, mutates
+
+
+def _walk_code(node):
+    """Like walk_nodes(), but without descending into nested function bodies."""
+    if isinstance(node, dict):
+        yield node
+        if node.get("type") == "func_def":
+            return
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _walk_code(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk_code(item)
+
+
+def _stable_target(expr):
+    """A key naming the value of an index target, or None if it is not a plain path.
+
+    Paths are variables indexed by variables or literals, like `grid[row]`.
+    """
+    expr_type = expr.get("type")
+    if expr_type == "identifier":
+        return expr["name"]
+    if expr_type == "index":
+        target = _stable_target(expr["target"])
+        index = expr["index"]
+        if target is None:
+            return None
+        if index.get("type") == "identifier":
+            return f"{target}[{index['name']}]"
+        if _literal(index):
+            return f"{target}[{index['value']!r}]"
+    return None
+
+
+def _length_limit(expr):
+    """True for `n` or `path.length()`, a loop limit that can be read up front."""
+    if expr.get("type") == "identifier":
+        return True
+    if expr.get("type") == "method_call" and expr["method"] == "length":
+        target = expr.get("target")
+        if target is None and len(expr["args"]) == 1:
+            target = expr["args"][0]
+        return isinstance(target, dict) and _stable_target(target) is not None
+    return False
+
+
+def _counted_while(loop):
+    """(counter, limit) for a `while i < limit { ...; i = i + step; }` loop, else None.
+
+    The step must be a positive int literal and the increment the last
+    statement of the body, so every other statement runs with `i < limit`.
+    """
+    condition = loop["condition"]
+    if condition.get("type") != "binary":
+        return None
+    left, right = condition["left"], condition["right"]
+    if condition["operator"] == "<" and left.get("type") == "identifier":
+        var, limit = left["name"], right
+    elif condition["operator"] == ">" and right.get("type") == "identifier":
+        var, limit = right["name"], left
+    else:
+        return None
+    if not _length_limit(limit) or not loop["body"]:
+        return None
+
+    step = loop["body"][-1]
+    if not isinstance(step, dict) or step.get("type") != "assign" or step["target"] != var or step.get("var_type"):
+        return None
+    value = step["value"]
+    if value.get("type") != "binary" or value["operator"] != "+":
+        return None
+    operands = (value["left"], value["right"])
+    counter = [operand for operand in operands if operand.get("type") == "identifier" and operand["name"] == var]
+    amount = [
+        operand for operand in operands
+        if _literal(operand) and type(operand["value"]) is int and operand["value"] > 0
+    ]
+    if len(counter) != 1 or len(amount) != 1:
+        return None
+    return var, limit
+
+
+def describe(expr):
+    """Render an expression back into (approximate) Echo source."""
+    expr_type = expr.get("type")
+    if expr_type == "identifier":
+        return expr["name"]
+    if expr_type in ("const", "boolean"):
+        value = expr["value"]
+        if isinstance(value, str):
+            return f'"{value}"'
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+    if expr_type in ("int", "float", "string"):
+        return str(expr["value"])
+    if expr_type == "null":
+        return "null"
+    if expr_type == "binary":
+        return f"{_describe_operand(expr['left'])} {expr['operator']} {_describe_operand(expr['right'])}"
+    if expr_type == "unary":
+        return f"{expr['operator']}{_describe_operand(expr['operand'])}"
+    if expr_type == "index":
+        return f"{_describe_operand(expr['target'])}[{describe(expr['index'])}]"
+    if expr_type in ("method_call", "function_call", "inline_call"):
+        name = expr.get("method") or expr["name"]
+        args = ", ".join(describe(arg) for arg in expr["args"])
+        if expr.get("target") is not None:
+            return f"{_describe_operand(expr['target'])}.{name}({args})"
+        return f"{name}({args})"
+    if expr_type == "keyword_arg":
+        return f"{expr['name']}: {describe(expr['value'])}"
+    if expr_type == "hoisted":
+        return describe(expr["expr"])
+    return "..."
+
+
+def _describe_operand(expr):
+    text = describe(expr)
+    return f"({text})" if expr.get("type") == "binary" else text
+
+
+def _substitute_params(expr, params):
+    """Replace parameter reads with slots into the inlined call's arguments."""
+    if isinstance(expr, list):
+        return [_substitute_params(item, params) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if expr.get("type") == "identifier":
+        return {"type": "inline_param", "index": params.index(expr["name"])}
+    return {key: _substitute_params(value, params) for key, value in expr.items()}
+
+
+class Optimizer:
+    """Rewrite a parsed program into a faster equivalent.
+
+    Inlining replaces calls to small top-level functions whose body is a
+    single expression (`=> expr` or `{ return expr; }`) with `inline_call`
+    nodes. The interpreter evaluates those without allocating a frame, but
+    still checks argument and return types. A call is only inlined where the
+    function is certain to be defined already, so programs that would fail
+    with "not defined" still do.
+
+    Constant propagation replaces reads of a `const` with its value, folds
+    operators whose operands are all literals, and drops `if`/`while`
+    branches whose condition is a literal that can never let them run.
+    Constants cannot be reassigned or shadowed (the parser rejects that), so
+    every read after the declaration sees the declared value.
+
+    Bounds-check elimination looks for `xs[i]` reads in counted loops over
+    `i`: `for` loops, and `while i < limit` loops whose last statement adds
+    a positive literal to `i`. `xs` must be a variable or a path like
+    `grid[row]` that the loop cannot rebind or resize: it makes no calls,
+    no in-place method calls, and does not otherwise assign `i` or any
+    variable in the path. The reads are recorded on the loop as "bounds".
+    When the loop starts, the interpreter checks once that `xs` is a list
+    or string and that every value `i` can take is within its length. If
+    so, those reads skip their checks for that run of the loop; otherwise
+    they stay checked.
+
+    Hoisting wraps pure expressions that cannot change while a loop runs in
+    `hoisted` nodes. The interpreter evaluates each one the first time the
+    loop reaches it and reuses the value for the rest of that loop, so errors
+    are raised where they were before. List and hash results are never
+    reused, since the loop could modify them.
+
+    `report` lists what was changed, one line per optimization.
+    """
+
+    def __init__(self, inline=True, inline_budget=DEFAULT_INLINE_BUDGET, hoist=True, fold=True, bounds=True):
+        self.inline = inline
+        self.inline_budget = inline_budget
+        self.hoist = hoist
+        self.fold = fold
+        self.bounds = bounds
+        self.report = []
+
+    def optimize(self, ast):
+        self.report = []
+        if self.fold:
+            self._fold_constants(ast)
+        if self.inline:
+            self._inline_functions(ast)
+        if self.bounds:
+            # Before hoisting, which may wrap the targets of the reads
+            self._bounds_block(ast)
+        if self.hoist:
+            self._hoist_block(ast, declared_types(ast))
+        return ast
+
+    def _fold_constants(self, ast):
+        constants = {}  # name -> value, for constants declared so far
+        uses = Counter()
+        self._folded = 0
+        for index, stmt in enumerate(ast):
+            if not isinstance(stmt, dict):
+                continue
+            # Only code after a declaration can read the constant
+            ast[index] = stmt = self._fold(stmt, constants, uses)
+            if stmt is not None and stmt.get("type") == "const_decl" and _literal(stmt["value"]):
+                value = stmt["value"]["value"]
+                if isinstance(value, TYPE_MAP[stmt["var_type"]]):
+                    constants[stmt["target"]] = value
+        ast[:] = [stmt for stmt in ast if stmt is not None]
+
+        for name, count in uses.items():
+            self.report.append(f"propagated constant {name} into {count} use{'s' if count != 1 else ''}")
+        if self._folded:
+            self.report.append(
+                f"folded {self._folded} constant expression{'s' if self._folded != 1 else ''}"
+            )
+
+    def _fold(self, node, constants, uses):
+        """Propagate constants into `node` and fold what becomes literal.
+
+        Returns the replacement node, or None for a statement that can never run.
+        """
+        if isinstance(node, list):
+            folded = []
+            for item in node:
+                replacement = self._fold(item, constants, uses)
+                if replacement is not None or item is None:
+                    folded.append(replacement)
+            node[:] = folded
+            return node
+        if not isinstance(node, dict):
+            return node
+
+        node_type = node.get("type")
+        if node_type in _LITERAL_TYPES:
+            return node  # literal values may look like nodes
+        if node_type == "identifier" and node["name"] in constants:
+            uses[node["name"]] += 1
+            return {"type": "const", "value": constants[node["name"]]}
+
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                node[key] = self._fold(value, constants, uses)
+
+        if node_type == "binary":
+            left, right, op = node["left"], node["right"], node["operator"]
+            if _literal(left) and op in ("&&", "||") and bool(left["value"]) == (op == "||"):
+                # The right operand is never evaluated
+                return self._folded_literal(node, bool(left["value"]))
+            if _literal(left) and _literal(right):
+                try:
+                    return self._folded_literal(node, binary_op(op, left["value"], right["value"]))
+                except Exception:
+                    return node  # leave the error to runtime
+        elif node_type == "unary" and _literal(node["operand"]):
+            try:
+                return self._folded_literal(node, unary_op(node["operator"], node["operand"]["value"]))
+            except Exception:
+                return node
+        elif node_type in ("if", "while") and _literal(node["condition"]):
+            return self._fold_branch(node)
+        return node
+
+    def _folded_literal(self, node, value):
+        if not isinstance(value, (int, float, str, bool)):
+            return node
+        self._folded += 1
+        return {"type": "const", "value": value}
+
+    def _fold_branch(self, node):
+        where = f"line {node['line']}: " if node.get("line") is not None else ""
+        runs = bool(node["condition"]["value"])
+        if node["type"] == "while":
+            if runs:
+                return node
+            self.report.append(f"{where}removed while loop that never runs")
+            return None
+
+        else_body = node.pop("else_body", None)
+        if runs:
+            if else_body:
+                self.report.append(f"{where}removed else branch that never runs")
+            return node
+        self.report.append(f"{where}removed if branch that never runs")
+        if not else_body:
+            return None
+        # Keep the else branch in its own block scope
+        node["condition"] = {"type": "const", "value": True}
+        node["body"] = else_body
+        return node
+
+    def _inline_functions(self, ast):
+        definitions = Counter(node["name"] for node in walk_nodes(ast) if node.get("type") == "func_def")
+
+        # name -> (statement index, func_def node, inlined body)
+        inlinable = {}
+        for index, stmt in enumerate(ast):
+            if not isinstance(stmt, dict) or stmt.get("type") != "func_def":
+                continue
+            name = stmt["name"]
+            expr = _single_expression(stmt)
+            if definitions[name] != 1 or stmt.get("memo") or stmt.get("return_type") == "void" or expr is None:
+                continue
+            if not _only_reads_params(expr, stmt["params"]):
+                continue
+
+            # Calls in the body may only reach functions defined before this
+            # one; after that, the body must not call anything else.
+            body = self._rewrite_calls(copy.deepcopy(expr), inlinable, index)
+            if any(node.get("type") == "function_call" for node in walk_nodes(body)):
+                continue
+            if _node_count(body) > self.inline_budget:
+                continue
+            inlinable[name] = (index, stmt, _substitute_params(body, stmt["params"]))
+
+        if not inlinable:
+            return
+        for index, stmt in enumerate(ast):
+            if isinstance(stmt, dict):
+                # Anything after a definition runs once that function exists
+                ast[index] = self._rewrite_calls(stmt, inlinable, index)
+
+        counts = Counter(node["name"] for node in walk_nodes(ast) if node.get("type") == "inline_call")
+        for name in inlinable:
+            if counts[name]:
+                self.report.append(f"inlined {counts[name]} call{'s' if counts[name] != 1 else ''} to {name}()")
+
+    def _rewrite_calls(self, node, inlinable, limit):
+        """Inline calls in `node` to functions defined before statement `limit`."""
+        if isinstance(node, list):
+            for position, item in enumerate(node):
+                node[position] = self._rewrite_calls(item, inlinable, limit)
+            return node
+        if not isinstance(node, dict) or node.get("type") in _LITERAL_TYPES:
+            return node
+
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                node[key] = self._rewrite_calls(value, inlinable, limit)
+
+        if node.get("type") != "function_call" or node["name"] not in inlinable:
+            return node
+        index, func_node, body = inlinable[node["name"]]
+        args = node["args"]
+        if index >= limit or len(args) != len(func_node["params"]):
+            return node
+        if any(isinstance(arg, dict) and arg.get("type") == "keyword_arg" for arg in args):
+            return node
+
+        inlined = {
+            "type": "inline_call",
+            "name": node["name"],
+            "args": args,
+            "function": {
+                "params": func_node["params"],
+                "param_types": func_node.get("param_types", {}),
+                "return_type": func_node.get("return_type"),
+            },
+            "body": copy.deepcopy(body),
+        }
+        if "line" in node:
+            inlined["line"] = node["line"]
+        return inlined
+
+    def _bounds_block(self, statements):
+        for stmt in statements:
+            if not isinstance(stmt, dict):
+                continue
+            if stmt.get("type") in ("for", "while"):
+                self._bounds_loop(stmt)
+            for key in ("body", "else_body"):
+                if isinstance(stmt.get(key), list):
+                    self._bounds_block(stmt[key])
+
+    def _bounds_loop(self, loop):
+        if loop["type"] == "for":
+            var, limit, body = loop["var"], None, loop["body"]
+        else:
+            counted = _counted_while(loop)
+            if counted is None:
+                return
+            var, limit = counted
+            body = loop["body"][:-1]  # everything before the increment
+        nodes = list(_walk_code(body))
+        assigned = {var}
+        index_assigned = set()
+        for node in nodes:
+            node_type = node.get("type")
+            if node_type == "function_call":
+                return
+            if node_type == "method_call" and node["method"] in MUTATING_METHODS:
+                return
+            if node_type == "assign":
+                if node["target"] == var:
+                    return
+                assigned.add(node["target"])
+            elif node_type == "index_assign":
+                index_assigned.add(node["target"])
+            elif node_type in ("for", "foreach"):
+                if node["var"] == var:
+                    return
+                assigned.add(node["var"])
+
+        if limit is not None:
+            if any(part.get("type") == "identifier" and part["name"] in assigned for part in walk_nodes(limit)):
+                return
+            loop["bounds_counter"] = {"var": var, "limit": limit}
+
+        bounds = {}  # target key -> {"target": node, "reads": [index nodes]}
+        for node in nodes:
+            if node.get("type") != "index" or node["index"].get("type") != "identifier":
+                continue
+            if node["index"]["name"] != var:
+                continue
+            key = _stable_target(node["target"])
+            if key is None:
+                continue
+            names = {part["name"] for part in walk_nodes(node["target"]) if part.get("type") == "identifier"}
+            if names & assigned:
+                continue
+            if node["target"]["type"] == "index" and names & index_assigned:
+                # The path could lead to a different list after an element assignment
+                continue
+            bounds.setdefault(key, {"target": node["target"], "reads": []})["reads"].append(node)
+
+        if not bounds:
+            loop.pop("bounds_counter", None)
+            return
+        loop["bounds"] = list(bounds.values())
+        where = f"line {loop['line']}: " if loop.get("line") is not None else ""
+        for key, bound in bounds.items():
+            reads = len(bound["reads"])
+            self.report.append(
+                f"{where}checked bounds of {key}[{var}] once per {loop['type']} loop "
+                f"({reads} read{'s' if reads != 1 else ''})"
+            )
+
+    def _hoist_block(self, statements, types):
+        for stmt in statements:
+            if not isinstance(stmt, dict):
+                continue
+            stmt_type = stmt.get("type")
+            if stmt_type == "func_def":
+                if isinstance(stmt.get("body"), list):
+                    self._hoist_block(stmt["body"], function_types(stmt, types))
+                continue
+            if stmt_type in _LOOP_TYPES:
+                self._hoist_loop(stmt, types)
+            for key in ("body", "else_body"):
+                if isinstance(stmt.get(key), list):
+                    self._hoist_block(stmt[key], types)
+
+    def _hoist_loop(self, loop, types):
+        effects = _loop_effects(loop, types)
+        if effects is None:
+            return
+        assigned, mutates = effects
+        hoisted = []
+
+        def invariant(expr):
+            expr_type = expr.get("type")
+            if expr_type in _LITERAL_TYPES:
+                return True
+            if expr_type == "identifier":
+                name = expr["name"]
+                # An in-place change may reach a list or hash through an alias
+                return name not in assigned and (not mutates or types.get(name) in _SCALAR_TYPES)
+            if expr_type == "binary":
+                return invariant(expr["left"]) and invariant(expr["right"])
+            if expr_type == "unary":
+                return invariant(expr["operand"])
+            if expr_type == "index":
+                return invariant(expr["target"]) and invariant(expr["index"])
+            if expr_type == "method_call":
+                if expr["method"] not in PURE_METHODS:
+                    return False
+                target = expr.get("target")
+                return (target is None or invariant(target)) and all(invariant(arg) for arg in expr["args"])
+            if expr_type == "keyword_arg":
+                return invariant(expr["value"])
+            if expr_type == "string_interpolation":
+                return all(invariant(part) for part in expr["parts"])
+            if expr_type == "inline_call":
+                pure_body = all(
+                    node.get("type") != "method_call" or node["method"] in PURE_METHODS
+                    for node in walk_nodes(expr["body"])
+                )
+                return pure_body and all(invariant(arg) for arg in expr["args"])
+            return False
+
+        def rewrite(node):
+            if isinstance(node, list):
+                for position, item in enumerate(node):
+                    node[position] = rewrite(item)
+                return node
+            if not isinstance(node, dict):
+                return node
+            node_type = node.get("type")
+            if node_type in ("func_def", "hoisted") or node_type in _LITERAL_TYPES:
+                return node
+            if (
+                node_type not in _STATEMENT_TYPES
+                and node_type not in _LITERAL_TYPES
+                and node_type not in ("identifier", "list", "hash", "keyword_arg")
+                and invariant(node)
+            ):
+                wrapped = {"type": "hoisted", "expr": node}
+                hoisted.append(wrapped)
+                return wrapped
+            for key, value in node.items():
+                if isinstance(value, (dict, list)):
+                    node[key] = rewrite(value)
+            return node
+
+        if loop["type"] == "while":
+            loop["condition"] = rewrite(loop["condition"])
+        rewrite(loop["body"])
+        if not hoisted:
+            return
+        loop["hoisted"] = hoisted
+        where = f"line {loop['line']}: " if loop.get("line") is not None else ""
+        for wrapped in hoisted:
+            self.report.append(f"{where}hoisted {describe(wrapped['expr'])} out of {loop['type']} loop")
+
+
+def optimize(ast, **options):
+    """Run the optimizer over `ast` in place; see `Optimizer`."""
+    return Optimizer(**options).optimize(ast)
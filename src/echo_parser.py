@@ -1,6 +1,17 @@
 from __future__ import annotations
 
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
+
+from echo_analyzer import memo_purity_error, walk_nodes
+
+# Cache size used by `memo fn` when no explicit bound is given with `memo(N) fn`.
+DEFAULT_MEMO_SIZE = 1024
+
+# Types a `const` may have; constants are immutable values.
+CONST_TYPES = ("int", "float", "str", "bool")
+
+# Collection types created by calling the type name, as in `deque()`.
+CONSTRUCTOR_TYPES = ("deque", "heap")
 
 
 class Token:
@@ -20,30 +31,121 @@ class ListLiteral:
         self.elements = elements
 
 
+_ESCAPE_SEQUENCES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _strip_quotes(raw: str) -> str:
+    """Remove the quotes around a complete string literal token."""
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in ('"', "'"):
+        return raw[1:-1]
+    return raw
+
+
+def _decode_escapes(raw: str) -> str:
+    """Decode the escape sequences in literal text, in one pass."""
+    if "\\" not in raw:
+        return raw
+
+    chars = []
+    idx = 0
+    while idx < len(raw):
+        char = raw[idx]
+        if char == "\\" and idx + 1 < len(raw) and raw[idx + 1] in _ESCAPE_SEQUENCES:
+            chars.append(_ESCAPE_SEQUENCES[raw[idx + 1]])
+            idx += 2
+            continue
+        chars.append(char)
+        idx += 1
+    return "".join(chars)
+
+
+def _decode_string_literal(raw: str) -> str:
+    """Strip surrounding quotes and decode escape sequences."""
+    return _decode_escapes(_strip_quotes(raw))
+
+
+def _const(value: Any) -> dict:
+    return {"type": "const", "value": value}
+
+
+def _is_const(node: Any) -> bool:
+    return isinstance(node, dict) and node.get("type") == "const"
+
+
+class LazyFunctionBody:
+    """Token span of a block function body, parsed on first use."""
+
+    def __init__(
+        self,
+        parser: "Parser",
+        name: str,
+        return_type: Any,
+        tokens: list[Token],
+        params: Optional[list] = None,
+        memo: Optional[int] = None,
+    ):
+        self.name = name
+        self.return_type = return_type
+        self.tokens = tokens
+        self.params = params or []
+        self.memo = memo
+        # Aliases are resolved as they were where the function was defined.
+        self.type_aliases = dict(parser.type_aliases)
+        # Shared, so constants declared later in the program are protected too
+        self.constants = parser.constants
+        self.statements: Optional[list] = None
+
+    def parse(self) -> list:
+        if self.statements is None:
+            parser = Parser([], lazy_functions=True)
+            parser.tokens = self.tokens
+            parser.type_aliases = self.type_aliases
+            parser.constants = self.constants
+            parser.in_function = True
+            body = []
+            while not parser._at_end():
+                stmt = parser.parse_statement()
+                if stmt:
+                    body.append(stmt)
+            parser._finish_function_body(self.name, self.return_type, body, self.params, self.memo)
+            parser._check_constants(body, top_level=False)
+            self.statements = body
+            self.tokens = []
+        return self.statements
+
+
+def _coerce_token(token_str: Any) -> Token:
+    """Convert a lexer token, or a string like "KEYWORD(fn)", into a parser Token."""
+    if isinstance(token_str, str):
+        # Parse token string like "KEYWORD(fn)" into type and value
+        type_end = token_str.find('(')
+        value_end = token_str.rfind(')')
+        if type_end == -1 or value_end == -1 or value_end <= type_end:
+            raise SyntaxError(f"Invalid token format: {token_str}")
+        return Token(token_str[:type_end], token_str[type_end + 1:value_end])
+    token_type = getattr(token_str, "type", None)
+    token_value = getattr(token_str, "value", None)
+    if token_type is None:
+        raise TypeError(f"Invalid token object: {token_str}")
+    token_line = getattr(token_str, "line", None)
+    token_col = getattr(token_str, "col", getattr(token_str, "column", None))
+    return Token(token_type, token_value, token_line, token_col)
+
+
 class Parser:
-    def __init__(self, tokens: list[Any]):
+    def __init__(self, tokens: list[Any], lazy_functions: bool = False):
         # Convert string tokens to Token objects if needed
-        self.tokens: list[Token] = []
-        for token_str in tokens:
-            if isinstance(token_str, str):
-                # Parse token string like "KEYWORD(fn)" into type and value
-                type_end = token_str.find('(')
-                value_end = token_str.rfind(')')
-                if type_end == -1 or value_end == -1 or value_end <= type_end:
-                    raise SyntaxError(f"Invalid token format: {token_str}")
-                token_type = token_str[:type_end]
-                token_value = token_str[type_end + 1:value_end]
-                self.tokens.append(Token(token_type, token_value))
-            else:
-                token_type = getattr(token_str, "type", None)
-                token_value = getattr(token_str, "value", None)
-                if token_type is None:
-                    raise TypeError(f"Invalid token object: {token_str}")
-                token_line = getattr(token_str, "line", None)
-                token_col = getattr(token_str, "col", getattr(token_str, "column", None))
-                self.tokens.append(Token(token_type, token_value, token_line, token_col))
+        self.tokens: list[Token] = [_coerce_token(token_str) for token_str in tokens]
         self.pos = 0
         self.type_aliases: dict[str, object] = {}
+        # name -> const_decl node, for every `const` parsed so far
+        self.constants: dict[str, dict] = {}
+        # Defer parsing of block function bodies until the function is called
+        self.lazy_functions = lazy_functions
+        # Where the statement being parsed sits, so that `return`, `break`
+        # and `continue` are checked once here instead of at run time
+        self.loop_depth = 0
+        self.in_function = False
 
     def peek(self) -> Optional[Token]:
         return self.tokens[self.pos] if self.pos < len(self.tokens) else None
@@ -121,9 +223,11 @@ class Parser:
                 )
 
             next_tok = self._peek_offset(1)
-            if self._is_name_token(t) and next_tok is not None and next_tok.type == "PUNCTUATION" and next_tok.value == ":":
+            # Keywords such as `by` are allowed as argument names: `order(by: key)`
+            is_arg_name = self._is_name_token(t) or (t is not None and t.type == "KEYWORD")
+            if is_arg_name and next_tok is not None and next_tok.type == "PUNCTUATION" and next_tok.value == ":":
                 seen_keyword_arg = True
-                arg_name = self._expect_name("keyword argument name")
+                arg_name = self.consume().value
                 self.expect("PUNCTUATION", ":")
                 args.append({"type": "keyword_arg", "name": arg_name, "value": self.parse_expression()})
             else:
@@ -152,6 +256,13 @@ class Parser:
     def _is_callable_type_keyword(self, tok: Optional[Token]) -> bool:
         return tok is not None and tok.type == "KEYWORD" and tok.value == "type"
 
+    def _is_constructor_call(self, tok: Optional[Token]) -> bool:
+        next_tok = self._peek_offset(1)
+        return (
+            tok is not None and tok.type == "DATATYPE" and tok.value in CONSTRUCTOR_TYPES
+            and next_tok is not None and next_tok.type == "PUNCTUATION" and next_tok.value == "("
+        )
+
     def _is_method_token(self, tok: Optional[Token]) -> bool:
         return self._is_name_token(tok) or self._is_callable_type_keyword(tok)
 
@@ -204,6 +315,7 @@ class Parser:
             stmt = self.parse_statement()
             if stmt:
                 statements.append(stmt)
+        self._check_constants(statements)
         return statements
 
     def parse_statement(self):
@@ -234,25 +346,20 @@ class Parser:
                     return expr
                 return self.parse_type_alias()
             elif token.value == "return":
-                self.advance()
-                expr = None
-                if not self._is_token("PUNCTUATION", ";"):
-                    expr = self.parse_expression()
-                self.expect("PUNCTUATION", ";")
-                return {"type": "return", "value": expr}
+                return self.parse_return()
             elif token.value == "break":
-                self.advance()
-                self.expect("PUNCTUATION", ";")
-                return {"type": "break"}
+                return self.parse_break()
             elif token.value == "continue":
-                self.advance()
-                self.expect("PUNCTUATION", ";")
-                return {"type": "continue"}
-        elif token.type == "PUNCTUATION" and token.value == "[":
-            # Handle list literals with method calls
+                return self.parse_continue()
+        elif (token.type == "PUNCTUATION" and token.value == "[") or self._is_constructor_call(token):
+            # Handle list literals and constructors such as `deque()` with method calls
             expr = self.parse_expression()
             self.expect("PUNCTUATION", ";")
             return expr
+        elif token.type == "IDENTIFIER" and token.value == "memo" and self._memo_modifier_length():
+            return self.parse_memo_function()
+        elif token.type == "IDENTIFIER" and token.value == "const" and self._is_const_declaration():
+            return self.parse_const_declaration()
         elif token.type == "IDENTIFIER" or token.type == "METHOD":
             expr = self.parse_assignment_or_expr()
             return expr
@@ -262,7 +369,96 @@ class Parser:
             
         return None
 
-    def parse_function(self):
+    def _memo_modifier_length(self) -> int:
+        """Number of tokens in a `memo` or `memo(N)` modifier before `fn`, or 0 if there is none."""
+        for length in (1, 4):
+            tok = self._peek_offset(length)
+            if tok is not None and tok.type == "KEYWORD" and tok.value == "fn":
+                if length == 1:
+                    return 1
+                open_tok, size_tok, close_tok = (self._peek_offset(i) for i in (1, 2, 3))
+                if (
+                    open_tok.type == "PUNCTUATION" and open_tok.value == "("
+                    and size_tok.type == "NUMBER"
+                    and close_tok.type == "PUNCTUATION" and close_tok.value == ")"
+                ):
+                    return 4
+        return 0
+
+    def parse_memo_function(self):
+        memo_tok = self.advance()
+        size = DEFAULT_MEMO_SIZE
+        if self._is_token("PUNCTUATION", "("):
+            self.advance()
+            size = int(self.expect("NUMBER").value)
+            self.expect("PUNCTUATION", ")")
+            if size < 1:
+                raise SyntaxError(f"Line {memo_tok.line}, column {memo_tok.col}: memo cache size must be at least 1")
+        return self.parse_function(memo=size)
+
+    def _is_const_declaration(self) -> bool:
+        name_tok = self._peek_offset(1)
+        colon_tok = self._peek_offset(2)
+        return (
+            name_tok is not None
+            and name_tok.type == "IDENTIFIER"
+            and colon_tok is not None
+            and colon_tok.type == "PUNCTUATION"
+            and colon_tok.value == ":"
+        )
+
+    def parse_const_declaration(self):
+        const_tok = self.advance()
+        name = self._expect_name("constant name")
+        where = f"Line {const_tok.line}, column {const_tok.col}: " if const_tok.line is not None else ""
+        self.expect("PUNCTUATION", ":")
+        var_type = self._parse_type_name()
+        if var_type not in CONST_TYPES:
+            raise SyntaxError(f"{where}Constant '{name}' must have type int, float, str or bool, not {var_type}")
+        self.expect("OPERATOR", "=")
+        value = self.parse_expression()
+        self.expect("PUNCTUATION", ";")
+
+        if name in self.constants:
+            raise SyntaxError(f"{where}Constant '{name}' is already declared")
+        for node in walk_nodes(value):
+            node_type = node.get("type")
+            if node_type == "identifier" and node["name"] not in self.constants:
+                raise SyntaxError(
+                    f"{where}Constant '{name}' can only use literals and earlier constants, not '{node['name']}'"
+                )
+            if node_type not in ("const", "identifier", "binary", "unary"):
+                raise SyntaxError(f"{where}Constant '{name}' must be initialized with a constant expression")
+
+        node = {"type": "const_decl", "target": name, "var_type": var_type, "value": value, "line": const_tok.line}
+        self.constants[name] = node
+        return node
+
+    def _check_constants(self, statements, top_level=True):
+        """Reject `const` declarations inside blocks and any write to a constant."""
+        top_level_nodes = {id(stmt) for stmt in statements} if top_level else set()
+        for node in walk_nodes(statements):
+            node_type = node.get("type")
+            line = node.get("line")
+            where = f"Line {line}: " if line is not None else ""
+            if node_type == "const_decl":
+                if id(node) not in top_level_nodes:
+                    raise SyntaxError(f"{where}'const' declarations are only allowed at the top level")
+                continue
+            if node_type in ("assign", "index_assign") and node["target"] in self.constants:
+                raise SyntaxError(f"{where}Cannot assign to constant '{node['target']}'")
+            if node_type in ("for", "foreach") and node["var"] in self.constants:
+                raise SyntaxError(f"{where}Cannot use constant '{node['var']}' as a loop variable")
+            if node_type == "use_statement" and node["is_mutable"]:
+                for name in node["variables"]:
+                    if name in self.constants:
+                        raise SyntaxError(f"Cannot import constant '{name}' with 'use mut'")
+            if node_type == "func_def":
+                for name in node.get("params", []):
+                    if name in self.constants:
+                        raise SyntaxError(f"Parameter '{name}' of function '{node['name']}' shadows a constant")
+
+    def parse_function(self, memo=None):
         # print("Starting to parse function")
         self.expect("KEYWORD", "fn")
         # print("Parsed 'fn' keyword")
@@ -302,27 +498,113 @@ class Parser:
             body = self.parse_expression()
             self.expect("PUNCTUATION", ";")
             # print("Finished parsing inline function")
-            return {"type": "func_def", "name": name, "params": params, "param_types": param_types, "return_type": return_type, "body": body, "inline": True}
+            self._check_memo_purity(name, params, body, memo)
+            node = {"type": "func_def", "name": name, "params": params, "param_types": param_types, "return_type": return_type, "body": body, "inline": True}
+            if memo is not None:
+                node["memo"] = memo
+            return node
         else:
             # print("Parsing function block")
             self.expect("PUNCTUATION", "{")
             # print("Parsed opening brace")
-            body = []
-            while not self._at_end() and not self._is_token("PUNCTUATION", "}"):
-                stmt = self.parse_statement()
-                if stmt:
-                    body.append(stmt)
-                    # print(f"Added statement to function body: {stmt}")
-            self.expect("PUNCTUATION", "}")
-
-            if return_type is None and self._contains_return_statement(body):
-                raise SyntaxError(
-                    f"Return type annotation required for function '{name}' because it contains a return statement"
-                )
+            body = self._defer_function_body(name, return_type, params, memo) if self.lazy_functions else None
+            if body is None:
+                body = []
+                outer_placement = self.loop_depth, self.in_function
+                self.loop_depth, self.in_function = 0, True
+                while not self._at_end() and not self._is_token("PUNCTUATION", "}"):
+                    stmt = self.parse_statement()
+                    if stmt:
+                        body.append(stmt)
+                        # print(f"Added statement to function body: {stmt}")
+                self.loop_depth, self.in_function = outer_placement
+                self.expect("PUNCTUATION", "}")
+                self._finish_function_body(name, return_type, body, params, memo)
 
             # print("Parsed closing brace")
             # print("Finished parsing function block")
-            return {"type": "func_def", "name": name, "params": params, "param_types": param_types, "return_type": return_type, "body": body, "inline": False}
+            node = {"type": "func_def", "name": name, "params": params, "param_types": param_types, "return_type": return_type, "body": body, "inline": False}
+            if memo is not None:
+                node["memo"] = memo
+            return node
+
+    def _defer_function_body(self, name, return_type, params=None, memo=None):
+        """Skip to the brace closing the current block and capture its tokens.
+
+        Returns None when the braces are unbalanced so that eager parsing can
+        report the error at the right place.
+        """
+        depth = 1
+        offset = 0
+        while True:
+            tok = self._peek_offset(offset)
+            if tok is None:
+                return None
+            if tok.type == "SET_START":
+                # '#{' opens a set literal closed by a plain '}'
+                depth += 1
+            elif tok.type == "PUNCTUATION":
+                if tok.value == "{":
+                    depth += 1
+                elif tok.value == "}":
+                    depth -= 1
+                    if depth == 0:
+                        body = LazyFunctionBody(
+                            self, name, return_type, self.tokens[self.pos:self.pos + offset], params, memo
+                        )
+                        self.pos += offset + 1
+                        return body
+            offset += 1
+
+    def _finish_function_body(self, name, return_type, body, params=None, memo=None):
+        if return_type is None and self._contains_return_statement(body):
+            raise SyntaxError(
+                f"Return type annotation required for function '{name}' because it contains a return statement"
+            )
+        self._check_memo_purity(name, params or [], body, memo)
+        if not self._defines_function(body, name):
+            self._mark_tail_calls(body, name)
+
+    def _check_memo_purity(self, name, params, body, memo):
+        if memo is None:
+            return
+        reason = memo_purity_error(params, body)
+        if reason is not None:
+            raise SyntaxError(f"Function '{name}' cannot be memoized because {reason}")
+
+    def _defines_function(self, statements, name):
+        for stmt in statements:
+            if not isinstance(stmt, dict):
+                continue
+            if stmt.get("type") == "func_def" and stmt.get("name") == name:
+                return True
+            for key in ("body", "else_body"):
+                branch = stmt.get(key)
+                if isinstance(branch, list) and self._defines_function(branch, name):
+                    return True
+        return False
+
+    def _mark_tail_calls(self, statements, name):
+        """Flag `return name(...)` statements so the call can reuse the current frame."""
+        for stmt in statements:
+            if not isinstance(stmt, dict):
+                continue
+
+            stmt_type = stmt.get("type")
+            if stmt_type == "return":
+                value = stmt.get("value")
+                if isinstance(value, dict) and value.get("type") == "function_call" and value.get("name") == name:
+                    stmt["tail_call"] = True
+                continue
+
+            # A nested function's returns belong to that function
+            if stmt_type == "func_def":
+                continue
+
+            for key in ("body", "else_body"):
+                branch = stmt.get(key)
+                if isinstance(branch, list):
+                    self._mark_tail_calls(branch, name)
 
     def _contains_return_statement(self, statements):
         for stmt in statements:
@@ -424,7 +706,8 @@ class Parser:
             self.advance()  # consume the equals sign
             value = self.parse_expression()
             self.expect("PUNCTUATION", ";")
-            return {"type": "assign", "target": target, "var_type": var_type, "value": value}
+            line = target_token.line if target_token is not None else None
+            return {"type": "assign", "target": target, "var_type": var_type, "value": value, "line": line}
         else:
             # This is just an identifier expression
             self.expect("PUNCTUATION", ";")
@@ -459,17 +742,33 @@ class Parser:
 
     def parse_comparison(self):
         expr = self.parse_term()
-        while (
-            self._is_token("OPERATOR", "<")
-            or self._is_token("OPERATOR", ">")
-            or self._is_token("OPERATOR", "<=")
-            or self._is_token("OPERATOR", ">=")
-        ):
-            operator = self.advance().value
+        while True:
+            if (
+                self._is_token("OPERATOR", "<")
+                or self._is_token("OPERATOR", ">")
+                or self._is_token("OPERATOR", "<=")
+                or self._is_token("OPERATOR", ">=")
+                or self._is_token("KEYWORD", "in")
+            ):
+                operator = self.advance().value
+            elif self._is_membership_negation():
+                self.advance()  # consume '!'
+                self.advance()  # consume 'in'
+                operator = "!in"
+            else:
+                break
             right = self.parse_term()
             expr = {"type": "binary", "operator": operator, "left": expr, "right": right}
         return expr
 
+    def _is_membership_negation(self):
+        """True at the `!in` of `item !in items`."""
+        next_tok = self._peek_offset(1)
+        return (
+            self._is_token("OPERATOR", "!")
+            and next_tok is not None and next_tok.type == "KEYWORD" and next_tok.value == "in"
+        )
+
     def parse_term(self):
         expr = self.parse_factor()
         while self._is_token("OPERATOR", "+") or self._is_token("OPERATOR", "-"):
@@ -490,10 +789,14 @@ class Parser:
         if self._is_token("OPERATOR", "!"):
             self.advance()
             operand = self.parse_unary()
+            if _is_const(operand):
+                return _const(not bool(operand["value"]))
             return {"type": "unary", "operator": "!", "operand": operand}
         if self._is_token("OPERATOR", "-"):
             self.advance()
             operand = self.parse_unary()
+            if _is_const(operand) and type(operand["value"]) in (int, float):
+                return _const(-operand["value"])
             return {"type": "unary", "operator": "-", "operand": operand}
         return self.parse_postfix()
 
@@ -530,52 +833,72 @@ class Parser:
         if not token:
             raise SyntaxError("Unexpected end of input")
         
-        if token.type == "METHOD" or token.type == "IDENTIFIER" or self._is_callable_type_keyword(token):
+        if (
+            token.type in ("METHOD", "IDENTIFIER")
+            or self._is_callable_type_keyword(token)
+            or self._is_constructor_call(token)
+        ):
             name_token = self.advance()
             name = name_token.value
             # Check if this is a function call
             if self._is_token("PUNCTUATION", "("):
                 self.advance()  # consume the opening parenthesis
                 args = self._parse_arg_list(f"'{name}()' call")
-                if name_token.type == "METHOD" or self._is_callable_type_keyword(name_token):
+                if name_token.type in ("METHOD", "DATATYPE") or self._is_callable_type_keyword(name_token):
                     expr = {"type": "method_call", "method": name, "args": args}
                 else:
                     expr = {"type": "function_call", "name": name, "args": args}
             else:
                 expr = {"type": "identifier", "name": name}
         
+        # Literals are decoded into their final Python values here, once, so the
+        # interpreter only has to load a constant when it evaluates them.
         elif token.type == "NUMBER":
-            value = int(self.advance().value)
-            expr = {"type": "int", "value": value}
+            expr = _const(int(self.advance().value))
         
         elif token.type == "FLOAT":
-            value = float(self.advance().value)
-            expr = {"type": "float", "value": value}
+            expr = _const(float(self.advance().value))
         
         elif token.type == "BOOLEAN":
-            value = self.advance().value == "true"
-            expr = {"type": "boolean", "value": value}
+            expr = _const(self.advance().value == "true")
 
         elif token.type == "NULL":
             self.advance()
-            expr = {"type": "null", "value": None}
+            expr = _const(None)
         
         elif token.type == "STRING":
-            value = self.advance().value
+            raw = self.advance().value
             # Check if this is part of a string interpolation
             if self._is_token("INTERPOLATION_START"):
-                parts = [{"type": "string", "value": value}]
+                # Interpolation fragments come without their quotes
+                parts = [_const(_decode_escapes(raw))]
                 while self._is_token("INTERPOLATION_START"):
                     self.advance()  # consume the interpolation start
                     expr_part = self.parse_expression()
                     self.expect("INTERPOLATION_END")
                     parts.append(expr_part)
                     if self._is_token("STRING"):
-                        parts.append({"type": "string", "value": self.advance().value})
+                        parts.append(_const(_decode_escapes(self.advance().value)))
                 expr = {"type": "string_interpolation", "parts": parts}
             else:
-                expr = {"type": "string", "value": value}
+                expr = _const(_decode_string_literal(raw))
         
+        elif token.type == "SET_START":
+            self.advance()  # consume the opening '#{'
+            elements = []
+            while not self._at_end() and not self._is_token("PUNCTUATION", "}"):
+                if self._is_token("PUNCTUATION", ";"):
+                    t = self.peek()
+                    raise SyntaxError(
+                        f"Line {t.line}, column {t.col}: "
+                        "Found ';' inside a set \u2014 you may be missing a closing '}'."
+                    )
+                elements.append(self.parse_expression())
+                if self._is_token("PUNCTUATION", ","):
+                    self.advance()
+            self.expect("PUNCTUATION", "}")
+            expr = {"type": "set", "elements": elements}
+
         elif token.type == "PUNCTUATION":
             if token.value == "(":
                 self.advance()  # consume the opening parenthesis
@@ -595,7 +918,10 @@ class Parser:
                     if self._is_token("PUNCTUATION", ","):
                         self.advance()
                 self.expect("PUNCTUATION", "]")
-                expr = {"type": "list", "elements": elements}
+                if all(_is_const(element) for element in elements):
+                    expr = {"type": "const_list", "value": [element["value"] for element in elements]}
+                else:
+                    expr = {"type": "list", "elements": elements}
             elif token.value == "{":
                 self.advance()  # consume the opening brace
                 pairs = []
@@ -608,9 +934,7 @@ class Parser:
                             f"Line {key_tok.line}, column {key_tok.col}: "
                             "Found ';' inside a hash \u2014 you may be missing a closing '}'.")
                     if key_tok.type == "STRING":
-                        key = self.advance().value
-                        if (key.startswith('"') and key.endswith('"')) or (key.startswith("'") and key.endswith("'")):
-                            key = key[1:-1]
+                        key = _decode_string_literal(self.advance().value)
                     elif key_tok.type == "IDENTIFIER":
                         key = self.advance().value
                     else:
@@ -623,7 +947,10 @@ class Parser:
                     if self._is_token("PUNCTUATION", ","):
                         self.advance()
                 self.expect("PUNCTUATION", "}")
-                expr = {"type": "hash", "pairs": pairs}
+                if all(_is_const(pair["value"]) for pair in pairs):
+                    expr = {"type": "const_hash", "value": {pair["key"]: pair["value"]["value"] for pair in pairs}}
+                else:
+                    expr = {"type": "hash", "pairs": pairs}
             elif token.value == ";":
                 raise SyntaxError(self._unexpected_token_msg(token))
             else:
@@ -634,7 +961,7 @@ class Parser:
         return expr
 
     def parse_for_loop(self):
-        self.expect("KEYWORD", "for")
+        line = self.expect("KEYWORD", "for").line
         var = self._expect_name("loop variable")
         self.expect("PUNCTUATION", ":")
         var_type = self._parse_type_name()
@@ -699,14 +1026,16 @@ class Parser:
         
         self.expect("PUNCTUATION", "{")
         body = []
+        self.loop_depth += 1
         while not self._at_end() and not self._is_token("PUNCTUATION", "}"):
             body.append(self.parse_statement())
+        self.loop_depth -= 1
         self.expect("PUNCTUATION", "}")
-        return {"type": "for", "var": var, "var_type": var_type, "start": start, "end": end, "by": by, "inclusive": is_inclusive, "body": body}
+        return {"type": "for", "var": var, "var_type": var_type, "start": start, "end": end, "by": by, "inclusive": is_inclusive, "body": body, "line": line}
 
     def parse_foreach(self):
         # print("Starting to parse foreach loop")
-        self.expect("KEYWORD", "foreach")
+        line = self.expect("KEYWORD", "foreach").line
         var = self._expect_name("loop variable")
         self.expect("PUNCTUATION", ":")
         var_type = self._parse_type_name()
@@ -716,14 +1045,16 @@ class Parser:
         # print(f"Iterable expression: {iterable}")
         self.expect("PUNCTUATION", "{")
         body = []
+        self.loop_depth += 1
         while not self._at_end() and not self._is_token("PUNCTUATION", "}"):
             stmt = self.parse_statement()
             if stmt:
                 body.append(stmt)
                 # print(f"Added statement to foreach body: {stmt}")
+        self.loop_depth -= 1
         self.expect("PUNCTUATION", "}")
         # print("Finished parsing foreach loop")
-        return {"type": "foreach", "var": var, "var_type": var_type, "iterable": iterable, "body": body}
+        return {"type": "foreach", "var": var, "var_type": var_type, "iterable": iterable, "body": body, "line": line}
 
     def parse_method_call(self):
         method = self.advance().value
@@ -749,7 +1080,7 @@ class Parser:
 
         self.expect("PUNCTUATION", ";")
 
-        if alias_name in ("int", "float", "str", "bool", "dynamic", "list", "hash", "void"):
+        if alias_name in ("int", "float", "str", "bool", "dynamic", "list", "hash", "set", "deque", "heap", "void"):
             raise SyntaxError(f"Cannot redefine built-in type '{alias_name}'")
 
         if alias_name in self.type_aliases:
@@ -760,7 +1091,7 @@ class Parser:
 
     def parse_if_statement(self):
         # print("Starting to parse if statement")
-        self.expect("KEYWORD", "if")
+        line = self.expect("KEYWORD", "if").line
         condition = self.parse_expression()
         # print(f"If condition: {condition}")
         self.expect("PUNCTUATION", "{")
@@ -774,7 +1105,7 @@ class Parser:
         # print("Finished parsing if body")
         
         # Check for else if or else
-        result = {"type": "if", "condition": condition, "body": body}
+        result = {"type": "if", "condition": condition, "body": body, "line": line}
         
         # Handle else if and else
         if self._is_token("KEYWORD", "else"):
@@ -802,38 +1133,47 @@ class Parser:
         return result
 
     def parse_return(self):
-        self.expect("KEYWORD", "return")
+        tok = self.expect("KEYWORD", "return")
+        if not self.in_function:
+            raise SyntaxError(f"'return' statement outside function{self._line_info(tok)}")
         value = None
         if not self._is_token("PUNCTUATION", ";"):
             value = self.parse_expression()
         self.expect("PUNCTUATION", ";")
-        return {"type": "return", "value": value}
+        return {"type": "return", "value": value, "line": tok.line, "placement_checked": True}
 
     def parse_break(self):
-        self.expect("KEYWORD", "break")
-        self.expect("PUNCTUATION", ";")
-        return {"type": "break"}
+        return self._parse_loop_jump("break")
 
     def parse_continue(self):
-        self.expect("KEYWORD", "continue")
+        return self._parse_loop_jump("continue")
+
+    def _parse_loop_jump(self, keyword):
+        tok = self.expect("KEYWORD", keyword)
+        # A function body starts a fresh loop depth, so this also rejects a
+        # `break` inside a function that is defined inside a loop.
+        if not self.loop_depth:
+            raise SyntaxError(f"'{keyword}' statement outside loop{self._line_info(tok)}")
         self.expect("PUNCTUATION", ";")
-        return {"type": "continue"}
+        return {"type": keyword, "line": tok.line, "placement_checked": True}
 
     def parse_while_loop(self):
         # print("Starting to parse while loop")
-        self.expect("KEYWORD", "while")
+        line = self.expect("KEYWORD", "while").line
         condition = self.parse_expression()
         # print(f"While loop condition: {condition}")
         self.expect("PUNCTUATION", "{")
         body = []
+        self.loop_depth += 1
         while not self._at_end() and not self._is_token("PUNCTUATION", "}"):
             stmt = self.parse_statement()
             if stmt:
                 body.append(stmt)
                 # print(f"Added statement to while body: {stmt}")
+        self.loop_depth -= 1
         self.expect("PUNCTUATION", "}")
         # print("Finished parsing while loop")
-        return {"type": "while", "condition": condition, "body": body}
+        return {"type": "while", "condition": condition, "body": body, "line": line}
 
     def parse_use_statement(self):
         self.expect("KEYWORD", "use")
@@ -878,4 +1218,52 @@ class Parser:
             variables.append(var)
             
         self.expect("PUNCTUATION", ";")
-        return {"type": "watch_statement", "variables": variables}
\ No newline at end of file
+        return {"type": "watch_statement", "variables": variables}
+
+
+class StreamingParser(Parser):
+    """Parse top-level statements one at a time from a token iterator.
+
+    Tokens are pulled from the lexer only as far as the parser needs to look
+    ahead, and the tokens of each finished statement are released, so memory
+    stays bounded by the largest single top-level statement.
+    """
+
+    def __init__(self, tokens: Iterable[Any], lazy_functions: bool = False):
+        super().__init__([], lazy_functions=lazy_functions)
+        self._source = iter(tokens)
+        self._exhausted = False
+
+    def _fill(self, index: int) -> bool:
+        while index >= len(self.tokens):
+            if self._exhausted:
+                return False
+            token_str = next(self._source, None)
+            if token_str is None:
+                self._exhausted = True
+                return False
+            self.tokens.append(_coerce_token(token_str))
+        return True
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self._fill(self.pos) else None
+
+    def current(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self._fill(self.pos) else None
+
+    def _peek_offset(self, offset: int) -> Optional[Token]:
+        index = self.pos + offset
+        if index >= 0 and self._fill(index):
+            return self.tokens[index]
+        return None
+
+    def iter_statements(self) -> Iterator[dict]:
+        """Yield each top-level statement as soon as it has been parsed."""
+        while self.peek():
+            stmt = self.parse_statement()
+            # Drop the tokens of the statement we just finished
+            del self.tokens[:self.pos]
+            self.pos = 0
+            if stmt:
+                self._check_constants([stmt])
+                yield stmt
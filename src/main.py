@@ -1,18 +1,30 @@
+from contextlib import contextmanager
 from pathlib import Path
 import argparse
 import re
 import sys
+import time
+
+_FRONTEND_IMPORT_STARTED = time.perf_counter()
 
 from echo_lexer import Lexer
-from echo_parser import Parser
-from echo_interpreter import Interpreter, set_rich_warnings_enabled
+from echo_parser import Parser, StreamingParser
+from echo_optimizer import Optimizer
+from echo_interpreter import (
+    RICH_NOT_LOADED,
+    Interpreter,
+    load_rich,
+    print_warning_summary,
+    reset_warnings,
+    rich_import_seconds,
+    set_rich_warnings_enabled,
+)
+
+_FRONTEND_IMPORT_SECONDS = time.perf_counter() - _FRONTEND_IMPORT_STARTED
 
-try:
-    from rich.console import Console
-    from rich.panel import Panel
-except ImportError:
-    Console = None
-    Panel = None
+# Rich is only imported once an error or hint is rendered with it
+Console = RICH_NOT_LOADED
+Panel = RICH_NOT_LOADED
 
 
 def _resolve_source_path(source_path: str) -> Path:
@@ -20,7 +32,48 @@ def _resolve_source_path(source_path: str) -> Path:
 
 
 def _use_rich(plain: bool) -> bool:
-    return (not plain) and Console is not None and Panel is not None
+    global Console, Panel
+    if plain:
+        return False
+    if Console is RICH_NOT_LOADED:
+        Console, Panel = load_rich()
+    return Console is not None and Panel is not None
+
+
+class _StartupProfile:
+    """Wall-clock timings for the phases of a run, for --startup-profile."""
+
+    def __init__(self):
+        self.phases = [("import front-end modules", _FRONTEND_IMPORT_SECONDS)]
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self) -> str:
+        phases = list(self.phases)
+        rich_seconds = rich_import_seconds()
+        if rich_seconds is not None:
+            phases.insert(1, ("import rich", rich_seconds))
+        width = max(len(name) for name, _ in phases)
+        lines = ["Startup profile:"]
+        for name, seconds in phases:
+            lines.append(f"  {name:<{width}}  {seconds * 1000:8.2f} ms")
+        if rich_seconds is None:
+            lines.append("  (rich was not imported)")
+        return "\n".join(lines)
+
+
+def _optimization_report(optimizer: Optimizer) -> str:
+    lines = ["Optimization report:"]
+    lines.extend(f"  {entry}" for entry in optimizer.report)
+    if not optimizer.report:
+        lines.append("  nothing was optimized")
+    return "\n".join(lines)
 
 
 def _print_error(title: str, message: str, plain: bool) -> None:
@@ -116,22 +169,58 @@ def _friendly_syntax_message(message: str) -> str:
     return f"Line {line}, column {col}: I expected {expected_text} before '{got_value}'."
 
 
-def run_file(source_path: str, plain: bool = False) -> int:
+def run_file(
+    source_path: str,
+    plain: bool = False,
+    lazy_functions: bool = False,
+    stream: bool = False,
+    startup_profile: bool = False,
+    profile: bool = False,
+    explicit_stack: bool = False,
+    max_depth: int | None = None,
+    optimize: bool = False,
+    inline: bool = True,
+    opt_report: bool = False,
+    verified: bool = False,
+) -> int:
     file_path = _resolve_source_path(source_path)
     if not file_path.exists() or not file_path.is_file():
         _print_error("Error", f"source file not found: {file_path}", plain)
         return 1
 
-    lex_obj = Lexer()
+    timings = _StartupProfile()
+    interpreter = None
+    with timings.phase("lexer setup"):
+        lex_obj = Lexer()
     parser_obj = None
+    reset_warnings()
 
     try:
-        tokens = lex_obj.read_source(str(file_path))
-        parser_obj = Parser(tokens)
-        ast = parser_obj.parse()
+        if stream:
+            # Parse and run one top-level statement at a time
+            parser_obj = StreamingParser(lex_obj.iter_source(str(file_path)), lazy_functions=lazy_functions)
+            set_rich_warnings_enabled(not plain)
+            with timings.phase("interpreter setup"):
+                interpreter = Interpreter(explicit_stack=explicit_stack, max_call_depth=max_depth, verified=verified)
+            with timings.phase("lex, parse and run (streamed)"):
+                interpreter.execute_stream(parser_obj.iter_statements())
+            return 0
+        with timings.phase("lex"):
+            tokens = lex_obj.read_source(str(file_path))
+        with timings.phase("parse"):
+            parser_obj = Parser(tokens, lazy_functions=lazy_functions)
+            ast = parser_obj.parse()
+        if optimize:
+            optimizer = Optimizer(inline=inline)
+            with timings.phase("optimize"):
+                optimizer.optimize(ast)
+            if opt_report:
+                print(_optimization_report(optimizer), file=sys.stderr)
         set_rich_warnings_enabled(not plain)
-        interpreter = Interpreter()
-        interpreter.execute(ast)
+        with timings.phase("interpreter setup"):
+            interpreter = Interpreter(explicit_stack=explicit_stack, max_call_depth=max_depth, verified=verified)
+        with timings.phase("run"):
+            interpreter.execute(ast)
         return 0
     except SyntaxError as exc:
         message = str(exc)
@@ -168,6 +257,12 @@ def run_file(source_path: str, plain: bool = False) -> int:
         if hint:
             _print_hint(hint, plain)
         return 1
+    finally:
+        print_warning_summary()
+        if startup_profile:
+            print(timings.report(), file=sys.stderr)
+        if profile and interpreter is not None:
+            print(interpreter.profile_report(), file=sys.stderr)
 
 
 def main(argv: list[str] | None = None) -> int:
@@ -178,8 +273,74 @@ def main(argv: list[str] | None = None) -> int:
         action="store_true",
         help="Disable Rich styling and use plain text output",
     )
+    parser.add_argument(
+        "--lazy-functions",
+        action="store_true",
+        help="Parse function bodies on first call instead of at startup",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse and execute one top-level statement at a time",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Report import and initialization time on stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report runtime counters such as memo cache hits on stderr",
+    )
+    parser.add_argument(
+        "--explicit-stack",
+        action="store_true",
+        help="Run Echo calls on a heap-allocated stack instead of Python recursion",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        metavar="N",
+        help="Maximum Echo call depth with --explicit-stack (default: 10000)",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="Optimize the program before running it (not applied with --stream)",
+    )
+    parser.add_argument(
+        "--no-inline",
+        action="store_true",
+        help="With -O, do not inline calls to small functions",
+    )
+    parser.add_argument(
+        "--opt-report",
+        action="store_true",
+        help="With -O, list the optimizations that were applied on stderr",
+    )
+    parser.add_argument(
+        "--verified",
+        action="store_true",
+        help="Skip runtime type checks the static type checker proves always pass (not applied with --stream)",
+    )
     args = parser.parse_args(argv)
-    return run_file(args.source, plain=args.plain)
+
+    return run_file(
+        args.source,
+        plain=args.plain,
+        lazy_functions=args.lazy_functions,
+        stream=args.stream,
+        startup_profile=args.startup_profile,
+        profile=args.profile,
+        explicit_stack=args.explicit_stack,
+        max_depth=args.max_depth,
+        optimize=args.optimize,
+        inline=not args.no_inline,
+        opt_report=args.opt_report,
+        verified=args.verified,
+    )
 
 
 if __name__ == "__main__":
@@ -15,19 +15,19 @@ if str(SRC_DIR) not in sys.path:
 from main import run_file  # noqa: E402
 
 
-def run_echo_source(tmp_path: Path, source: str, plain: bool = True) -> tuple[int, str]:
+def run_echo_source(tmp_path: Path, source: str, plain: bool = True, **options) -> tuple[int, str]:
     source_file = tmp_path / "program.echo"
     source_file.write_text(source, encoding="utf-8")
 
     stdout = io.StringIO()
     with redirect_stdout(stdout):
-        exit_code = run_file(str(source_file), plain=plain)
+        exit_code = run_file(str(source_file), plain=plain, **options)
     return exit_code, stdout.getvalue()
 
 
-def run_example(example_name: str, plain: bool = True) -> tuple[int, str]:
+def run_example(example_name: str, plain: bool = True, **options) -> tuple[int, str]:
     example_path = REPO_ROOT / "examples" / example_name
     stdout = io.StringIO()
     with redirect_stdout(stdout):
-        exit_code = run_file(str(example_path), plain=plain)
+        exit_code = run_file(str(example_path), plain=plain, **options)
     return exit_code, stdout.getvalue()
\ No newline at end of file
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import pytest
+
+from echo_analyzer import annotate_closures, check_scopes, check_types
+from echo_lexer import Lexer
+from echo_parser import Parser
+
+
+def parse_source(tmp_path, source: str):
+    source_file = tmp_path / "program.echo"
+    source_file.write_text(source, encoding="utf-8")
+    return Parser(Lexer().read_source(str(source_file))).parse()
+
+
+def test_scope_checker_verifies_well_formed_imports(tmp_path):
+    ast = parse_source(tmp_path, """
+total: int = 0;
+limit: int = 3;
+
+fn add(n: int) {
+    use mut total;
+    use limit;
+    if n < limit {
+        total = total + n;
+    }
+    fn helper() -> int => n + 1;
+    say(helper());
+}
+""")
+
+    assert check_scopes(ast) is True
+
+
+def test_scope_checker_rejects_undeclared_global_access_and_immutable_writes(tmp_path):
+    ast = parse_source(tmp_path, """
+count: int = 0;
+fn bump() {
+    count = count + 1;
+}
+""")
+    with pytest.raises(NameError, match="Variable 'count' used without 'use' statement in function"):
+        check_scopes(ast)
+
+    ast = parse_source(tmp_path, """
+items: list = [];
+fn fill() {
+    use items;
+    items.push(1);
+}
+""")
+    with pytest.raises(NameError, match="Cannot modify immutable import 'items'"):
+        check_scopes(ast)
+
+    ast = parse_source(tmp_path, """
+fn twice() {
+    use mut missing;
+    use mut missing;
+}
+""")
+    with pytest.raises(SyntaxError, match="Variable 'missing' already imported"):
+        check_scopes(ast)
+
+
+def test_scope_checker_leaves_unresolvable_names_to_runtime(tmp_path):
+    ast = parse_source(tmp_path, """
+fn show() {
+    say(unknown);
+}
+""")
+
+    assert check_scopes(ast) is False
+
+
+def test_closure_annotation_records_only_safe_captures(tmp_path):
+    ast = parse_source(tmp_path, """
+fn outer(limit: int) {
+    big: list = [1, 2, 3];
+    count: int = 0;
+    fn within(n: int) -> bool => n < limit;
+    fn tally() {
+        count = count + 1;
+    }
+    fn peek() -> int => count;
+    count = count + 1;
+    label: str = "a";
+    fn show() -> str => label;
+    label: str = "b";
+    say(within(2));
+}
+""")
+
+    annotate_closures(ast)
+    within, tally, peek, show = [stmt for stmt in ast[0]["body"] if stmt.get("type") == "func_def"]
+
+    assert within["captures"] == {"variables": ["limit"], "functions": []}
+    assert "captures" not in tally  # rebinds an outer variable
+    assert "captures" not in peek  # reads a variable the enclosing function rebinds
+    assert "captures" not in show  # reads a variable the enclosing function redeclares
+    assert "captures" not in ast[0]
+
+
+def test_type_checker_marks_only_checks_that_cannot_fail(tmp_path):
+    ast = parse_source(tmp_path, """
+fn double(n: int) -> int {
+    return n * 2;
+}
+fn half(n: int) -> int {
+    return n / 2;
+}
+fn label(n: int) -> str {
+    if n > 0 {
+        return "positive";
+    }
+}
+total: int = double(3);
+ratio: float = 1.5;
+ratio = total;
+guess: int = half(ask("n? ").asInt());
+word: str = "abc";
+foreach ch: str in word {
+    say(ch);
+}
+foreach n: int in [1, 2, 3] {
+    say(label(n));
+}
+""")
+
+    assert check_types(ast) > 0
+    double, half, label, total, ratio, rebind, guess, word, chars, numbers = ast
+
+    assert double["args_checked"] and double["return_checked"]
+    assert half["args_checked"] and "return_checked" not in half  # `/` may produce a float
+    assert "return_checked" not in label  # can fall off the end and return null
+    assert total["type_checked"] and ratio["type_checked"] and word["type_checked"]
+    assert "type_checked" not in rebind  # an int does not pass a float check
+    assert guess["type_checked"]
+    assert chars["item_checked"] and numbers["item_checked"]
+
+
+def test_type_checker_keeps_argument_checks_for_unproven_calls(tmp_path):
+    ast = parse_source(tmp_path, """
+fn show(n: int) {
+    say(n);
+}
+fn compare(a: int, b: int) -> int => a - b;
+fn priority(n: int) -> int => n;
+items: list = [3, 1, 2];
+value: dynamic = "x";
+show(value);
+items.order(compare);
+queue: heap = heap(items, by: priority);
+""")
+
+    check_types(ast)
+    show, compare, priority = ast[0], ast[1], ast[2]
+
+    assert "args_checked" not in show
+    assert "args_checked" not in compare  # order() calls it with runtime values
+    assert "args_checked" not in priority  # so does heap()
+    assert compare["return_checked"]
+
+
+def test_type_checker_treats_hash_shaped_aliases_as_unknown(tmp_path):
+    ast = parse_source(tmp_path, """
+type Point = { x: int, y: int };
+fn shift(p: Point) -> Point {
+    return p;
+}
+origin: Point = {"x": 0, "y": 0};
+moved: Point = shift(origin);
+copy: Point = moved;
+foreach q: Point in [origin] {
+    say(q);
+}
+""")
+
+    check_types(ast)
+    shift, origin, moved, copy, points = ast
+
+    assert "return_checked" not in shift
+    assert "type_checked" not in moved and "type_checked" not in copy
+    assert "item_checked" not in points
@@ -14,4 +14,20 @@ EXAMPLE_NAMES = sorted(path.name for path in (REPO_ROOT / "examples").glob("*.ec
 def test_example_program_executes_successfully(example_name):
     exit_code, output = run_example(example_name)
 
-    assert exit_code == 0, f"{example_name} failed with output:\n{output}"
\ No newline at end of file
+    assert exit_code == 0, f"{example_name} failed with output:\n{output}"
+
+@pytest.mark.parametrize("example_name", EXAMPLE_NAMES)
+def test_example_output_matches_with_explicit_stack(example_name):
+    _, expected = run_example(example_name)
+    exit_code, output = run_example(example_name, explicit_stack=True)
+
+    assert exit_code == 0, f"{example_name} failed with output:\n{output}"
+    assert output == expected
+
+
+@pytest.mark.parametrize("options", [{}, {"verified": True}, {"optimize": True}])
+def test_simple_example_with_hash_shaped_type_alias_runs(options):
+    exit_code, output = run_example("../simple_example.echo", **options)
+
+    assert exit_code == 0, output
+    assert output.splitlines()[-1] == "Hello, alice!"
@@ -5,7 +5,18 @@ from contextlib import redirect_stdout
 
 import pytest
 
-from echo_interpreter import Context, Interpreter
+from echo_interpreter import (
+    BINARY_OPS,
+    FLOAT_BINARY_OPS,
+    INT_BINARY_OPS,
+    MEMBERSHIP_OPS,
+    NUMERIC_UNARY_OPS,
+    UNARY_OPS,
+    Context,
+    EchoSet,
+    Interpreter,
+    specialize_operators,
+)
 
 
 def ident(name: str) -> dict:
@@ -335,6 +346,64 @@ def test_list_hash_count_merge_binary_and_unary_helpers():
         interpreter._unary_op("~", 1)
 
 
+def test_specialized_operators_match_the_generic_ones():
+    def binary(op):
+        return {"type": "binary", "operator": op, "left": int_node(1), "right": int_node(2)}
+
+    int_mod, float_div, text_add, both = binary("%"), binary("/"), binary("+"), binary("&&")
+    negate, text_negate = {"type": "unary", "operator": "-"}, {"type": "unary", "operator": "-"}
+    specialize_operators([
+        (int_mod, ("int", "bool")),
+        (float_div, ("int", "float")),
+        (text_add, ("str", None)),
+        (both, ("bool", "bool")),
+        (negate, ("float",)),
+        (text_negate, (None,)),
+    ])
+
+    assert int_mod["apply"] is INT_BINARY_OPS["%"]
+    assert float_div["apply"] is FLOAT_BINARY_OPS["/"]
+    assert text_add["apply"] is BINARY_OPS["+"]
+    assert "apply" not in both  # `&&` and `||` short-circuit in evaluate()
+    assert negate["apply"] is NUMERIC_UNARY_OPS["-"]
+    assert text_negate["apply"] is UNARY_OPS["-"]
+
+    for left in (-7, -6, 7, True, 0):
+        for right in (-3, 2, 5, True):
+            for op in ("/", "%"):
+                expected = BINARY_OPS[op](left, right)
+                assert INT_BINARY_OPS[op](left, right) == expected
+                assert type(INT_BINARY_OPS[op](left, right)) is type(expected)
+    assert INT_BINARY_OPS["/"](True, 2) == 0.5  # an int variable may hold a bool
+    assert FLOAT_BINARY_OPS["%"](-7.5, 2) == -7.5 % 2
+    with pytest.raises(ZeroDivisionError, match="integer modulo by zero"):
+        INT_BINARY_OPS["%"](1, 0)
+
+
+def test_membership_fast_paths_only_bind_to_scalars_in_known_containers():
+    def membership(op):
+        return {"type": "binary", "operator": op, "left": ident("item"), "right": ident("items")}
+
+    key_in_hash, list_in_set, untyped = membership("in"), membership("!in"), membership("in")
+    specialize_operators([
+        (key_in_hash, ("str", "hash")),
+        (list_in_set, ("list", "set")),
+        (untyped, ("int", None)),
+    ])
+
+    assert key_in_hash["apply"] is MEMBERSHIP_OPS["in"]
+    assert list_in_set["apply"] is BINARY_OPS["!in"]
+    assert untyped["apply"] is BINARY_OPS["in"]
+
+    assert BINARY_OPS["in"]("a", {"a": 1}) and BINARY_OPS["!in"]("b", {"a": 1})
+    assert BINARY_OPS["in"]("ell", "hello") and not BINARY_OPS["in"]([1], EchoSet([1]))
+    assert MEMBERSHIP_OPS["in"](1, EchoSet([1])) and MEMBERSHIP_OPS["!in"](True, EchoSet([1, 1.0]))
+    with pytest.raises(TypeError, match="Cannot look for int in a string"):
+        BINARY_OPS["in"](1, "abc")
+    with pytest.raises(TypeError, match="Membership test needs a list, hash, set, deque, heap or string, got int"):
+        BINARY_OPS["in"](1, 2)
+
+
 def test_execute_node_control_flow_helpers_and_warnings():
     interpreter = Interpreter()
     root = interpreter.context
@@ -374,4 +443,27 @@ def test_execute_node_control_flow_helpers_and_warnings():
     stdout = io.StringIO()
     with redirect_stdout(stdout):
         interpreter.execute_node({"type": "assign", "target": "value", "var_type": "int", "value": int_node(2)}, shadow_context)
-    assert "Warning: Variable 'value' shadows a global variable" in stdout.getvalue()
\ No newline at end of file
+    assert "Warning: Variable 'value' shadows a global variable" in stdout.getvalue()
+
+def test_warnings_are_deduplicated_capped_and_summarized(monkeypatch):
+    import echo_interpreter
+
+    monkeypatch.setattr(echo_interpreter, "WARNING_LIMIT_PER_KIND", 2)
+    echo_interpreter.set_rich_warnings_enabled(False)
+    echo_interpreter.reset_warnings()
+
+    stdout = io.StringIO()
+    with redirect_stdout(stdout):
+        for _ in range(100):
+            echo_interpreter._print_warning("Variable 'x' shadows a global variable", "shadowed-variable", 4)
+        echo_interpreter._print_warning("Variable 'y' shadows a global variable", "shadowed-variable", 9)
+        echo_interpreter._print_warning("Variable 'z' shadows a global variable", "shadowed-variable", 12)
+        echo_interpreter.print_warning_summary()
+
+    lines = stdout.getvalue().splitlines()
+    assert lines == [
+        "Warning: Line 4: Variable 'x' shadows a global variable",
+        "Warning: Line 9: Variable 'y' shadows a global variable",
+        "Warning Summary: 100 repeated warning(s) suppressed (shadowed-variable: 100)",
+    ]
+    echo_interpreter.reset_warnings()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import pytest
+
 from conftest import run_echo_source
 
 
@@ -64,4 +66,824 @@ nums.push(3);
     exit_code, output = run_echo_source(tmp_path, source)
 
     assert exit_code == 0
-    assert "WATCH: nums modified by push() to [1, 2, 3] (in global)" in output
\ No newline at end of file
+    assert "WATCH: nums modified by push() to [1, 2, 3] (in global)" in output
+
+def test_constant_literals_in_loops_yield_fresh_decoded_values(tmp_path):
+    source = r"""
+rows: list = [];
+for i: int in 0...2 {
+    row: list = [1, 2];
+    row.push(i);
+    rows.push(row);
+}
+say(rows);
+say("tab:\tend", 'it\'s');
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["[[1, 2, 0], [1, 2, 1]]", "tab:\tend it's"]
+
+
+def test_scope_violations_are_reported_before_execution(tmp_path):
+    source = """
+say("started");
+limit: int = 1;
+
+fn never_called() {
+    use limit;
+    limit = 2;
+}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 1
+    assert "started" not in output
+    assert "Name Error: Cannot modify immutable import 'limit'" in output
+
+
+def test_use_mut_import_is_writable_from_nested_blocks(tmp_path):
+    source = """
+count: int = 0;
+
+fn bump() {
+    use mut count;
+    for i: int in 1..3 {
+        if i > 1 {
+            count = count + i;
+        }
+    }
+}
+
+bump();
+say(count);
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.strip() == "5"
+
+
+def test_shadowing_warning_is_reported_once_per_location(tmp_path):
+    source = """
+value: int = 1;
+
+fn helper(n: int) -> int {
+    value: int = n;
+    return value;
+}
+
+total: int = 0;
+for i: int in 0...50 {
+    total = total + helper(i);
+}
+say(total);
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["Warning: Line 5: Variable 'value' shadows a global variable", "1225"]
+
+
+def test_parameter_shadowing_a_global_is_reported_once(tmp_path):
+    source = """
+user: str = "alice";
+
+fn greet(user: str) {
+    say("Hello, ${user}!");
+}
+
+greet(user);
+greet("bob");
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["Warning: Variable 'user' shadows a global variable", "Hello, alice!", "Hello, bob!"]
+
+
+def test_lazy_function_bodies_are_parsed_only_when_called(tmp_path):
+    source = """
+fn unused() {
+    this is not valid echo;
+}
+
+fn used(n: int) -> int {
+    return n * 2;
+}
+
+say(used(21));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, lazy_functions=True)
+    assert exit_code == 0
+    assert output.strip() == "42"
+
+    exit_code, output = run_echo_source(tmp_path, source + "unused();\n", lazy_functions=True)
+    assert exit_code == 1
+    assert output.splitlines()[0] == "42"
+    assert "Syntax Error:" in output
+
+
+def test_stream_mode_runs_statements_before_later_ones_are_parsed(tmp_path):
+    source = """
+type Score = int;
+best: Score = 10;
+say(best);
+this is not valid echo;
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, stream=True)
+
+    assert exit_code == 1
+    assert output.splitlines()[0] == "10"
+    assert "Syntax Error:" in output
+
+
+@pytest.mark.parametrize(
+    "statement, message",
+    [
+        ("return;", "'return' statement outside function at line 4, column 5"),
+        ("break;", "'break' statement outside loop at line 4, column 5"),
+        ("continue;", "'continue' statement outside loop at line 4, column 5"),
+    ],
+)
+def test_misplaced_control_flow_is_rejected_before_running(tmp_path, statement, message):
+    source = f"""
+say("started");
+if false {{
+    {statement}
+}}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 1
+    assert "started" not in output
+    assert message in output
+
+
+def test_loop_jumps_do_not_reach_through_function_bodies(tmp_path):
+    source = """
+while true {
+    fn stop() {
+        break;
+    }
+    stop();
+}
+"""
+
+    for options in ({}, {"lazy_functions": True}):
+        exit_code, output = run_echo_source(tmp_path, source, **options)
+        assert exit_code == 1
+        assert "'break' statement outside loop at line 4, column 9" in output
+
+
+def test_counted_for_loops_cover_range_forms(tmp_path):
+    source = """
+seen: list = [];
+for i: int in 1..3 { seen.push(i); }
+for i: int in 1...3 { seen.push(i); }
+for i: int in 6..0 by -3 { seen.push(i); }
+for i: int in 6...0 by -3 { seen.push(i); }
+for i: int in 0..10 {
+    if i == 1 { continue; }
+    if i == 3 { break; }
+    seen.push(i * 10);
+}
+say(seen);
+for i: int in 0..3 by 0 { say(i); }
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 1
+    assert output.splitlines()[0] == "[1, 2, 3, 1, 2, 6, 3, 0, 6, 3, 0, 20]"
+    assert "For loop step cannot be 0" in output
+
+
+def test_order_by_key_calls_key_once_per_element(tmp_path):
+    source = """
+calls: int = 0;
+fn lastDigit(n: int) -> int {
+    use mut calls;
+    calls = calls + 1;
+    return n % 10;
+}
+nums: list = [31, 12, 45, 22, 3];
+nums.order(by: lastDigit);
+say(nums);
+say(calls);
+nums.order(by: lastDigit, descending: true);
+say(nums);
+nums.order(descending: true);
+say(nums);
+nums.order(lastDigit, by: lastDigit);
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 1
+    assert output.splitlines()[:4] == ["[31, 12, 22, 3, 45]", "5", "[45, 3, 12, 22, 31]", "[45, 31, 22, 12, 3]"]
+    assert "order() accepts either a comparator function or 'by', not both" in output
+
+
+def test_self_tail_calls_run_in_constant_stack_depth(tmp_path):
+    source = """
+fn sumTo(n: int, acc: int) -> int {
+    if n == 0 {
+        return acc;
+    }
+    return sumTo(n - 1, acc: acc + n);
+}
+fn describe(n: int) -> str {
+    fn describe(n: int) -> str => "inner";
+    return describe(n);
+}
+say(sumTo(20000, 0));
+say(describe(1));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["200010000", "inner"]
+
+
+def test_memo_functions_cache_results_with_lru_bound(tmp_path, capsys):
+    source = """
+calls: list = [];
+memo fn fib(n: int) -> int {
+    if n < 2 {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+memo(1) fn square(n: int) -> int => n * n;
+say(fib(80));
+say([square(3), square(3), square(4), square(3)]);
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, profile=True)
+
+    assert exit_code == 0
+    lines = output.splitlines()
+    assert lines == ["23416728348467685", "[9, 9, 16, 9]"]
+    report = capsys.readouterr().err
+    assert "memo fib: 78 hits, 81 misses" in report
+    assert "memo square: 1 hits, 3 misses (25.0% hit rate), 2 evictions, cache size 1" in report
+
+
+def test_memo_results_are_copied_for_every_collection_type(tmp_path):
+    source = """
+memo fn mkList(n: int) -> list => [n];
+memo fn mkSet(n: int) -> set => #{n};
+memo fn mkDeque(n: int) -> deque => deque([n]);
+memo fn mkHeap(n: int) -> heap => heap([n]);
+a: list = mkList(1);
+a.push(0);
+s: set = mkSet(1);
+s.add(0);
+d: deque = mkDeque(1);
+d.pushBack(0);
+h: heap = mkHeap(1);
+h.push(0);
+say(mkList(1).length(), mkSet(1).length(), mkDeque(1).length(), mkHeap(1).length());
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.strip() == "1 1 1 1"
+
+
+@pytest.mark.parametrize(
+    ("body", "reason"),
+    [
+        ("use mut total; total = total + n; return n;", "it uses 'use mut'"),
+        ("say(n); return n;", "it calls say()"),
+        ("items.push(n); return n;", "it mutates its argument 'items' with push()"),
+        ("alias: list = items; alias[0] = n; return n;", "it mutates its argument 'alias'"),
+        ("row: list = items[0]; row.push(n); return n;", "it mutates its argument 'row' with push()"),
+        ("foreach row: list in items { row.push(n); } return n;", "it mutates its argument 'row' with push()"),
+        ("log(n); return n;", "it calls 'log', which calls say()"),
+        ("fill(items); return n;", "it calls 'fill', which mutates its argument 'values' with push()"),
+    ],
+)
+def test_memo_rejects_impure_functions(tmp_path, body, reason):
+    source = f"""
+total: int = 0;
+fn log(value: int) {{ say(value); }}
+fn fill(values: list) {{ values.push(0); }}
+memo fn f(n: int, items: list) -> int {{ {body} }}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 1
+    assert f"Function 'f' cannot be memoized because {reason}" in output
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy_functions": True}])
+def test_memo_allows_calls_to_pure_helpers(tmp_path, options):
+    source = """
+fn fill(values: list) {
+    values.push(1);
+}
+fn square(n: int) -> int => n * n;
+memo fn total(n: int, items: list) -> int {
+    scratch: list = [];
+    fill(scratch);
+    sum: int = 0;
+    foreach item: int in items {
+        sum = sum + square(item);
+    }
+    return sum + scratch[0] * n;
+}
+say(total(10, [1, 2, 3]));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.strip() == "24"
+
+
+def test_explicit_stack_runs_deep_recursion_with_a_depth_limit(tmp_path):
+    source = """
+fn depth(n: int) -> int {
+    if n == 0 {
+        return 0;
+    }
+    return 1 + depth(n - 1);
+}
+say(depth(3000));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+    assert exit_code == 1
+    assert "Stack overflow" in output
+    assert "--explicit-stack" in output
+
+    exit_code, output = run_echo_source(tmp_path, source, explicit_stack=True)
+    assert exit_code == 0
+    assert output.strip() == "3000"
+
+    exit_code, output = run_echo_source(tmp_path, source, explicit_stack=True, max_depth=500)
+    assert exit_code == 1
+    assert "Stack overflow: call depth exceeded 500 in function 'depth'" in output
+
+
+def test_explicit_stack_recurses_through_methods_indexing_and_literals(tmp_path):
+    source = """
+fn viaPush(n: int) -> int {
+    if n == 0 {
+        return 0;
+    }
+    xs: list = [];
+    xs.push(viaPush(n - 1) + 1);
+    return xs[0];
+}
+fn viaHash(n: int) -> int {
+    if n == 0 {
+        return 0;
+    }
+    h: hash = {"v": viaHash(n - 1) + 1};
+    return h["v"];
+}
+fn viaSlot(n: int) -> int {
+    if n == 0 {
+        return 0;
+    }
+    xs: list = [0, 1];
+    xs[0] = xs[viaSlot(n - 1) % 2] + 1;
+    return n;
+}
+fn viaText(n: int) -> str {
+    if n == 0 {
+        return "";
+    }
+    return "x${viaText(n - 1)}";
+}
+say(viaPush(3000), viaHash(3000), viaSlot(3000), viaText(3000).length());
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, explicit_stack=True)
+
+    assert exit_code == 0
+    assert output.strip() == "3000 3000 3000 3000"
+
+
+@pytest.mark.parametrize("options", [{}, {"stream": True}])
+def test_function_frames_see_their_defining_scope_not_the_caller(tmp_path, options):
+    source = """
+count: int = 0;
+fn read() -> int {
+    use count;
+    return count;
+}
+fn caller() -> int {
+    count: int = 5;
+    return read();
+}
+say(caller());
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.splitlines()[-1] == "0"
+
+
+@pytest.mark.parametrize("options", [{}, {"explicit_stack": True}])
+def test_nested_functions_keep_outer_semantics_with_captured_scopes(tmp_path, options):
+    source = """
+fn outer() -> int {
+    scratch: list = [1, 2, 3, 4, 5, 6, 7, 8];
+    total: int = 0;
+    offset: int = 10;
+    fn cmp(a: int, b: int) -> int => b - a;
+    for i: int in 1..3 {
+        fn fact(n: int) -> int {
+            if n <= 1 {
+                return 1;
+            }
+            return n * fact(n - 1);
+        }
+        fn shifted() -> int => fact(i) + offset;
+        total = total + shifted();
+    }
+    fn bump() {
+        total = total + 100;
+    }
+    bump();
+    fn ordered() -> list {
+        items: list = [3, 1, 2];
+        items.order(cmp);
+        return items;
+    }
+    say(ordered());
+    return total;
+}
+say(outer());
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.splitlines()[-2:] == ["[3, 2, 1]", "139"]
+
+
+@pytest.mark.parametrize("options", [{}, {"stream": True}, {"optimize": True}])
+def test_constants_are_readable_in_functions_without_use(tmp_path, options):
+    source = """
+const LIMIT: int = 3;
+const SCALE: float = LIMIT * 1.5;
+const GREETING: str = "hi";
+
+fn scaled(n: int) -> float => n * SCALE;
+fn greet() {
+    say(GREETING + " " + LIMIT.asString());
+}
+
+for i: int in 0...LIMIT {
+    say(scaled(i));
+}
+greet();
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["0.0", "4.5", "9.0", "hi 3"]
+
+
+@pytest.mark.parametrize(
+    ("program", "message"),
+    [
+        ("const N: int = 1;\nN = 2;\n", "Cannot assign to constant 'N'"),
+        ("const N: int = 1;\nfn f() {\n    N: int = 2;\n}\n", "Cannot assign to constant 'N'"),
+        ("const N: int = 1;\nfn f() {\n    use mut N;\n}\n", "Cannot import constant 'N' with 'use mut'"),
+        ("const N: int = 1;\nfn f(N: int) {\n}\n", "Parameter 'N' of function 'f' shadows a constant"),
+        ("const N: int = 1;\nfor N: int in 0..2 {\n}\n", "Cannot use constant 'N' as a loop variable"),
+        ("const N: int = 1;\nconst N: int = 2;\n", "Constant 'N' is already declared"),
+        ("const N: list = [1];\n", "Constant 'N' must have type int, float, str or bool, not list"),
+        ("x: int = 1;\nconst N: int = x;\n", "Constant 'N' can only use literals and earlier constants, not 'x'"),
+        ("const N: str = \"a\".upperCase();\n", "Constant 'N' must be initialized with a constant expression"),
+        ("fn f() {\n    const N: int = 1;\n}\n", "'const' declarations are only allowed at the top level"),
+    ],
+)
+def test_constants_are_checked_for_immutability_at_parse_time(tmp_path, program, message):
+    exit_code, output = run_echo_source(tmp_path, program)
+
+    assert exit_code == 1
+    assert "Syntax Error" in output
+    assert message in output
+
+
+@pytest.mark.parametrize("options", [{"verified": True}, {"verified": True, "optimize": True}])
+def test_verified_mode_keeps_the_checks_that_can_fail(tmp_path, options):
+    source = """
+fn area(w: int, h: int) -> int => w * h;
+fn describe(n: int) -> str {
+    if n > 10 {
+        return "big";
+    }
+    return "small";
+}
+fn parse(text: str) -> int {
+    return text.asInt();
+}
+words: list = ["2", "x"];
+foreach word: str in words {
+    say(describe(area(parse(word), 4)));
+}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 1
+    assert output.splitlines()[0] == "small"
+    assert "invalid literal" in output
+
+    exit_code, output = run_echo_source(tmp_path, 'fn f(n: int) { say(n); }\nvalue: dynamic = "x";\nf(value);\n', **options)
+
+    assert exit_code == 1
+    assert "Argument 'n' in function 'f' must be of type int, got str" in output
+
+
+@pytest.mark.parametrize("options", [{}, {"explicit_stack": True}])
+def test_hot_dynamic_functions_are_specialized_with_a_guard(tmp_path, capsys, options):
+    source = """
+fn scale(value: dynamic, factor: dynamic) -> dynamic {
+    result: dynamic = value * factor;
+    return result / 2;
+}
+total: dynamic = 0;
+for i: int in 1..30 {
+    total = total + scale(i, 3);
+}
+say(total);
+say(scale(3.0, 3));
+say(scale("ab", 2));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, profile=True, **options)
+
+    assert exit_code == 1
+    assert output.splitlines()[:2] == ["690", "4.5"]
+    assert "unsupported operand" in output  # "abab" / 2 still fails on the generic path
+    report = capsys.readouterr().err
+    assert "specialized scale(int, int): 10 hits, 2 deopts" in report
+
+
+@pytest.mark.parametrize(
+    "options", [{}, {"explicit_stack": True}, {"optimize": True, "verified": True}, {"lazy_functions": True}]
+)
+def test_sets_keep_distinct_values_with_constant_time_methods(tmp_path, options):
+    source = """
+seen: set = #{};
+foreach word: str in ["b", "a", "b", "c", "a"] {
+    if !seen.has(word) {
+        seen.add(word);
+    }
+}
+say(seen, seen.length(), type(seen));
+
+small: set = #{1, 2, 3, 4};
+small.remove(1);
+evens: set = #{2, 4, 6};
+say(evens.union(small), evens.intersect(small), #{1, 1, 2} == #{2, 1});
+
+total: int = 0;
+foreach n: int in evens {
+    total = total + n;
+}
+copy: set = evens.clone();
+copy.add(8);
+say(total, evens.length(), copy.length());
+
+fn size(items: set) -> int {
+    extra: set = #{"y"};
+    return items.union(extra).length();
+}
+say(size(#{"x"}));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.splitlines() == [
+        '#{"a", "b", "c"} 3 set',
+        "#{2, 3, 4, 6} #{2, 4} true",
+        "12 3 4",
+        "2",
+    ]
+
+
+@pytest.mark.parametrize("options", [{}, {"optimize": True, "verified": True}])
+def test_set_elements_of_different_types_stay_distinct(tmp_path, options):
+    source = """
+mixed: set = #{1, true, 1.0};
+say(mixed.length(), true in #{1}, 1 in #{1}, 1.0 !in #{1}, #{1} == #{1.0});
+mixed.remove(true);
+say(mixed, mixed.has(true), #{1}.union(#{true}).length(), #{1, 2}.intersect(#{1.0, 2}));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["3 false true true false", "#{1, 1.0} false 2 #{2}"]
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("items: set = #{[1, 2]};", "Set elements must be int, float, str, bool or null, not list"),
+        ("items: set = #{1};\nitems.remove(2);", "Value 2 not found in set"),
+        ("items: set = [1];", "Cannot assign list to set variable 'items'"),
+        ("items: set = #{1};\nsay(items.union([1]));", "union() argument must be a set"),
+    ],
+)
+def test_set_errors(tmp_path, source, message):
+    exit_code, output = run_echo_source(tmp_path, source + "\n")
+
+    assert exit_code == 1
+    assert message in output
+
+
+@pytest.mark.parametrize("options", [{}, {"explicit_stack": True}, {"optimize": True, "verified": True}])
+def test_membership_operators_and_has(tmp_path, options):
+    source = """
+user: hash = {name: "Ada", role: "admin"};
+nums: list = [1, 2, 3];
+tags: set = #{"x", "y"};
+word: str = "hello";
+say("name" in user, "age" in user, "age" !in user, 2 in nums, 5 !in nums, "x" in tags, "ell" in word);
+say(user.has("role"), nums.has(4), tags.has("y"), word.has("lo"), [1] in user, !("q" in word));
+
+found: int = 0;
+foreach key: str in ["name", "age", "role", "x"] {
+    if key in user && key !in tags {
+        found = found + 1;
+    }
+}
+say(found, 1 + 1 in nums);
+say(1 in word);
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 1
+    assert output.splitlines()[:3] == [
+        "true false true true true true true",
+        "true false true true false true",
+        "2 true",
+    ]
+    assert "Cannot look for int in a string" in output
+
+
+@pytest.mark.parametrize("options", [{}, {"explicit_stack": True}, {"optimize": True, "verified": True}])
+def test_deques_push_and_pull_at_both_ends(tmp_path, options):
+    source = """
+fn reachable(start: int, limit: int) -> int {
+    frontier: deque = deque([start]);
+    seen: set = #{start};
+    while frontier.length() > 0 {
+        node: int = frontier.pullFront();
+        foreach next: int in [node * 2, node + 3] {
+            if next <= limit && next !in seen {
+                seen.add(next);
+                frontier.pushBack(next);
+            }
+        }
+    }
+    return seen.length();
+}
+say(reachable(1, 100));
+
+q: deque = deque();
+q.pushBack(1);
+q.pushBack(2);
+q.pushFront(0);
+say(q, q.length(), type(q), 2 in q);
+say(q.pullFront(), q.pullBack(), q);
+
+window: deque = deque([1, 2, 3], maxLength: 3);
+window.pushBack(4);
+total: int = 0;
+foreach n: int in window {
+    total = total + n;
+}
+say(window, total, window.clone().length());
+window.pushFront(9);
+say(window);
+deque().pullBack();
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 1
+    assert output.splitlines()[:6] == [
+        "67",
+        "deque([0, 1, 2]) 3 deque true",
+        "0 2 deque([1])",
+        "deque([2, 3, 4]) 9 3",
+        "deque([9, 2, 3])",
+        "Execution Error: Cannot pull from empty deque",
+    ]
+
+
+@pytest.mark.parametrize("options", [{}, {"explicit_stack": True}, {"optimize": True, "verified": True}])
+def test_heaps_pop_in_priority_order(tmp_path, options):
+    source = """
+numbers: heap = heap([5, 1, 4]);
+numbers.push(3);
+say(numbers, numbers.length(), numbers.peek(), type(numbers), 4 in numbers);
+say(numbers.pop(), numbers.pop(), numbers);
+
+largest: heap = heap([5, 1, 4], descending: true);
+say(largest.pop(), largest.peek());
+
+fn cost(task: list) -> int => task[1];
+tasks: heap = heap(by: cost);
+tasks.push(["write", 3]);
+tasks.push(["plan", 1]);
+tasks.push(["test", 2]);
+tasks.push(["ship", 1]);
+done: list = [];
+while tasks.length() > 0 {
+    task: list = tasks.pop();
+    done.push(task[0]);
+}
+say(done);
+
+words: str = "";
+foreach word: str in heap(["pear", "fig", "apple"], descending: true) {
+    words = words + word + " ";
+}
+say(words.trim());
+mixed: heap = heap([1]);
+mixed.push("a");
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 1
+    assert output.splitlines() == [
+        "heap([1, 3, 4, 5]) 4 1 heap true",
+        "1 3 heap([4, 5])",
+        "5 4",
+        '["plan", "ship", "test", "write"]',
+        "pear fig apple",
+        "Type Error: Cannot compare str with the values in this heap",
+    ]
+
+
+@pytest.mark.parametrize("options", [{}, {"explicit_stack": True}])
+def test_nested_functions_see_outer_bindings_made_after_their_definition(tmp_path, options):
+    source = """
+fn later() -> int {
+    fn inner() -> int {
+        return y;
+    }
+    y: int = 5;
+    return inner();
+}
+fn redeclared() -> int {
+    y: int = 1;
+    fn inner() -> int {
+        return y;
+    }
+    y: int = 9;
+    return inner();
+}
+say(later());
+say(redeclared());
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, **options)
+
+    assert exit_code == 0
+    assert output.splitlines()[-2:] == ["5", "9"]
+
+
+def test_interpolation_fragments_keep_their_quote_characters(tmp_path):
+    source = r"""
+a: str = "x";
+b: str = "y";
+say("<${a}'hi'${b}");
+say("'a'${b}");
+say("tab\t${a}\n'end'");
+say('"${a}"');
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["<x'hi'y", "'a'y", "tab\tx", "'end'", '"x"']
@@ -23,6 +23,37 @@ def test_resolve_source_path_and_use_rich(monkeypatch):
     assert main._use_rich(False) is False
 
 
+def test_rich_is_imported_only_when_first_needed(monkeypatch):
+    loads = []
+
+    def fake_load_rich():
+        loads.append(True)
+        return object, object
+
+    monkeypatch.setattr(main, "Console", main.RICH_NOT_LOADED)
+    monkeypatch.setattr(main, "Panel", main.RICH_NOT_LOADED)
+    monkeypatch.setattr(main, "load_rich", fake_load_rich)
+
+    assert main._use_rich(True) is False
+    assert loads == []
+    assert main._use_rich(False) is True
+    assert main._use_rich(False) is True
+    assert loads == [True]
+
+
+def test_run_file_startup_profile_reports_phases(tmp_path, capsys):
+    source = tmp_path / "hello.echo"
+    source.write_text("say(1);\n", encoding="utf-8")
+
+    assert main.run_file(str(source), plain=True, startup_profile=True) == 0
+
+    captured = capsys.readouterr()
+    assert captured.out.strip() == "1"
+    assert captured.err.startswith("Startup profile:")
+    for phase in ("import front-end modules", "lexer setup", "lex", "parse", "interpreter setup", "run"):
+        assert f"  {phase} " in captured.err
+
+
 def test_print_error_and_hint_plain_and_rich(monkeypatch):
     stdout = io.StringIO()
     with redirect_stdout(stdout):
@@ -94,13 +125,16 @@ def test_run_file_exception_paths(monkeypatch, tmp_path):
             return []
 
     class DummyParser:
-        def __init__(self, _tokens):
+        def __init__(self, _tokens, lazy_functions=False):
             pass
 
         def parse(self):
             return []
 
     class DummyInterpreter:
+        def __init__(self, explicit_stack=False, max_call_depth=None, verified=False):
+            pass
+
         def execute(self, _ast):
             return None
 
@@ -110,7 +144,7 @@ def test_run_file_exception_paths(monkeypatch, tmp_path):
     assert main.run_file(str(source_file), plain=True) == 0
 
     def run_case(exc):
-        class RaisingInterpreter:
+        class RaisingInterpreter(DummyInterpreter):
             def execute(self, _ast):
                 raise exc
 
@@ -132,14 +166,21 @@ def test_run_file_exception_paths(monkeypatch, tmp_path):
 def test_main_argument_parsing_and_echo_cli_forwarding(monkeypatch):
     calls = []
 
-    def fake_run_file(source, plain=False):
-        calls.append((source, plain))
+    def fake_run_file(source, plain=False, **options):
+        calls.append((source, plain, options))
         return 7
 
     monkeypatch.setattr(main, "run_file", fake_run_file)
     assert main.main(["program.echo"]) == 7
     assert main.main(["program.echo", "--plain"]) == 7
-    assert calls == [("program.echo", False), ("program.echo", True)]
+    assert main.main(["program.echo", "-O", "--no-inline", "--max-depth", "50"]) == 7
+    assert [call[:2] for call in calls] == [
+        ("program.echo", False),
+        ("program.echo", True),
+        ("program.echo", False),
+    ]
+    assert calls[0][2]["inline"] is True and calls[0][2]["max_depth"] is None
+    assert calls[2][2]["optimize"] is True and calls[2][2]["inline"] is False and calls[2][2]["max_depth"] == 50
 
     monkeypatch.setattr(echo_cli, "_main", lambda: 42)
     assert echo_cli.main() == 42
\ No newline at end of file
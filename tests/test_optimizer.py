@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+from echo_analyzer import walk_nodes
+from echo_lexer import Lexer
+from echo_interpreter import Interpreter
+from echo_optimizer import Optimizer, describe, optimize
+from echo_parser import Parser
+
+from conftest import run_echo_source
+
+
+def parse_source(tmp_path, source: str):
+    source_file = tmp_path / "program.echo"
+    source_file.write_text(source, encoding="utf-8")
+    return Parser(Lexer().read_source(str(source_file))).parse()
+
+
+def inlined_names(ast) -> list[str]:
+    return [node["name"] for node in walk_nodes(ast) if node.get("type") == "inline_call"]
+
+
+def test_small_functions_are_inlined_only_where_already_defined(tmp_path):
+    ast = parse_source(tmp_path, """
+say(sq(2));
+fn sq(x: int) -> int => x * x;
+fn norm(a: int, b: int) -> int {
+    return sq(a) + sq(b);
+}
+fn countdown(n: int) -> int => countdown(n - 1);
+fn shout(s: str) -> str {
+    use suffix;
+    return s + suffix;
+}
+say(norm(3, 4));
+say(countdown(1));
+say(shout("hi"));
+""")
+
+    optimize(ast)
+
+    assert inlined_names(ast[0]) == []  # called before sq is defined
+    assert inlined_names(ast[-3]) == ["norm", "sq", "sq"]
+    # sq was inlined into norm's body too, so the call needs no frame at all
+    assert not any(node.get("type") == "function_call" for node in walk_nodes(ast[-3]))
+    assert inlined_names(ast[-2]) == []  # recursive
+    assert inlined_names(ast[-1]) == []  # reads an outer variable
+
+
+def test_inlining_respects_budget_and_can_be_disabled(tmp_path):
+    source = """
+fn sq(x: int) -> int => x * x;
+say(sq(3));
+"""
+    ast = parse_source(tmp_path, source)
+    optimize(ast, inline=False)
+    assert inlined_names(ast) == []
+
+    ast = parse_source(tmp_path, source)
+    optimize(ast, inline_budget=2)
+    assert inlined_names(ast) == []
+
+
+def test_inlined_calls_keep_argument_and_return_type_checks(tmp_path):
+    source = """
+fn half(x: int) -> int => x / 2;
+say(half(9));
+say(half("nine"));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, optimize=True)
+    assert exit_code == 1
+    assert output.splitlines()[0] == "4"
+    assert "Argument 'x' in function 'half' must be of type int, got str" in output
+
+    exit_code, output = run_echo_source(tmp_path, "fn label(x: int) -> int => \"n\";\nsay(label(1));\n", optimize=True)
+    assert exit_code == 1
+    assert "Function 'label' must return type int, got str" in output
+
+
+def hoisted_expressions(loop) -> list[dict]:
+    return [node["expr"] for node in loop.get("hoisted", [])]
+
+
+def test_invariant_expressions_are_hoisted_out_of_loops(tmp_path):
+    ast = parse_source(tmp_path, """
+fn scan(s: str, items: list) -> int {
+    i: int = 0;
+    total: int = 0;
+    while i < s.length() {
+        total = total + items.length() + i;
+        i = i + 1;
+    }
+    out: list = [];
+    foreach item: int in items {
+        out.push(items.length());
+        total = total + s.upperCase().length();
+    }
+    return total;
+}
+""")
+    optimizer = Optimizer()
+    optimizer.optimize(ast)
+
+    body = ast[0]["body"]
+    while_loop, foreach_loop = body[2], body[4]
+    assert [describe(expr) for expr in hoisted_expressions(while_loop)] == ["s.length()", "items.length()"]
+    # out.push() may change items through an alias, but s is a str
+    assert [describe(expr) for expr in hoisted_expressions(foreach_loop)] == ["s.upperCase().length()"]
+    assert optimizer.report == [
+        "line 5: hoisted s.length() out of while loop",
+        "line 5: hoisted items.length() out of while loop",
+        "line 10: hoisted s.upperCase().length() out of foreach loop",
+    ]
+
+
+def test_loops_that_call_functions_are_left_alone(tmp_path):
+    ast = parse_source(tmp_path, """
+fn tick() {
+    say("tick");
+}
+n: int = 3;
+i: int = 0;
+while i < n * 2 {
+    tick();
+    i = i + 1;
+}
+""")
+    optimize(ast)
+    assert "hoisted" not in ast[-1]
+
+
+def test_hoisted_expressions_keep_error_timing(tmp_path, capsys):
+    source = """
+words: list = ["a", "b"];
+empty: list = [];
+n: int = 0;
+while n > 0 {
+    say(empty[5]);
+}
+for i: int in 0...2 {
+    say(words.reverse());
+}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, optimize=True, opt_report=True)
+
+    assert exit_code == 0
+    assert output.splitlines() == ['["b", "a"]', '["b", "a"]']
+    report = capsys.readouterr().err
+    assert "line 5: hoisted empty[5] out of while loop" in report
+    assert "line 8: hoisted words.reverse() out of for loop" in report
+
+
+def test_explicit_stack_loops_forget_hoisted_values_between_runs(tmp_path, capsys):
+    ast = parse_source(tmp_path, """
+fn show(n: int) -> int => n;
+fn total(items: list) -> int {
+    sum: int = 0;
+    for i: int in 0...2 {
+        sum = sum + show(items.length());
+    }
+    return sum;
+}
+say(total([1, 2]));
+say(total([1, 2, 3]));
+""")
+    # Loops that call functions are never hoisted, but the explicit-stack
+    # evaluator runs them and must honour the annotation all the same
+    loop = ast[1]["body"][1]
+    call = loop["body"][0]["value"]["right"]
+    call["args"][0] = {"type": "hoisted", "expr": call["args"][0]}
+    loop["hoisted"] = [call["args"][0]]
+
+    Interpreter(explicit_stack=True).execute(ast)
+
+    assert capsys.readouterr().out.splitlines() == ["4", "6"]
+
+
+def test_constants_are_propagated_and_dead_branches_removed(tmp_path):
+    ast = parse_source(tmp_path, """
+const DEBUG: bool = false;
+const SIZE: int = 4;
+fn area() -> int {
+    if DEBUG {
+        say("computing");
+    }
+    if SIZE > 2 {
+        return SIZE * SIZE;
+    } else {
+        return 0;
+    }
+}
+while DEBUG {
+    say("never");
+}
+say(area());
+""")
+    optimizer = Optimizer(inline=False)
+    optimizer.optimize(ast)
+
+    body = ast[2]["body"]
+    assert len(body) == 1 and "else_body" not in body[0]
+    assert body[0]["condition"] == {"type": "const", "value": True}
+    assert body[0]["body"][0]["value"] == {"type": "const", "value": 16}
+    assert ast[3]["method"] == "say"  # the while loop is gone
+    assert optimizer.report == [
+        "line 5: removed if branch that never runs",
+        "line 8: removed else branch that never runs",
+        "line 14: removed while loop that never runs",
+        "propagated constant DEBUG into 2 uses",
+        "propagated constant SIZE into 3 uses",
+        "folded 2 constant expressions",
+    ]
+
+
+def bounded_reads(loop) -> list[str]:
+    return [describe(read) for bound in loop.get("bounds", []) for read in bound["reads"]]
+
+
+def test_counted_loops_record_reads_that_stay_in_bounds(tmp_path):
+    ast = parse_source(tmp_path, """
+grid: list = [[1, 2], [3, 4]];
+n: int = grid.length();
+i: int = 0;
+while i < n {
+    row: list = grid[i];
+    m: int = row.length();
+    for j: int in 0...m {
+        say(row[j] + grid[i][j]);
+    }
+    i = i + 1;
+}
+for k: int in 0...n {
+    grid.push([k]);
+    say(grid[k]);
+}
+j: int = 0;
+while j < n {
+    j = j + 1;
+    say(grid[j]);
+}
+""")
+
+    optimizer = Optimizer()
+    optimizer.optimize(ast)
+    outer, growing, late_increment = ast[3], ast[4], ast[6]
+    inner = outer["body"][2]
+
+    assert bounded_reads(outer) == ["grid[i]", "grid[i]"]
+    assert bounded_reads(inner) == ["row[j]", "grid[i][j]"]
+    assert bounded_reads(growing) == []  # push() may resize the list
+    assert bounded_reads(late_increment) == []  # the read runs after the increment
+    assert "line 5: checked bounds of grid[i] once per while loop (2 reads)" in optimizer.report
+
+
+def test_unchecked_reads_keep_out_of_range_errors(tmp_path):
+    source = """
+fn total(items: list, upto: int) -> int {
+    sum: int = 0;
+    for i: int in 0...upto {
+        sum = sum + items[i];
+        if i == 0 && upto > 1 {
+            sum = sum + total(items, 1);
+        }
+    }
+    return sum;
+}
+say(total([1, 2, 3], 3));
+say(total([1, 2, 3], 4));
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, optimize=True)
+
+    assert exit_code == 1
+    assert output.splitlines()[0] == "7"
+    assert "List index 3 out of range" in output
+
+
+def test_loops_that_sort_with_a_key_function_are_left_alone(tmp_path):
+    source = """
+counter: int = 0;
+fn key(n: int) -> int {
+    use mut counter;
+    counter = counter + 1;
+    return n;
+}
+xs: list = [3, 1, 2];
+for i: int in 0...3 {
+    xs.order(by: "key");
+    say(counter * 10);
+}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, optimize=True)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["30", "60", "90"]
+
+
+def test_loops_that_push_onto_a_keyed_heap_are_left_alone(tmp_path):
+    source = """
+counter: int = 0;
+fn key(n: int) -> int {
+    use mut counter;
+    counter = counter + 1;
+    return n;
+}
+h: heap = heap(by: "key");
+for i: int in 0...3 {
+    h.push(i);
+    say(counter * 10);
+}
+"""
+
+    exit_code, output = run_echo_source(tmp_path, source, optimize=True)
+
+    assert exit_code == 0
+    assert output.splitlines() == ["10", "20", "30"]
@@ -18,6 +18,8 @@ def test_lexer_token_repr_and_string_parsing(tmp_path):
 
     lexer = Lexer()
     assert lexer._find_string_end('"a\\"b"', 0, '"') == 5
+    # Compiled token patterns are shared by every lexer instance
+    assert Lexer().compiled_patterns is lexer.compiled_patterns
     assert lexer._find_string_end('"${x}"', 0, '"') == 5
     assert lexer._find_string_end('"unterminated', 0, '"') == -1
 
@@ -241,4 +243,99 @@ def test_parser_function_loop_and_alias_forms():
     ])
     use_stmt = p.parse_use_statement()
     assert use_stmt["is_mutable"] is True
-    assert use_stmt["variables"] == ["a", "b"]
\ No newline at end of file
+    assert use_stmt["variables"] == ["a", "b"]
+
+def test_parser_decodes_literals_once_into_constants():
+    p = parser([Token("STRING", '"a\\tb\\\\n"', 1, 1)])
+    assert p.parse_primary() == {"type": "const", "value": "a\tb\\n"}
+
+    p = parser([Token("OPERATOR", "-", 1, 1), Token("FLOAT", "2.5", 1, 2)])
+    assert p.parse_unary() == {"type": "const", "value": -2.5}
+
+    p = parser([
+        Token("PUNCTUATION", "[", 1, 1), Token("NUMBER", "1", 1, 2), Token("PUNCTUATION", ",", 1, 3),
+        Token("STRING", "'x'", 1, 5), Token("PUNCTUATION", ",", 1, 8), Token("NULL", "null", 1, 10),
+        Token("PUNCTUATION", "]", 1, 14),
+    ])
+    assert p.parse_primary() == {"type": "const_list", "value": [1, "x", None]}
+
+    p = parser([
+        Token("PUNCTUATION", "{", 1, 1), Token("STRING", '"k"', 1, 2), Token("PUNCTUATION", ":", 1, 5),
+        Token("BOOLEAN", "true", 1, 7), Token("PUNCTUATION", "}", 1, 11),
+    ])
+    assert p.parse_primary() == {"type": "const_hash", "value": {"k": True}}
+
+    p = parser([
+        Token("PUNCTUATION", "[", 1, 1), Token("IDENTIFIER", "x", 1, 2), Token("PUNCTUATION", "]", 1, 3),
+    ])
+    assert p.parse_primary()["type"] == "list"
+
+
+def test_parser_defers_function_bodies_until_first_use():
+    from echo_parser import LazyFunctionBody
+
+    tokens = [
+        Token("KEYWORD", "fn", 1, 1), Token("IDENTIFIER", "f", 1, 4), Token("PUNCTUATION", "(", 1, 5), Token("PUNCTUATION", ")", 1, 6),
+        Token("PUNCTUATION", "{", 1, 8),
+        Token("IDENTIFIER", "h", 2, 1), Token("OPERATOR", "=", 2, 3), Token("PUNCTUATION", "{", 2, 5), Token("PUNCTUATION", "}", 2, 6),
+        Token("PUNCTUATION", ";", 2, 7),
+        Token("KEYWORD", "return", 3, 1), Token("NUMBER", "1", 3, 8), Token("PUNCTUATION", ";", 3, 9),
+        Token("PUNCTUATION", "}", 4, 1),
+        Token("METHOD", "say", 5, 1), Token("PUNCTUATION", "(", 5, 4), Token("PUNCTUATION", ")", 5, 5), Token("PUNCTUATION", ";", 5, 6),
+    ]
+    program = Parser(tokens, lazy_functions=True).parse()
+
+    assert len(program) == 2
+    body = program[0]["body"]
+    assert isinstance(body, LazyFunctionBody)
+    assert program[1]["method"] == "say"
+
+    # Validation that depends on the body happens once it is parsed
+    with pytest.raises(SyntaxError, match="Return type annotation required for function 'f'"):
+        body.parse()
+
+
+def test_streaming_parser_pulls_tokens_per_statement():
+    from echo_parser import StreamingParser
+
+    pulled = []
+
+    def tokens():
+        for statement in range(3):
+            line = statement + 1
+            for tok in (
+                Token("METHOD", "say", line, 1), Token("PUNCTUATION", "(", line, 4), Token("NUMBER", str(line), line, 5),
+                Token("PUNCTUATION", ")", line, 6), Token("PUNCTUATION", ";", line, 7),
+            ):
+                pulled.append(tok)
+                yield tok
+
+    streaming = StreamingParser(tokens())
+    statements = streaming.iter_statements()
+
+    first = next(statements)
+    assert first["args"] == [{"type": "const", "value": 1}]
+    # Only the first statement has been lexed, and its tokens were released
+    assert len(pulled) == 5
+    assert streaming.tokens == []
+
+    assert [stmt["args"][0]["value"] for stmt in statements] == [2, 3]
+
+
+def test_parser_marks_self_calls_in_tail_position():
+    def call(name):
+        return [Token("IDENTIFIER", name), Token("PUNCTUATION", "("), Token("PUNCTUATION", ")")]
+
+    tokens = [
+        Token("KEYWORD", "fn"), Token("IDENTIFIER", "f"), Token("PUNCTUATION", "("), Token("PUNCTUATION", ")"),
+        Token("RETURN_TYPE", "->"), Token("DATATYPE", "int"), Token("PUNCTUATION", "{"),
+        Token("KEYWORD", "if"), Token("BOOLEAN", "true"), Token("PUNCTUATION", "{"),
+        Token("KEYWORD", "return"), *call("f"), Token("PUNCTUATION", ";"),
+        Token("PUNCTUATION", "}"),
+        Token("KEYWORD", "return"), *call("g"), Token("PUNCTUATION", ";"),
+        Token("PUNCTUATION", "}"),
+    ]
+    body = Parser(tokens).parse()[0]["body"]
+
+    assert body[0]["body"][0]["tail_call"] is True
+    assert "tail_call" not in body[1]